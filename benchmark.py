@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Benchmark regenerate_all_data.py across horizons, cauldron counts and
+courier counts.
+
+Every case runs the generator in a fresh process inside its own scratch
+directory, on a synthetic cauldrons.json written by this script with
+cauldronwatch.facility (no network or outside services), and records:
+
+- wall time per phase: setup, events, drains, fill_loop, candidates,
+  dispatch, unreported_drains, serialization (see cauldronwatch.timing)
+- total wall and CPU time, simulated minutes per second
+- peak RSS of the generator process
+- output size (bytes of everything the generator wrote)
+
+Results go to a JSON file so runs from different versions can be compared:
+
+    python benchmark.py                                  # default sweep
+    python benchmark.py --horizons 1,7,30,365 --cauldrons 12 --couriers 4
+    python benchmark.py --grid --horizons 1,7 --cauldrons 12,200,2000
+    python benchmark.py --out after.json --compare before.json
+
+By default each axis is swept on its own around the baseline case (first
+value of each list); --grid runs every combination instead.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from cauldronwatch.facility import generate_facility
+from cauldronwatch.generator import main as run_generator
+from cauldronwatch.timing import peak_rss_bytes
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+GENERATOR = os.path.join(REPO_DIR, 'regenerate_all_data.py')
+# The generator's fixed start; horizons end CAULDRONWATCH_END minutes after it
+GENERATOR_START = datetime(2024, 10, 30, tzinfo=timezone.utc)
+
+
+def build_cases(args):
+    """Cases as dicts with a stable name, either a one-axis-at-a-time sweep or the full grid"""
+    if args.grid:
+        combos = [(d, c, k) for d in args.horizons for c in args.cauldrons for k in args.couriers]
+    else:
+        base = (args.horizons[0], args.cauldrons[0], args.couriers[0])
+        combos = [base]
+        combos += [(d, base[1], base[2]) for d in args.horizons[1:]]
+        combos += [(base[0], c, base[2]) for c in args.cauldrons[1:]]
+        combos += [(base[0], base[1], k) for k in args.couriers[1:]]
+    cases = []
+    for days, n_cauldrons, couriers in dict.fromkeys(combos):
+        cases.append({
+            'name': f"days_{days}_cauldrons_{n_cauldrons}_couriers_{couriers}"
+                    + (f"_markets_{args.markets}" if args.markets != 1 else ''),
+            'days': days,
+            'cauldrons': n_cauldrons,
+            'couriers_per_shift': couriers,
+            'markets': args.markets,
+        })
+    return cases
+
+
+def run_generator_here():
+    """Child side: run the generator in the current directory and print a JSON summary"""
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    with open('generate.log', 'w') as log, contextlib.redirect_stdout(log):
+        result = run_generator([])
+    seconds = time.perf_counter() - started
+    minutes = result['history'].total_minutes
+    print(json.dumps({
+        'seconds': round(seconds, 4),
+        'cpu_seconds': round(time.process_time() - cpu_started, 4),
+        'phases': result['timer'].report(),
+        'simulated_minutes': minutes,
+        'minutes_per_second': round(minutes / seconds, 1) if seconds else None,
+        'tickets': len(result['transport_tickets']),
+        'unreported_drains': len(result['unreported_drains']),
+        'peak_rss_bytes': peak_rss_bytes(),
+    }))
+
+
+def run_case(case, keep_dir=None, timeout=None):
+    """Run one case in a scratch directory and return its measurements"""
+    work_dir = tempfile.mkdtemp(prefix=f"bench_{case['name']}_")
+    try:
+        with open(os.path.join(work_dir, 'cauldrons.json'), 'w') as f:
+            json.dump(generate_facility(case['cauldrons'], case['markets'], case['couriers_per_shift']), f, indent=2)
+        end_minute = int(GENERATOR_START.timestamp()) // 60 + case['days'] * 24 * 60 - 1
+        end = datetime.fromtimestamp(end_minute * 60, tz=timezone.utc)
+        env = dict(os.environ, CAULDRONWATCH_END=end.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                   PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get('PYTHONPATH')])))
+        env.pop('CAULDRONWATCH_RESUME', None)
+        env.pop('CAULDRONWATCH_CHECKPOINT_EVERY', None)
+        env.pop('CAULDRONWATCH_PROFILE', None)
+
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-here'], cwd=work_dir, env=env,
+                              capture_output=True, text=True, timeout=timeout)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}")
+        measured = json.loads(proc.stdout.strip().splitlines()[-1])
+
+        outputs = {}
+        for root, dirs, files in os.walk(work_dir):
+            dirs[:] = [d for d in dirs if d != '.cauldronwatch_cache']  # Travel-time cache, not output
+            for name in files:
+                if name in ('cauldrons.json', 'generate.log'):
+                    continue
+                path = os.path.join(root, name)
+                outputs[os.path.relpath(path, work_dir)] = os.path.getsize(path)
+        measured['output_bytes'] = sum(outputs.values())
+        measured['output_files'] = dict(sorted(outputs.items()))
+        if keep_dir:
+            shutil.copytree(work_dir, os.path.join(keep_dir, case['name']), dirs_exist_ok=True)
+        return dict(case, **measured)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Print speedups (baseline time / new time) for the cases both runs have"""
+    with open(baseline_path, 'r') as f:
+        baseline = {case['name']: case for case in json.load(f)['cases']}
+    print(f"\nSpeedup vs {baseline_path} (>1 is faster):")
+    for case in results['cases']:
+        old = baseline.get(case['name'])
+        if not old or 'seconds' not in old or 'seconds' not in case:
+            continue
+        phases = ', '.join(
+            f"{phase} {old['phases'][phase] / seconds:.2f}x"
+            for phase, seconds in case['phases'].items()
+            if seconds > 0 and old['phases'].get(phase)
+        )
+        print(f"  {case['name']}: {old['seconds'] / case['seconds']:.2f}x total"
+              f" (RSS {case['peak_rss_bytes'] / old['peak_rss_bytes']:.2f}x; {phases})")
+
+
+def parse_ints(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data generator")
+    parser.add_argument('--horizons', type=parse_ints, default=[1, 7, 30, 365],
+                        help="simulated days, comma-separated (default 1,7,30,365)")
+    parser.add_argument('--cauldrons', type=parse_ints, default=[12, 100, 500, 2000],
+                        help="cauldron counts (default 12,100,500,2000)")
+    parser.add_argument('--couriers', type=parse_ints, default=[4, 1, 16],
+                        help="couriers per shift (default 4,1,16)")
+    parser.add_argument('--markets', type=int, default=1, help="markets in every synthetic facility (default 1)")
+    parser.add_argument('--grid', action='store_true', help="run every combination instead of a sweep")
+    parser.add_argument('--repeat', type=int, default=1, help="runs per case; the fastest is kept (default 1)")
+    parser.add_argument('--timeout', type=float, default=None, help="seconds before a case is abandoned")
+    parser.add_argument('--out', default='benchmark_results.json', help="results file (default benchmark_results.json)")
+    parser.add_argument('--compare', metavar='RESULTS', help="earlier results file to compute speedups against")
+    parser.add_argument('--keep-outputs', metavar='DIR', help="copy each case's generated files into DIR")
+    parser.add_argument('--run-here', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_here:
+        run_generator_here()
+        return
+
+    cases = build_cases(args)
+    print(f"Running {len(cases)} benchmark cases...")
+    measured = []
+    for i, case in enumerate(cases, 1):
+        runs = []
+        try:
+            for _ in range(args.repeat):
+                runs.append(run_case(case, args.keep_outputs, args.timeout))
+        except (RuntimeError, subprocess.TimeoutExpired) as exc:
+            measured.append(dict(case, error=str(exc) or repr(exc)))
+            print(f"  [{i}/{len(cases)}] {case['name']}: FAILED ({exc})")
+            continue
+        best = min(runs, key=lambda r: r['seconds'])
+        measured.append(best)
+        print(f"  [{i}/{len(cases)}] {case['name']}: {best['seconds']:.2f}s, "
+              f"{best['peak_rss_bytes'] / 2**20:.0f} MiB peak, {best['output_bytes'] / 2**20:.1f} MiB written")
+
+    results = {
+        'generator': os.path.basename(GENERATOR),
+        'git_commit': git_commit(),
+        'created': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'cases': measured,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✅ Results written to {args.out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+"""
+Shared building blocks for the CauldronWatch data generators.
+
+The top-level scripts (regenerate_all_data.py, extend_*.py, fix_*.py) import
+from here instead of each carrying their own copy of the simulation helpers.
+"""
@@ -0,0 +1,107 @@
+"""
+Compact binary companion for historical_data.json.
+
+Layout (little-endian):
+    8 bytes   magic b'CWLEVEL1'
+    4 bytes   uint32 length of the JSON header
+    n bytes   JSON header: start timestamp, interval_minutes, cauldron_ids, dtype
+    padding   spaces up to a 64-byte boundary
+    data      float32 matrix (or the header's dtype), one row per minute,
+              columns in cauldron_ids order
+
+The row count is not stored; it follows from the file size, so the file can
+be appended to while a run is going and a partial last row is ignored.
+Loading memory-maps the matrix, so opening a long run and slicing one
+cauldron or a time window doesn't parse or copy anything.
+"""
+
+import json
+import os
+import struct
+import numpy as np
+
+from cauldronwatch.levels import LevelStore
+from cauldronwatch.minutes import format_minute, parse_minute
+
+MAGIC = b'CWLEVEL1'
+DTYPE = np.dtype('<f4')
+_ALIGN = 64
+
+
+def _header_bytes(cauldron_ids, start_minute, dtype):
+    header = json.dumps({
+        'start': format_minute(start_minute),
+        'interval_minutes': 1,
+        'cauldron_ids': list(cauldron_ids),
+        'dtype': dtype.str,
+    }).encode('utf-8')
+    used = len(MAGIC) + 4 + len(header)
+    header += b' ' * (-used % _ALIGN)
+    return MAGIC + struct.pack('<I', len(header)) + header
+
+
+class LevelBinaryWriter:
+    """Appends minute rows to a binary level file (same write() interface as HistoryStreamWriter)."""
+
+    def __init__(self, path, cauldron_ids, dtype=DTYPE):
+        self.path = path
+        self.cauldron_ids = list(cauldron_ids)
+        self.dtype = np.dtype(dtype).newbyteorder('<')
+        self.rows_written = 0
+        self.next_minute = None  # Epoch minute the next row must start at
+        self._file = open(path, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, start_minute, rows):
+        """Write a block of rows (columns in `cauldron_ids` order) starting at epoch minute `start_minute`"""
+        if self.next_minute is None:
+            # Header goes in with the first block, once the start time is known
+            self._file.write(_header_bytes(self.cauldron_ids, start_minute, self.dtype))
+        elif start_minute != self.next_minute:
+            raise ValueError(f"rows must be contiguous: expected {format_minute(self.next_minute)}, "
+                             f"got {format_minute(start_minute)}")
+        rows = np.ascontiguousarray(rows, dtype=self.dtype)
+        self._file.write(rows.tobytes())
+        self.rows_written += len(rows)
+        self.next_minute = start_minute + len(rows)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def write_levels_binary(path, store):
+    """Write a whole LevelStore as a binary level file"""
+    with LevelBinaryWriter(path, store.cauldron_ids) as writer:
+        writer.write(store.start_minute, store.levels)
+
+
+def load_levels_binary(path, mode='r'):
+    """
+    Open a binary level file as a LevelStore backed by a memory map (read-only
+    unless `mode` is 'r+', which writes changes through to the file).
+    Slicing (`column()`, `levels[a:b]`) reads only the pages it touches; appending
+    copies the data into memory first.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a cauldron level file")
+        (header_length,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_length))
+    if header['interval_minutes'] != 1:
+        raise ValueError(f"unsupported interval: {header['interval_minutes']} minutes")
+
+    offset = len(MAGIC) + 4 + header_length
+    columns = len(header['cauldron_ids'])
+    dtype = np.dtype(header['dtype'])
+    rows = (os.path.getsize(path) - offset) // (dtype.itemsize * columns)
+    if rows > 0:
+        levels = np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=(rows, columns))
+    else:
+        levels = np.empty((0, columns), dtype=dtype)
+    return LevelStore.wrap(header['cauldron_ids'], parse_minute(header['start']), levels)
@@ -0,0 +1,103 @@
+"""
+Indexed priority queue of collection candidates.
+
+Every cauldron that is not being collected sits in one priority band
+(100, 98, 95, ... from the generator's threshold ladder; 0 = not a
+candidate). Inside a band, cauldrons are indexed by id with their collection
+count in a min segment tree, so the dispatch rules' questions are one walk
+down a tree per band:
+
+- best candidate: highest band, then highest cauldron id
+- best candidate in band >= b with fewer than c collections
+
+`update` takes the bands and counts of all cauldrons as arrays and only
+touches the entries whose band or count changed, so a minute where nothing
+crosses a band boundary costs one vectorized comparison.
+"""
+
+import math
+
+import numpy as np
+
+
+class _MinTree:
+    """Min segment tree over fixed positions; empty positions hold inf."""
+
+    def __init__(self, n):
+        self.size = 1 << max(0, (n - 1).bit_length())
+        self.values = [math.inf] * (2 * self.size)
+
+    def set(self, position, value):
+        i = position + self.size
+        values = self.values
+        values[i] = value
+        i >>= 1
+        while i:
+            values[i] = min(values[2 * i], values[2 * i + 1])
+            i >>= 1
+
+    def rightmost_below(self, limit):
+        """Highest position whose value is < limit, or None"""
+        values = self.values
+        if values[1] >= limit:
+            return None
+        i = 1
+        while i < self.size:
+            i = 2 * i + 1 if values[2 * i + 1] < limit else 2 * i
+        return i - self.size
+
+
+class CandidateQueue:
+    """Candidates by (priority band, cauldron id) with their collection counts."""
+
+    def __init__(self, cauldron_ids):
+        order = sorted(range(len(cauldron_ids)), key=lambda i: cauldron_ids[i])
+        self._index_at = order  # Tree position -> cauldron index (positions in id order)
+        self._position = np.empty(len(cauldron_ids), dtype=int)
+        self._position[order] = np.arange(len(cauldron_ids))
+        self._bands = np.zeros(len(cauldron_ids), dtype=int)
+        self._counts = np.zeros(len(cauldron_ids), dtype=int)
+        self._trees = {}      # band -> _MinTree of collection counts
+        self._members = {}    # band -> number of cauldrons in it
+        self._order = []      # Non-empty bands, highest first
+
+    def __len__(self):
+        return sum(self._members.values())
+
+    def band(self, index):
+        return int(self._bands[index])
+
+    def update(self, bands, counts):
+        """Re-key the cauldrons whose band (0 = not a candidate) or count changed"""
+        bands = np.asarray(bands, dtype=int)
+        counts = np.asarray(counts, dtype=int)
+        changed = np.flatnonzero((bands != self._bands) | ((counts != self._counts) & (bands > 0)))
+        for i in changed.tolist():
+            position = int(self._position[i])
+            old = int(self._bands[i])
+            new = int(bands[i])
+            if old:
+                self._trees[old].set(position, math.inf)
+                self._members[old] -= 1
+                if not self._members[old]:
+                    del self._members[old]
+            if new:
+                tree = self._trees.get(new)
+                if tree is None:
+                    tree = self._trees[new] = _MinTree(len(self._index_at))
+                tree.set(position, int(counts[i]))
+                self._members[new] = self._members.get(new, 0) + 1
+        if changed.size:
+            self._bands[changed] = bands[changed]
+            self._counts[changed] = counts[changed]
+            self._order = sorted(self._members, reverse=True)
+
+    def best(self, min_band=1, below_count=math.inf):
+        """Cauldron index of the highest (band, id) with band >= min_band and count < below_count"""
+        for band in self._order:
+            if band < min_band:
+                break
+            position = self._trees[band].rightmost_below(below_count)
+            if position is not None:
+                return self._index_at[position]
+        return None
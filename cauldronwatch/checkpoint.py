@@ -0,0 +1,41 @@
+"""
+Simulator checkpoints.
+
+A checkpoint is a small JSON file with everything the generator loop carries
+from one minute to the next: levels, scheduled/running drains, courier
+timelines, counters, the collection windows and tickets that reach past the
+checkpoint, and the seeds. Random values are keyed by minute (see
+cauldronwatch.keyed_random), so the seeds are the whole RNG state.
+
+The levels are the loop's, from before the unreported-drain pass. Once a run
+has placed its unreported drains it adds them to every checkpoint it wrote
+('unreported_drains'), and a resumed run replays them rather than placing
+its own. A checkpoint without them (the run never finished) resumes with a
+fresh drain pass over the resumed minutes only.
+
+Times are integer epoch minutes (see cauldronwatch.minutes) and floats
+round-trip exactly through JSON, so the state comes back bit for bit.
+"""
+
+import json
+import os
+
+CHECKPOINT_VERSION = 2
+
+
+def save_checkpoint(path, state):
+    """Write a checkpoint atomically (a crash never leaves a half-written file)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(dict(state, version=CHECKPOINT_VERSION), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    """Read a checkpoint written by save_checkpoint()"""
+    with open(path, 'r') as f:
+        state = json.load(f)
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"unsupported checkpoint version in {path}: {state.get('version')}")
+    return state
@@ -0,0 +1,299 @@
+"""
+Online drain detection on the minute level feed.
+
+`DrainDetector` takes one row of levels per minute (all cauldrons at once)
+and keeps a fixed set of per-cauldron numbers, so the cost per sample does
+not depend on how long the feed has been running:
+
+- fill rate: slow moving average of the minute-to-minute change while the
+  cauldron is not draining
+- noise band: moving average of the squared deviation from that rate,
+  relative to the level (the fill jitter scales with the level)
+- excess: running sum of (change - fill rate), i.e. the level with the
+  expected fill taken out. A drain is a sustained fall of the excess.
+- CUSUM of the fall of the excess with a drift allowance of half the
+  slowest drain we look for; a drain opens once it crosses a threshold
+  derived from the noise band, dated back to the minute the sum left zero
+- while a drain is open, the lowest point of the excess (tilted by the same
+  drift) and when it was reached; the drain closes once that point has not
+  moved for `end_quiet_minutes` or the excess has clearly recovered
+
+Every step is a handful of vectorized operations over all cauldrons, and the
+events of a minute are the few entries where a state flag flipped.
+
+Events are dicts:
+
+    {'event': 'drain_start', 'cauldron_id', 'drain_start_timestamp', 'detected_timestamp'}
+    {'event': 'drain_end', 'cauldron_id', 'drain_start_timestamp', 'drain_end_timestamp',
+     'duration_minutes', 'estimated_volume_liters', 'level_drop_liters'}
+    {'event': 'drain_cancelled', 'cauldron_id', 'drain_start_timestamp'}   (too small after all)
+
+The estimated volume adds back the fill during the drain (what a ticket
+should report, see cauldronwatch.reconcile); the level drop is the plain
+before/after difference.
+
+Command line (reads historical_data.json / .ndjson / .bin / a dataset dir):
+
+    python -m cauldronwatch.detector [--history historical_data.json] [-o detected_drains.json]
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from cauldronwatch.fillrates import FillRateEstimate, drain_windows, ticket_windows
+from cauldronwatch.minutes import format_minute, parse_minute
+
+# Slowest net drain (L/min) the detector is tuned for; collections and unreported
+# drains in the generated data run at 0.5 L/min or more
+MIN_DRAIN_RATE = 0.4
+# Expected in-control run length (minutes) between false starts, sets the CUSUM threshold
+FALSE_START_MINUTES = 1e6
+# Drains smaller than this (or shorter than MIN_DRAIN_MINUTES) are dropped when they close
+MIN_VOLUME = 8.0
+MIN_DRAIN_MINUTES = 5
+MIN_START_DROP = 4.0        # Threshold floor for quiet (low-level) cauldrons
+END_QUIET_MINUTES = 8       # No new low for this long closes a drain
+RATE_HALF_LIFE = 720        # Minutes; fill-rate and noise averages
+INITIAL_NOISE = 0.001       # Relative per-minute noise before the average has settled
+FULL_FRACTION = 0.999       # At/above this share of max_volume the level is clamped, not informative
+
+
+class DrainDetector:
+    """Constant-state, vectorized drain detector over a fixed, ordered set of cauldrons."""
+
+    def __init__(self, cauldron_ids, fill_rates=None, max_volumes=None, min_drain_rate=MIN_DRAIN_RATE,
+                 min_volume=MIN_VOLUME, end_quiet_minutes=END_QUIET_MINUTES, noise=None):
+        self.cauldron_ids = list(cauldron_ids)
+        n = len(self.cauldron_ids)
+        self.drift = min_drain_rate / 2
+        self.min_volume = min_volume
+        self.end_quiet_minutes = end_quiet_minutes
+        self.alpha = 1 - 0.5 ** (1 / RATE_HALF_LIFE)
+        self.log_run_length = np.log(FALSE_START_MINUTES)
+
+        # Starting points for the rate and noise averages, e.g. from a FillRateEstimate
+        # (cauldronwatch.fillrates); `noise` is the relative per-minute std
+        if isinstance(fill_rates, FillRateEstimate):
+            fitted = dict(zip(fill_rates.cauldron_ids, fill_rates.noise_relative.tolist()))
+            noise = [fitted.get(cid, INITIAL_NOISE) for cid in self.cauldron_ids] if noise is None else noise
+            fill_rates = fill_rates.as_dict()
+        if isinstance(fill_rates, dict):
+            fill_rates = [fill_rates.get(cid, 0.0) for cid in self.cauldron_ids]
+        if isinstance(max_volumes, dict):
+            max_volumes = [max_volumes.get(cid, np.inf) for cid in self.cauldron_ids]
+        self.rate = np.zeros(n) if fill_rates is None else np.array(fill_rates, dtype=float)
+        self.full = np.full(n, np.inf) if max_volumes is None else np.asarray(max_volumes, dtype=float) * FULL_FRACTION
+        self.noise = np.full(n, INITIAL_NOISE ** 2) if noise is None else np.asarray(noise, dtype=float) ** 2
+        self.level = np.full(n, np.nan)               # Last level seen
+        self.minute = None                            # Epoch minute of the last row
+        self.excess = np.zeros(n)                     # Running sum of (change - rate)
+
+        # CUSUM of the fall of the excess and where it last left zero
+        self.fall = np.zeros(n)
+        self.rise_minute = np.zeros(n, dtype=np.int64)
+        self.rise_excess = np.zeros(n)
+        self.rise_level = np.zeros(n)
+
+        # Open drains: where they started (minute before the first falling one) and their low
+        self.open = np.zeros(n, dtype=bool)
+        self.start_minute = np.zeros(n, dtype=np.int64)
+        self.start_excess = np.zeros(n)
+        self.start_level = np.zeros(n)
+        self.low = np.zeros(n)                        # Lowest tilted excess so far
+        self.low_minute = np.zeros(n, dtype=np.int64)
+        self.low_excess = np.zeros(n)
+        self.low_level = np.zeros(n)
+
+    def __len__(self):
+        return len(self.cauldron_ids)
+
+    def _threshold(self, levels):
+        """Fall (liters) that opens a drain at the current noise band"""
+        sigma2 = self.noise * np.maximum(levels, 1.0) ** 2
+        return np.maximum(self.log_run_length * sigma2 / (2 * self.drift), MIN_START_DROP)
+
+    def update(self, minute, levels):
+        """Feed the levels of every cauldron at one epoch minute (in `cauldron_ids` order); returns events"""
+        levels = np.asarray(levels, dtype=float)
+        if self.minute is None:
+            self.minute = minute
+            self.level = levels.copy()
+            self.rise_minute[:] = minute
+            self.rise_level[:] = levels
+            return []
+        if minute != self.minute + 1:
+            raise ValueError(f"samples must be one minute apart: expected {format_minute(self.minute + 1)}, "
+                             f"got {format_minute(minute)}")
+        self.minute = minute
+
+        change = levels - self.level
+        # A clamped (full) cauldron cannot rise; treat the minute as on-rate
+        clamped = (levels >= self.full) & (change >= 0)
+        change = np.where(clamped, self.rate, change)
+        deviation = change - self.rate
+        self.excess += deviation
+        self.level = levels
+
+        # CUSUM: grows while the excess falls faster than the drift allowance
+        fall = self.fall - deviation - self.drift
+        restart = (fall <= 0) & ~self.open
+        self.fall = np.where(restart, 0.0, fall)
+        self.rise_minute = np.where(restart, minute, self.rise_minute)
+        self.rise_excess = np.where(restart, self.excess, self.rise_excess)
+        self.rise_level = np.where(restart, levels, self.rise_level)
+
+        # Learn rate and noise outside drains
+        quiet = ~self.open & ~clamped
+        relative = deviation / np.maximum(levels, 1.0)
+        self.rate = np.where(quiet, self.rate + self.alpha * deviation, self.rate)
+        self.noise = np.where(quiet, self.noise + self.alpha * (relative * relative - self.noise), self.noise)
+
+        events = []
+        # Close drains whose low has held for a while or that have clearly recovered
+        tilted = self.excess + self.drift * minute
+        if self.open.any():
+            lower = self.open & (tilted < self.low)
+            self.low = np.where(lower, tilted, self.low)
+            self.low_minute = np.where(lower, minute, self.low_minute)
+            self.low_excess = np.where(lower, self.excess, self.low_excess)
+            self.low_level = np.where(lower, levels, self.low_level)
+            done = self.open & ((minute - self.low_minute >= self.end_quiet_minutes)
+                                | (tilted - self.low > self._threshold(levels)))
+            for i in np.flatnonzero(done).tolist():
+                events.extend(self._close(i))
+
+        # Open drains where the CUSUM crossed its threshold
+        start = ~self.open & (self.fall > self._threshold(levels))
+        if start.any():
+            self.open |= start
+            self.start_minute = np.where(start, self.rise_minute, self.start_minute)
+            self.start_excess = np.where(start, self.rise_excess, self.start_excess)
+            self.start_level = np.where(start, self.rise_level, self.start_level)
+            self.low = np.where(start, tilted, self.low)
+            self.low_minute = np.where(start, minute, self.low_minute)
+            self.low_excess = np.where(start, self.excess, self.low_excess)
+            self.low_level = np.where(start, levels, self.low_level)
+            for i in np.flatnonzero(start).tolist():
+                events.append({
+                    'event': 'drain_start',
+                    'cauldron_id': self.cauldron_ids[i],
+                    'drain_start_timestamp': format_minute(int(self.start_minute[i]) + 1),
+                    'detected_timestamp': format_minute(minute),
+                })
+        return events
+
+    def _close(self, i):
+        """Close cauldron i's drain: a drain_end event, or drain_cancelled if it turned out too small"""
+        self.open[i] = False
+        self.fall[i] = 0.0
+        # The next rise starts from the drain's low point
+        self.rise_minute[i] = self.minute
+        self.rise_excess[i] = self.excess[i]
+        self.rise_level[i] = self.level[i]
+
+        start = int(self.start_minute[i]) + 1
+        end = int(self.low_minute[i])
+        volume = self.start_excess[i] - self.low_excess[i]
+        if volume < self.min_volume or end - start + 1 < MIN_DRAIN_MINUTES:
+            return [{'event': 'drain_cancelled', 'cauldron_id': self.cauldron_ids[i],
+                     'drain_start_timestamp': format_minute(start)}]
+        return [{
+            'event': 'drain_end',
+            'cauldron_id': self.cauldron_ids[i],
+            'drain_start_timestamp': format_minute(start),
+            'drain_end_timestamp': format_minute(end),
+            'duration_minutes': end - start + 1,
+            'estimated_volume_liters': round(float(volume), 2),
+            'level_drop_liters': round(float(self.start_level[i] - self.low_level[i]), 2),
+        }]
+
+    def feed(self, record):
+        """Feed one historical_data record ({'timestamp', 'cauldron_levels'}); returns events"""
+        levels = record['cauldron_levels']
+        return self.update(parse_minute(record['timestamp']), [levels[cid] for cid in self.cauldron_ids])
+
+    def finish(self):
+        """Close the drains still open at the end of the feed; returns their events"""
+        events = []
+        for i in np.flatnonzero(self.open).tolist():
+            events.extend(self._close(i))
+        return events
+
+
+def detect_drains(store, fill_rates=None, max_volumes=None):
+    """Run a detector over a whole LevelStore; returns the drain_end events"""
+    detector = DrainDetector(store.cauldron_ids, fill_rates, max_volumes)
+    start = store.start_minute
+    events = []
+    for row, levels in enumerate(store.levels):
+        events.extend(detector.update(start + row, levels))
+    events.extend(detector.finish())
+    return [e for e in events if e['event'] == 'drain_end']
+
+
+def _stream_records(path):
+    """historical_data records one at a time: NDJSON lines as they are read, otherwise via a LevelStore"""
+    if path.endswith('.ndjson'):
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    from cauldronwatch.reconcile import load_history
+    yield from load_history(path).iter_records()
+
+
+def _overlaps(events, windows):
+    """Number of (cauldron_id, start, end) windows some detected drain overlaps"""
+    detected = {}
+    for cid, start, end in drain_windows(events):
+        detected.setdefault(cid, []).append((start, end))
+    return sum(1 for cid, start, end in windows
+               if any(s <= end and start <= e for s, e in detected.get(cid, ())))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Detect drains in a minute level history, one sample at a time")
+    parser.add_argument('--history', default='historical_data.json',
+                        help="historical_data.json, .ndjson, .bin or a dataset directory (default historical_data.json)")
+    parser.add_argument('--cauldrons', default='cauldrons.json', help="facility file for max volumes (optional)")
+    parser.add_argument('--fill-rates', metavar='PATH', help="fill_rates.json to start the rate/noise averages from")
+    parser.add_argument('-o', '--out', default='detected_drains.json', help="output file (default detected_drains.json)")
+    args = parser.parse_args()
+
+    records = _stream_records(args.history)
+    first = next(records)
+    cauldron_ids = list(first['cauldron_levels'].keys())
+    max_volumes = None
+    if os.path.exists(args.cauldrons):
+        with open(args.cauldrons, 'r') as f:
+            max_volumes = {c['id']: c['max_volume'] for c in json.load(f)['cauldrons']}
+    fill_rates = None
+    if args.fill_rates:
+        fill_rates = FillRateEstimate.load(args.fill_rates)
+    detector = DrainDetector(cauldron_ids, fill_rates, max_volumes)
+    events = detector.feed(first)
+    samples = 1
+    for record in records:
+        events.extend(detector.feed(record))
+        samples += 1
+    events.extend(detector.finish())
+    drains = [e for e in events if e['event'] == 'drain_end']
+    with open(args.out, 'w') as f:
+        json.dump({'metadata': {'samples': samples, 'cauldrons': len(cauldron_ids), 'drains': len(drains)},
+                   'drains': drains}, f, indent=2)
+
+    print(f"Detected {len(drains)} drains in {samples:,} minutes of {len(cauldron_ids)} cauldrons")
+    # Compare with what the generator put into the data, when its files are next to the history
+    if os.path.exists('transport_tickets.json'):
+        with open('transport_tickets.json', 'r') as f:
+            windows = ticket_windows(json.load(f)['transport_tickets'])
+        print(f"   Ticketed collections found: {_overlaps(drains, windows)} of {len(windows)}")
+    if os.path.exists('unreported_drains.json'):
+        with open('unreported_drains.json', 'r') as f:
+            windows = drain_windows(json.load(f)['unreported_drains'])
+        print(f"   Unreported drains found: {_overlaps(drains, windows)} of {len(windows)}")
+    print(f"Wrote {args.out}")
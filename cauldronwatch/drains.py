@@ -0,0 +1,79 @@
+"""
+Schedule of collection drains, keyed by cauldron.
+
+Replaces the `pending_drains` list that every generator copied and scanned
+each minute, and the `cauldrons_needing_collection` dict that was scanned
+for completed collections. Drains wait in a min-heap on start time, move to
+a min-heap on end time once running, and are retired when they end, so
+each minute only touches the drains that are actually running.
+"""
+
+import heapq
+
+
+class ActiveDrains:
+    """Scheduled and running collection drains (start/end inclusive)."""
+
+    def __init__(self, tick):
+        self.tick = tick          # One simulation step (1 for integer minutes)
+        self._by_cauldron = {}    # cauldron_id -> drains not finished yet
+        self._waiting = []        # (start, seq, drain) not started yet
+        self._running = []        # (end, seq, drain) started, not finished
+        self._next_seq = 0        # Tie-breaker so equal times keep insertion order
+
+    def add(self, cauldron_id, start, end, **info):
+        """Schedule a drain; extra keyword arguments are kept on the returned drain dict"""
+        drain = dict(info, cauldron_id=cauldron_id, start=start, end=end)
+        self._by_cauldron.setdefault(cauldron_id, []).append(drain)
+        heapq.heappush(self._waiting, (start, self._next_seq, drain))
+        self._next_seq += 1
+        return drain
+
+    def advance(self, now):
+        """Start drains that begin at/before `now` and retire those that ended before it"""
+        while self._waiting and self._waiting[0][0] <= now:
+            _, seq, drain = heapq.heappop(self._waiting)
+            heapq.heappush(self._running, (drain['end'], seq, drain))
+        while self._running and self._running[0][0] < now:
+            _, _, drain = heapq.heappop(self._running)
+            drains = self._by_cauldron[drain['cauldron_id']]
+            drains.remove(drain)
+            if not drains:
+                del self._by_cauldron[drain['cauldron_id']]
+
+    def running(self):
+        """Drains running at the time of the last advance()"""
+        for _, _, drain in self._running:
+            yield drain
+
+    def busy(self, cauldron_id):
+        """True while the cauldron has a collection scheduled or in progress"""
+        return cauldron_id in self._by_cauldron
+
+    def next_change(self):
+        """Earliest time the set of running drains changes, or None"""
+        times = []
+        if self._waiting:
+            times.append(self._waiting[0][0])
+        if self._running:
+            times.append(self._running[0][0] + self.tick)
+        return min(times) if times else None
+
+    def to_state(self):
+        """Plain-data snapshot (heaps in their current order) for checkpoints"""
+        return {
+            'waiting': [[start, seq, dict(drain)] for start, seq, drain in self._waiting],
+            'running': [[end, seq, dict(drain)] for end, seq, drain in self._running],
+            'next_seq': self._next_seq,
+        }
+
+    @classmethod
+    def from_state(cls, tick, state):
+        """Rebuild from to_state() output"""
+        drains = cls(tick)
+        drains._waiting = [(start, seq, drain) for start, seq, drain in state['waiting']]
+        drains._running = [(end, seq, drain) for end, seq, drain in state['running']]
+        drains._next_seq = state['next_seq']
+        for _, _, drain in sorted(drains._waiting + drains._running, key=lambda entry: entry[1]):
+            drains._by_cauldron.setdefault(drain['cauldron_id'], []).append(drain)
+        return drains
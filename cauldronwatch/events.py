@@ -0,0 +1,51 @@
+"""
+Future-event queue for the event-driven generator loop.
+
+The generator only needs to stop and look at the state when something can
+change: the shift changes or a cauldron is predicted to reach a collection
+threshold (drain starts/ends come from `ActiveDrains`). Everything in
+between is filled in a block at a time by the fill engine.
+"""
+
+import heapq
+from itertools import count
+
+
+class EventQueue:
+    """Min-heap of (time, kind, data) events with lazy cancellation."""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = count()  # Tie-breaker so equal times pop in push order
+
+    def __len__(self):
+        return sum(1 for entry in self._heap if entry[-1])
+
+    def push(self, time, kind, data=None):
+        """Schedule an event; returns a handle that can be passed to cancel()"""
+        entry = [time, next(self._seq), kind, data, True]
+        heapq.heappush(self._heap, entry)
+        return entry
+
+    def cancel(self, handle):
+        """Drop a scheduled event (it is skipped when it reaches the top)"""
+        handle[-1] = False
+
+    def _discard_cancelled(self):
+        while self._heap and not self._heap[0][-1]:
+            heapq.heappop(self._heap)
+
+    def next_time(self):
+        """Time of the earliest pending event, or None"""
+        self._discard_cancelled()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """Remove and return (time, kind, data) for every event at or before `now`, in order"""
+        due = []
+        self._discard_cancelled()
+        while self._heap and self._heap[0][0] <= now:
+            time, _, kind, data, _ = heapq.heappop(self._heap)
+            due.append((time, kind, data))
+            self._discard_cancelled()
+        return due
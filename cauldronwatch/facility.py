@@ -0,0 +1,191 @@
+"""
+Synthetic facility definitions in the cauldrons.json schema, for scale testing.
+
+`generate_facility` lays out M markets on a grid about 2 km apart, each with
+a cluster of cauldrons within ~0.7 km (the reference facility's size), and
+builds a connected broomstick network:
+
+- every cauldron <-> its cluster's market
+- every cauldron <-> its nearest cauldrons in the cluster
+- neighbouring markets <-> each other
+
+Travel times follow the reference network (~8 min + 120 min/km, +-10%).
+Each cauldron also carries `fill_rate` (L/min) and `collection_threshold`
+(fraction of max volume), which regenerate_all_data.py uses in place of its
+hand-tuned tables. All markets are listed under `markets`;
+`enchanted_market` is the first one, so single-market readers keep working.
+
+    python -m cauldronwatch.facility --cauldrons 1200 --markets 4 --couriers-per-shift 40 -o big_cauldrons.json
+"""
+
+import argparse
+import json
+import math
+import random
+
+import numpy as np
+
+# Reference facility (cauldrons.json): market position, cluster radius and cauldron shape
+ORIGIN = (33.2148, -97.13)
+CLUSTER_RADIUS_KM = 0.7
+MARKET_SPACING_KM = 2.0
+CAULDRON_RADIUS_M = 0.4572
+KM_PER_DEGREE = 111.32
+SHIFTS = {1: ('Night', '00:00-08:00'), 2: ('Day', '08:00-16:00'), 3: ('Evening', '16:00-24:00')}
+WITCH_NAMES = ['Aster', 'Blossom', 'Cedar', 'Dahlia', 'Elm', 'Fern', 'Hazel', 'Iris', 'Juniper', 'Laurel',
+               'Maple', 'Nettle', 'Olive', 'Poppy', 'Rowan', 'Sage', 'Thistle', 'Willow', 'Yarrow', 'Zinnia']
+
+
+def travel_minutes(km, rng):
+    """Broomstick travel time for a distance, fitted to the reference network"""
+    return max(5, round((8 + 120 * km) * rng.uniform(0.9, 1.1)))
+
+
+def _positions_km(lat, lon):
+    """(n x 2) east/north offsets in km from ORIGIN"""
+    north = (np.asarray(lat) - ORIGIN[0]) * KM_PER_DEGREE
+    east = (np.asarray(lon) - ORIGIN[1]) * KM_PER_DEGREE * math.cos(math.radians(ORIGIN[0]))
+    return np.column_stack([east, north])
+
+
+def nearest_neighbours(points, k, chunk_rows=512):
+    """Indices of the k nearest other points for each row of an (n x 2) array, in chunks of rows"""
+    n = len(points)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((n, 0), dtype=int)
+    result = np.empty((n, k), dtype=int)
+    for first in range(0, n, chunk_rows):
+        block = points[first:first + chunk_rows]
+        dist = ((block[:, None, :] - points[None, :, :]) ** 2).sum(axis=2)
+        dist[np.arange(len(block)), np.arange(first, first + len(block))] = np.inf  # Not yourself
+        nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(dist, nearest, axis=1).argsort(axis=1)
+        result[first:first + len(block)] = np.take_along_axis(nearest, order, axis=1)
+    return result
+
+
+def generate_facility(n_cauldrons, n_markets=1, couriers_per_shift=4, neighbours=2, seed=0):
+    """A cauldrons.json-shaped dict: cauldrons, markets, a connected network and couriers"""
+    if n_cauldrons < 1 or n_markets < 1:
+        raise ValueError("need at least one cauldron and one market")
+    rng = random.Random(seed)
+    lat_per_km = 1 / KM_PER_DEGREE
+    lon_per_km = 1 / (KM_PER_DEGREE * math.cos(math.radians(ORIGIN[0])))
+
+    # Markets on a square grid around the reference market
+    columns = math.ceil(math.sqrt(n_markets))
+    markets = []
+    for m in range(n_markets):
+        row, col = divmod(m, columns)
+        markets.append({
+            'id': f"market_{m + 1:03d}",
+            'name': 'The Enchanted Market' if m == 0 else f"Enchanted Market {m + 1}",
+            'latitude': round(ORIGIN[0] + row * MARKET_SPACING_KM * lat_per_km, 6),
+            'longitude': round(ORIGIN[1] + col * MARKET_SPACING_KM * lon_per_km, 6),
+            'description': 'Central trading hub for all potion commerce' if m == 0 else 'Regional potion trading hub',
+        })
+
+    # Cauldrons spread evenly over the markets, uniformly inside each cluster's disc
+    width = max(3, len(str(n_cauldrons)))
+    cauldrons = []
+    cluster_of = []
+    for i in range(n_cauldrons):
+        market = markets[i % n_markets]
+        distance = CLUSTER_RADIUS_KM * math.sqrt(rng.uniform(0.01, 1.0))
+        angle = rng.uniform(0, 2 * math.pi)
+        max_volume = rng.randrange(600, 1201, 50)
+        height_m = max_volume / 1000 / (math.pi * CAULDRON_RADIUS_M ** 2)
+        cauldrons.append({
+            'id': f"cauldron_{i + 1:0{width}d}",
+            'name': f"Cauldron {i + 1}",
+            'latitude': round(market['latitude'] + distance * math.sin(angle) * lat_per_km, 6),
+            'longitude': round(market['longitude'] + distance * math.cos(angle) * lon_per_km, 6),
+            'max_volume': max_volume,
+            'type': 'premium' if max_volume >= 900 else 'standard',
+            'radius_meters': CAULDRON_RADIUS_M,
+            'radius_feet': 1.5,
+            'radius_inches': 18.0,
+            'height_feet': round(height_m / 0.3048, 2),
+            'height_inches': round(height_m / 0.0254, 2),
+            'max_height_feet': round(height_m / 0.3048, 2),
+            'max_height_inches': round(height_m / 0.0254, 2),
+            # Same ranges as regenerate_all_data.py's tables
+            'fill_rate': round(rng.uniform(0.013, 0.110), 3),
+            'collection_threshold': round(rng.uniform(0.38, 0.52), 2),
+        })
+        cluster_of.append(i % n_markets)
+
+    positions = _positions_km([c['latitude'] for c in cauldrons], [c['longitude'] for c in cauldrons])
+    market_positions = _positions_km([m['latitude'] for m in markets], [m['longitude'] for m in markets])
+    edges = []
+    seen = set()
+
+    def add_edge(a, b, km):
+        key = tuple(sorted((a, b)))
+        if a == b or key in seen:
+            return
+        seen.add(key)
+        edges.append({'from': a, 'to': b, 'travel_time_minutes': travel_minutes(km, rng), 'distance_km': round(km, 3)})
+
+    for i, cauldron in enumerate(cauldrons):
+        m = cluster_of[i]
+        add_edge(cauldron['id'], markets[m]['id'], float(np.hypot(*(positions[i] - market_positions[m]))))
+    cluster_members = [list(range(m, n_cauldrons, n_markets)) for m in range(n_markets)]
+    for members in cluster_members:
+        local = positions[members]
+        for row, near in enumerate(nearest_neighbours(local, neighbours)):
+            for j in near:
+                add_edge(cauldrons[members[row]]['id'], cauldrons[members[j]]['id'],
+                         float(np.hypot(*(local[row] - local[j]))))
+    # Markets in grid order: each links to the next one and to the one below it
+    for m in range(n_markets):
+        for other in (m + 1 if (m + 1) % columns else None, m + columns):
+            if other is not None and other < n_markets:
+                add_edge(markets[m]['id'], markets[other]['id'],
+                         float(np.hypot(*(market_positions[m] - market_positions[other]))))
+
+    couriers = []
+    for shift, (shift_name, hours) in SHIFTS.items():
+        for n in range(couriers_per_shift):
+            index = (shift - 1) * couriers_per_shift + n  # Unique across shifts
+            name = f"Witch {WITCH_NAMES[index % len(WITCH_NAMES)]}"
+            if index >= len(WITCH_NAMES):
+                name += f" {index // len(WITCH_NAMES) + 1}"
+            couriers.append({
+                'courier_id': f"courier_witch_{shift:02d}_{n + 1:02d}",
+                'name': name,
+                'max_carrying_capacity': 500,
+                'shift': shift,
+                'shift_name': shift_name,
+                'shift_hours': hours,
+                'description': f"{name} works the {shift_name} shift ({hours})",
+            })
+
+    return {
+        'cauldrons': cauldrons,
+        'enchanted_market': markets[0],
+        'markets': markets,
+        'couriers': couriers,
+        'network': {
+            'edges': edges,
+            'description': f"Synthetic network: {n_cauldrons} cauldrons, {n_markets} markets (seed {seed})",
+        },
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic facility definition (cauldrons.json schema)")
+    parser.add_argument('--cauldrons', type=int, default=1200, help="number of cauldrons (default 1200)")
+    parser.add_argument('--markets', type=int, default=1, help="number of markets (default 1)")
+    parser.add_argument('--couriers-per-shift', type=int, default=4, help="couriers per shift (default 4)")
+    parser.add_argument('--neighbours', type=int, default=2, help="cauldron-cauldron edges per cauldron (default 2)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--out', default='cauldrons_synthetic.json', help="output file")
+    args = parser.parse_args()
+
+    facility = generate_facility(args.cauldrons, args.markets, args.couriers_per_shift, args.neighbours, args.seed)
+    with open(args.out, 'w') as f:
+        json.dump(facility, f, indent=2)
+    print(f"Wrote {args.out}: {len(facility['cauldrons'])} cauldrons, {len(facility['markets'])} markets, "
+          f"{len(facility['network']['edges'])} edges, {len(facility['couriers'])} couriers")
@@ -0,0 +1,295 @@
+"""
+Fill-rate estimation from the level history.
+
+Each script used to carry its own `fill_rates` dict (regenerate_all_data.py
+0.013-0.110 L/min, the extend scripts 5-16 L/min for the same cauldrons).
+This fits them from the data instead, over the whole (minutes x cauldrons)
+level matrix at once:
+
+- minutes inside a collection or drain window are masked out: the windows
+  become +1/-1 markers at their start/end and a cumulative sum along time
+  turns them into a per-cauldron mask; minutes where a cauldron sits at its
+  max_volume (no room to fill) are masked too
+- the fill rate is the mean minute-to-minute change over the remaining
+  minutes after cutting the extreme `trim` share at both ends (drains nobody
+  reported, spikes)
+- the noise level is the spread of those changes around the rate, both in
+  liters and relative to the level (the fill jitter scales with the level)
+- hourly rates are the same mean per clock hour, kept as sums and counts so
+  any trailing window (e.g. 24 h) is a difference of cumulative sums
+
+Results are saved as fill_rates.json and loaded by the generators
+(CAULDRONWATCH_FILL_RATES), the reconciliation (cauldronwatch.reconcile)
+and the drain detector (cauldronwatch.detector) in place of hard-coded
+dicts.
+
+Command line:
+
+    python -m cauldronwatch.fillrates [--history historical_data.json] [-o fill_rates.json]
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from cauldronwatch.minutes import format_minute, parse_minute
+
+# Share of the idle-minute changes cut from each end before averaging
+DEFAULT_TRIM = 0.01
+FULL_FRACTION = 0.999       # At/above this share of max_volume a cauldron cannot fill
+FORMAT_VERSION = 1
+
+
+def ticket_windows(tickets):
+    """(cauldron_id, start minute, end minute) of each transport ticket's collection"""
+    return [(t['cauldron_id'], parse_minute(t['collection_start_timestamp']), parse_minute(t['collection_timestamp']))
+            for t in tickets]
+
+
+def drain_windows(drains):
+    """(cauldron_id, start minute, end minute) of unreported drains (or detector drain_end events)"""
+    return [(d['cauldron_id'], parse_minute(d['drain_start_timestamp']), parse_minute(d['drain_end_timestamp']))
+            for d in drains]
+
+
+def window_rows(store, windows):
+    """(column, start row, end row) arrays for windows; unknown cauldrons get column -1"""
+    start_minute = store.start_minute
+    columns = np.fromiter((store.columns.get(w[0], -1) for w in windows), dtype=np.int64, count=len(windows))
+    starts = np.fromiter((w[1] for w in windows), dtype=np.int64, count=len(windows)) - start_minute
+    ends = np.fromiter((w[2] for w in windows), dtype=np.int64, count=len(windows)) - start_minute
+    return columns, starts, ends
+
+
+def window_mask(n_rows, first_column, n_columns, columns, starts, ends):
+    """(n_rows x n_columns) bool array of the minutes covered by a window (inclusive),
+    for the cauldron columns first_column .. first_column + n_columns - 1"""
+    keep = (columns >= first_column) & (columns < first_column + n_columns) & (ends >= starts)
+    markers = np.zeros((n_rows + 1, n_columns), dtype=np.int32)
+    np.add.at(markers, (np.clip(starts[keep], 0, n_rows), columns[keep] - first_column), 1)
+    np.add.at(markers, (np.clip(ends[keep] + 1, 0, n_rows), columns[keep] - first_column), -1)
+    return np.cumsum(markers[:n_rows], axis=0) > 0
+
+
+class FillRateEstimate:
+    """Fitted fill rates and noise per cauldron, plus per-hour rate sums/counts."""
+
+    def __init__(self, cauldron_ids, rates, noise_liters, noise_relative, idle_minutes,
+                 hour_start_minute, hourly_sums, hourly_counts, start_minute=None, end_minute=None):
+        self.cauldron_ids = list(cauldron_ids)
+        self.rates = np.asarray(rates, dtype=float)                  # L/min
+        self.noise_liters = np.asarray(noise_liters, dtype=float)    # Std of the minute change (L)
+        self.noise_relative = np.asarray(noise_relative, dtype=float)  # Same, as a share of the level
+        self.idle_minutes = np.asarray(idle_minutes, dtype=np.int64)
+        self.hour_start_minute = hour_start_minute                   # Epoch minute of hourly row 0
+        self.hourly_sums = np.asarray(hourly_sums, dtype=float)      # (hours x cauldrons)
+        self.hourly_counts = np.asarray(hourly_counts, dtype=np.int64)
+        self.start_minute = start_minute
+        self.end_minute = end_minute
+
+    def as_dict(self):
+        """{cauldron_id: fill rate}, the shape of the generators' fill_rates tables"""
+        return dict(zip(self.cauldron_ids, self.rates.tolist()))
+
+    @property
+    def hourly(self):
+        """(hours x cauldrons) mean rate per clock hour; NaN for hours without idle minutes"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.hourly_counts > 0, self.hourly_sums / self.hourly_counts, np.nan)
+
+    def rolling(self, hours=24):
+        """(hours x cauldrons) rate over the trailing `hours` hours ending with each hour"""
+        sums = np.cumsum(self.hourly_sums, axis=0)
+        counts = np.cumsum(self.hourly_counts, axis=0)
+        sums[hours:] -= sums[:-hours].copy()
+        counts[hours:] -= counts[:-hours].copy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    def per_minute(self, start_minute, minutes, cauldron_ids=None, hours=1):
+        """(minutes x cauldrons) rates from the trailing-`hours` estimates (overall rate where an
+        hour has no data), aligned with a history starting at `start_minute`; columns in
+        `cauldron_ids` order (default: this estimate's)"""
+        by_hour = self.hourly if hours == 1 else self.rolling(hours)
+        by_hour = np.where(np.isnan(by_hour), self.rates, by_hour)
+        if cauldron_ids is not None:
+            by_hour = by_hour[:, [self.cauldron_ids.index(cid) for cid in cauldron_ids]]
+        rows = (np.arange(start_minute, start_minute + minutes) - self.hour_start_minute) // 60
+        return by_hour[np.clip(rows, 0, len(by_hour) - 1)]
+
+    def to_json(self):
+        return {
+            'metadata': {
+                'format_version': FORMAT_VERSION,
+                'start': format_minute(self.start_minute) if self.start_minute is not None else None,
+                'end': format_minute(self.end_minute) if self.end_minute is not None else None,
+                'units': 'liters per minute',
+            },
+            'cauldrons': {
+                cid: {
+                    'fill_rate': round(float(rate), 5),
+                    'noise_liters': round(float(noise), 5),
+                    'noise_relative': round(float(relative), 7),
+                    'idle_minutes': int(idle),
+                }
+                for cid, rate, noise, relative, idle in zip(self.cauldron_ids, self.rates, self.noise_liters,
+                                                            self.noise_relative, self.idle_minutes)
+            },
+            'hourly': {
+                'start': format_minute(self.hour_start_minute),
+                'cauldron_ids': self.cauldron_ids,
+                'sums': np.round(self.hourly_sums, 4).tolist(),
+                'counts': self.hourly_counts.tolist(),
+            },
+        }
+
+    def write(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_json(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data['metadata'].get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported fill rate format {data['metadata'].get('format_version')}")
+        cauldron_ids = list(data['cauldrons'].keys())
+        fits = [data['cauldrons'][cid] for cid in cauldron_ids]
+        hourly = data['hourly']
+        order = [hourly['cauldron_ids'].index(cid) for cid in cauldron_ids]
+        sums = np.array(hourly['sums'], dtype=float).reshape(-1, len(hourly['cauldron_ids']))[:, order]
+        counts = np.array(hourly['counts'], dtype=np.int64).reshape(-1, len(hourly['cauldron_ids']))[:, order]
+        start, end = data['metadata'].get('start'), data['metadata'].get('end')
+        return cls(cauldron_ids, [f['fill_rate'] for f in fits], [f['noise_liters'] for f in fits],
+                   [f['noise_relative'] for f in fits], [f['idle_minutes'] for f in fits],
+                   parse_minute(hourly['start']), sums, counts,
+                   parse_minute(start) if start else None, parse_minute(end) if end else None)
+
+
+def load_fill_rates(path):
+    """{cauldron_id: fill rate} from a fill_rates.json written by this module"""
+    return FillRateEstimate.load(path).as_dict()
+
+
+def load_or_estimate(store, fill_rates_path=None, max_volumes=None, tickets_path='transport_tickets.json'):
+    """The command lines' fill rates: `fill_rates_path` when given, otherwise fitted to `store`
+    leaving out the collections in `tickets_path` (if that file exists)"""
+    if fill_rates_path:
+        return FillRateEstimate.load(fill_rates_path)
+    windows = []
+    if os.path.exists(tickets_path):
+        with open(tickets_path, 'r') as f:
+            windows = ticket_windows(json.load(f)['transport_tickets'])
+    return estimate_fill_rates(store, windows, max_volumes)
+
+
+def estimate_fill_rates(store, windows=(), max_volumes=None, trim=DEFAULT_TRIM, chunk_columns=64):
+    """
+    Fit a FillRateEstimate to a LevelStore in one vectorized pass per block of
+    `chunk_columns` cauldrons (to bound memory on wide histories).
+
+    `windows` are (cauldron_id, start minute, end minute) collections/drains to
+    leave out (see ticket_windows / drain_windows); `max_volumes` is a
+    {cauldron_id: liters} dict or array used to leave out minutes at capacity.
+    """
+    levels = store.levels
+    n_rows, n_columns = levels.shape
+    columns, starts, ends = window_rows(store, windows)
+    if isinstance(max_volumes, dict):
+        max_volumes = [max_volumes.get(cid, np.inf) for cid in store.cauldron_ids]
+    full = np.full(n_columns, np.inf) if max_volumes is None else np.asarray(max_volumes, dtype=float) * FULL_FRACTION
+
+    # Change row k is the change into minute start + k + 1. Hourly row i is the clock hour
+    # starting at hour_start + 60 * i: it begins at change row 0 or where the minute is a multiple of 60
+    first_minute = store.start_minute + 1
+    hour_start = first_minute // 60 * 60
+    boundaries = np.arange(0, max(n_rows - 1, 1), 60) + (hour_start + 60 - first_minute) % 60
+    boundaries = np.unique(np.concatenate([[0], boundaries[boundaries < max(n_rows - 1, 1)]]))
+
+    rates = np.zeros(n_columns)
+    noise_liters = np.zeros(n_columns)
+    noise_relative = np.zeros(n_columns)
+    idle_minutes = np.zeros(n_columns, dtype=np.int64)
+    hourly_sums = np.zeros((len(boundaries), n_columns))
+    hourly_counts = np.zeros((len(boundaries), n_columns), dtype=np.int64)
+    if n_rows < 2:
+        return FillRateEstimate(store.cauldron_ids, rates, noise_liters, noise_relative, idle_minutes,
+                                hour_start, hourly_sums, hourly_counts, store.start_minute, store.start_minute)
+
+    for first in range(0, n_columns, chunk_columns):
+        block = np.asarray(levels[:, first:first + chunk_columns], dtype=float)
+        width = block.shape[1]
+        cols = slice(first, first + width)
+        changes = np.diff(block, axis=0)
+        idle = ~window_mask(n_rows, first, width, columns, starts, ends)[1:]
+        idle &= ~((block[1:] >= full[cols]) & (changes >= 0))
+
+        # Trim both tails of each cauldron's idle changes
+        masked = np.where(idle, changes, np.nan)
+        has_idle = idle.any(axis=0)
+        low = np.full(width, -np.inf)
+        high = np.full(width, np.inf)
+        if has_idle.any():
+            low[has_idle], high[has_idle] = np.nanpercentile(masked[:, has_idle], [100 * trim, 100 * (1 - trim)], axis=0)
+        kept = idle & (changes >= low) & (changes <= high)
+        counts = kept.sum(axis=0)
+        kept_changes = np.where(kept, changes, 0.0)
+        rates[cols] = kept_changes.sum(axis=0) / np.maximum(counts, 1)
+        idle_minutes[cols] = counts
+
+        # Noise around the fitted rate, in liters and relative to the level before the change
+        deviation = np.where(kept, changes - rates[cols], 0.0)
+        noise_liters[cols] = np.sqrt((deviation ** 2).sum(axis=0) / np.maximum(counts - 1, 1))
+        relative = deviation / np.maximum(block[:-1], 1.0)
+        noise_relative[cols] = np.sqrt((relative ** 2).sum(axis=0) / np.maximum(counts - 1, 1))
+
+        hourly_sums[:, cols] = np.add.reduceat(kept_changes, boundaries, axis=0)
+        hourly_counts[:, cols] = np.add.reduceat(kept.astype(np.int64), boundaries, axis=0)
+
+    return FillRateEstimate(store.cauldron_ids, rates, noise_liters, noise_relative, idle_minutes,
+                            hour_start, hourly_sums, hourly_counts,
+                            store.start_minute, store.start_minute + n_rows - 1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fit per-cauldron fill rates and noise from the level history")
+    parser.add_argument('--history', default='historical_data.json',
+                        help="historical_data.json, .ndjson, .bin or a dataset directory (default historical_data.json)")
+    parser.add_argument('--tickets', default='transport_tickets.json', help="collections to leave out (if present)")
+    parser.add_argument('--drains', default='unreported_drains.json', help="drains to leave out (if present)")
+    parser.add_argument('--cauldrons', default='cauldrons.json', help="facility file for max volumes (if present)")
+    parser.add_argument('--trim', type=float, default=DEFAULT_TRIM, help=f"tail share cut at each end (default {DEFAULT_TRIM})")
+    parser.add_argument('-o', '--out', default='fill_rates.json', help="output file (default fill_rates.json)")
+    args = parser.parse_args()
+
+    from cauldronwatch.reconcile import load_history
+    store = load_history(args.history)
+    windows = []
+    if os.path.isdir(args.history):
+        from cauldronwatch.segments import SegmentedDataset
+        _, tickets, drains = SegmentedDataset(args.history).read_all()
+        windows = ticket_windows(tickets) + drain_windows(drains)
+    else:
+        if os.path.exists(args.tickets):
+            with open(args.tickets, 'r') as f:
+                windows += ticket_windows(json.load(f)['transport_tickets'])
+        if os.path.exists(args.drains):
+            with open(args.drains, 'r') as f:
+                windows += drain_windows(json.load(f)['unreported_drains'])
+    max_volumes = None
+    if os.path.exists(args.cauldrons):
+        with open(args.cauldrons, 'r') as f:
+            max_volumes = {c['id']: c['max_volume'] for c in json.load(f)['cauldrons']}
+
+    estimate = estimate_fill_rates(store, windows, max_volumes, trim=args.trim)
+    estimate.write(args.out)
+    print(f"Fitted {len(estimate.cauldron_ids)} cauldrons over {len(store):,} minutes "
+          f"({len(windows)} collection/drain windows left out)")
+    for cid, rate, noise, idle in zip(estimate.cauldron_ids, estimate.rates.tolist(),
+                                      estimate.noise_liters.tolist(), estimate.idle_minutes.tolist()):
+        print(f"   {cid}: {rate:.4f} L/min  (noise {noise:.3f} L, {idle:,} idle minutes)")
+    print(f"Wrote {args.out}")
@@ -0,0 +1,191 @@
+"""
+Overflow forecasting for every cauldron at once.
+
+Between collections a cauldron's level is a random walk with drift: it
+gains its fill rate r per minute plus noise with a per-minute spread sigma
+(both fitted by cauldronwatch.fillrates). t minutes ahead the level is
+
+    mean  = level + r * t
+    band  = mean -/+ z * sigma * sqrt(t)      (clipped to 0 .. max_volume)
+
+and a target d liters above the current level (the collection threshold
+or max_volume) is reached when the band crosses it. Solving
+r * t +/- z * sigma * sqrt(t) = d for sqrt(t) gives the earliest (upper
+band) and latest (lower band) time in closed form:
+
+    sqrt(t) = 2 d / (sqrt(z^2 sigma^2 + 4 r d) +/- z sigma)
+
+with the expected time d / r in between. A slow or stalled cauldron gets
+an infinite latest/expected time, and one already past the target gets 0.
+
+`Forecaster` keeps the per-cauldron parameters as arrays, so each call is a
+few array operations over (cauldrons x horizons) - cheap enough to run on
+every minute of the live feed.
+
+Command line (latest levels of a history file):
+
+    python -m cauldronwatch.forecast [--history historical_data.json] [--fill-rates fill_rates.json]
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from cauldronwatch.fillrates import FillRateEstimate, load_or_estimate
+from cauldronwatch.minutes import MINUTES_PER_DAY, format_minute
+
+DEFAULT_HORIZONS = (60, 240, 480, 1440)    # Minutes ahead
+DEFAULT_Z = 1.645                          # Band width: 90% two-sided / 95% one-sided
+# Times further out than this are reported as "not within reach" (a near-zero rate gives
+# finite but astronomically large times that no timestamp can hold)
+MAX_FORECAST_MINUTES = 100 * 365 * MINUTES_PER_DAY
+
+
+def minutes_to_reach(levels, targets, rates, sigma, z=DEFAULT_Z):
+    """(expected, earliest, latest) minutes until each level reaches its target (arrays, broadcast)"""
+    levels, targets, rates, sigma = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (levels, targets, rates, sigma)))
+    distance = np.maximum(targets - levels, 0.0)
+    spread = z * sigma
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = np.where(rates > 0, distance / rates, np.inf)
+        root = np.sqrt(spread ** 2 + 4 * rates * distance)   # NaN: the upper band never gets there
+        early = 2 * distance / (root + spread)
+        late = 2 * distance / (root - spread)
+    reached = distance == 0
+    expected = np.where(reached, 0.0, expected)
+    earliest = np.where(reached, 0.0, np.where(np.isnan(root), np.inf, early ** 2))
+    latest = np.where(reached, 0.0, np.where(np.isnan(root) | (root <= spread), np.inf, late ** 2))
+    return expected, earliest, latest
+
+
+class OverflowForecast:
+    """One forecast: per-cauldron arrays, and (cauldrons x horizons) level bands."""
+
+    def __init__(self, cauldron_ids, now_minute, levels, horizons, level_mean, level_low, level_high,
+                 to_threshold, to_full):
+        self.cauldron_ids = cauldron_ids
+        self.now_minute = now_minute
+        self.levels = levels
+        self.horizons = horizons
+        self.level_mean = level_mean
+        self.level_low = level_low
+        self.level_high = level_high
+        self.to_threshold = to_threshold   # (expected, earliest, latest) minutes
+        self.to_full = to_full
+
+    def overflow_within(self, minutes):
+        """Bool array: the upper band reaches max_volume within `minutes`"""
+        return self.to_full[1] <= minutes
+
+    def records(self):
+        """One dict per cauldron; times as timestamps (None = not within reach)"""
+        def timestamps(values):
+            if self.now_minute is None:
+                return [None if v > MAX_FORECAST_MINUTES else round(v, 1) for v in values.tolist()]
+            return [None if v > MAX_FORECAST_MINUTES else format_minute(self.now_minute + int(np.ceil(v)))
+                    for v in values.tolist()]
+
+        threshold = [timestamps(a) for a in self.to_threshold]
+        full = [timestamps(a) for a in self.to_full]
+        rows = []
+        for i, cid in enumerate(self.cauldron_ids):
+            rows.append({
+                'cauldron_id': cid,
+                'level': round(float(self.levels[i]), 2),
+                'threshold_expected': threshold[0][i], 'threshold_earliest': threshold[1][i], 'threshold_latest': threshold[2][i],
+                'full_expected': full[0][i], 'full_earliest': full[1][i], 'full_latest': full[2][i],
+                'horizons': [
+                    {'minutes': int(h), 'mean': round(float(m), 2), 'low': round(float(lo), 2), 'high': round(float(hi), 2)}
+                    for h, m, lo, hi in zip(self.horizons, self.level_mean[i], self.level_low[i], self.level_high[i])
+                ],
+            })
+        return rows
+
+
+class Forecaster:
+    """Vectorized overflow forecaster for a fixed, ordered set of cauldrons."""
+
+    def __init__(self, cauldron_ids, rates, noise, max_volumes, thresholds, horizons=DEFAULT_HORIZONS, z=DEFAULT_Z):
+        """`rates` (L/min) and `noise` (L per minute, std) per cauldron; `thresholds` in liters.
+        Dicts are looked up by cauldron id, anything else is taken in `cauldron_ids` order."""
+        self.cauldron_ids = list(cauldron_ids)
+
+        def column(values):
+            if isinstance(values, dict):
+                values = [values[cid] for cid in self.cauldron_ids]
+            return np.broadcast_to(np.asarray(values, dtype=float), (len(self.cauldron_ids),)).copy()
+
+        self.rates = column(rates)
+        self.noise = column(noise)
+        self.max_volumes = column(max_volumes)
+        self.thresholds = column(thresholds)
+        self.horizons = np.asarray(horizons, dtype=float)
+        self.z = z
+        self._sqrt_horizons = np.sqrt(self.horizons)
+
+    @classmethod
+    def from_estimate(cls, estimate, cauldrons, thresholds, **kwargs):
+        """From a FillRateEstimate, the cauldrons.json cauldrons ({id: cauldron}) and
+        {cauldron_id: threshold as a share of max_volume}"""
+        fitted = dict(zip(estimate.cauldron_ids, zip(estimate.rates.tolist(), estimate.noise_liters.tolist())))
+        ids = [cid for cid in estimate.cauldron_ids if cid in cauldrons]
+        return cls(ids, [fitted[cid][0] for cid in ids], [fitted[cid][1] for cid in ids],
+                   [cauldrons[cid]['max_volume'] for cid in ids],
+                   [thresholds[cid] * cauldrons[cid]['max_volume'] for cid in ids], **kwargs)
+
+    def __call__(self, levels, now_minute=None):
+        """Forecast from the current levels (in `cauldron_ids` order, or a {cauldron_id: level} dict)"""
+        if isinstance(levels, dict):
+            levels = [levels[cid] for cid in self.cauldron_ids]
+        levels = np.asarray(levels, dtype=float)
+
+        mean = levels[:, None] + self.rates[:, None] * self.horizons
+        spread = self.z * self.noise[:, None] * self._sqrt_horizons
+        top = self.max_volumes[:, None]
+        level_mean = np.clip(mean, 0, top)
+        level_low = np.clip(mean - spread, 0, top)
+        level_high = np.clip(mean + spread, 0, top)
+
+        to_threshold = minutes_to_reach(levels, self.thresholds, self.rates, self.noise, self.z)
+        to_full = minutes_to_reach(levels, self.max_volumes, self.rates, self.noise, self.z)
+        return OverflowForecast(self.cauldron_ids, now_minute, levels, self.horizons, level_mean, level_low,
+                                level_high, to_threshold, to_full)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Forecast when each cauldron reaches its threshold and overflows")
+    parser.add_argument('--history', default='historical_data.json',
+                        help="historical_data.json, .ndjson, .bin or a dataset directory (default historical_data.json)")
+    parser.add_argument('--fill-rates', metavar='PATH',
+                        help="fill_rates.json (default: fit from the history, leaving out transport_tickets.json windows)")
+    parser.add_argument('--cauldrons', default='cauldrons.json', help="facility file (default cauldrons.json)")
+    parser.add_argument('--horizons', default=','.join(map(str, DEFAULT_HORIZONS)),
+                        help="comma-separated minutes ahead (default %(default)s)")
+    parser.add_argument('--z', type=float, default=DEFAULT_Z, help=f"band width in noise stds (default {DEFAULT_Z})")
+    parser.add_argument('-o', '--out', default='overflow_forecast.json', help="output file (default overflow_forecast.json)")
+    args = parser.parse_args()
+
+    from cauldronwatch.generator.config import scenario_rates
+    from cauldronwatch.reconcile import load_history
+
+    store = load_history(args.history)
+    with open(args.cauldrons, 'r') as f:
+        cauldrons = {c['id']: c for c in json.load(f)['cauldrons']}
+    estimate = load_or_estimate(store, args.fill_rates, {cid: c['max_volume'] for cid, c in cauldrons.items()})
+    _, thresholds = scenario_rates(cauldrons)
+    forecaster = Forecaster.from_estimate(estimate, cauldrons, thresholds,
+                                          horizons=[int(h) for h in args.horizons.split(',')], z=args.z)
+    now = store.start_minute + len(store) - 1
+    forecast = forecaster(store.row(-1), now)
+    tmp_path = args.out + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'metadata': {'as_of': format_minute(now), 'z': args.z}, 'cauldrons': forecast.records()}, f, indent=2)
+    os.replace(tmp_path, args.out)
+
+    print(f"Forecast as of {format_minute(now)} for {len(forecaster.cauldron_ids)} cauldrons:")
+    for row in forecast.records():
+        print(f"   {row['cauldron_id']}: {row['level']:.1f} L, threshold {row['threshold_expected'] or '-'} "
+              f"(earliest {row['threshold_earliest'] or '-'}), full {row['full_expected'] or '-'}")
+    print(f"Wrote {args.out}")
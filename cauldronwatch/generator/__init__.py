@@ -0,0 +1,52 @@
+"""
+The CauldronWatch data generator as a library.
+
+    from cauldronwatch.generator import GeneratorConfig, simulate
+    result = simulate(GeneratorConfig(end_minute=GeneratorConfig().start_minute + 59))
+    result['history'], result['transport_tickets'], result['unreported_drains']
+
+`main()` is the command line (regenerate_all_data.py is a thin wrapper
+around it). Importing this package does nothing but define names; the
+submodules - and numpy with them - load on first use of a name that needs
+them, and cauldrons.json is only read when a simulation asks for it.
+
+- config: GeneratorConfig, config_from_env, the fill-rate/threshold tables
+- inputs: Facility (lazily loaded cauldrons.json, travel times, home markets)
+- couriers: get_witch_shift, is_witch_available
+- simulation: simulate, add_unreported_drains, replay_unreported_drains
+- output: write_outputs
+- cli: main
+"""
+
+import importlib
+
+_EXPORTS = {
+    'GeneratorConfig': 'config',
+    'config_from_env': 'config',
+    'scenario_rates': 'config',
+    'FILL_RATES': 'config',
+    'COLLECTION_THRESHOLDS': 'config',
+    'Facility': 'inputs',
+    'get_witch_shift': 'couriers',
+    'is_witch_available': 'couriers',
+    'simulate': 'simulation',
+    'add_unreported_drains': 'simulation',
+    'replay_unreported_drains': 'simulation',
+    'write_outputs': 'output',
+    'main': 'cli',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value  # Later lookups skip this function
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
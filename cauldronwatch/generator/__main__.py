@@ -0,0 +1,3 @@
+from cauldronwatch.generator.cli import main
+
+main()
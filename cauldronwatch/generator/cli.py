@@ -0,0 +1,44 @@
+"""
+Command-line entry point: `python regenerate_all_data.py` or
+`python -m cauldronwatch.generator`.
+"""
+
+import sys
+
+from cauldronwatch.generator.config import config_from_env
+from cauldronwatch.generator.output import write_outputs
+from cauldronwatch.generator.simulation import simulate
+from cauldronwatch.minutes import to_datetime
+
+
+def print_summary(result):
+    history = result['history']
+    transport_tickets = result['transport_tickets']
+    unreported_drains = result['unreported_drains']
+    collections_per_cauldron = result['collections_per_cauldron']
+
+    print("\n" + "=" * 70)
+    print("✅ Data regeneration complete!")
+    print("=" * 70)
+    print(f"   Period: {to_datetime(result['start_minute']).strftime('%Y-%m-%d')} to {to_datetime(result['end_minute']).strftime('%Y-%m-%d')}")
+    print(f"   Total minutes: {history.total_minutes:,}")
+    print(f"   Transport tickets: {len(transport_tickets)}")
+    print(f"   Unreported drains: {len(unreported_drains)}")
+    print(f"   Suspicious tickets: {sum(1 for t in transport_tickets if t.get('is_suspicious'))}")
+    if result['profile']:
+        print(f"   Profile report: {result['config'].profile_path}")
+
+    print(f"\nTicket distribution:")
+    for cid in sorted(collections_per_cauldron.keys()):
+        print(f"   {cid}: {collections_per_cauldron[cid]}")
+
+
+def main(argv=None, config=None):
+    """Simulate (settings from the environment and `--profile` unless `config` is given),
+    write the output files and print a summary. Returns simulate()'s result."""
+    if config is None:
+        config = config_from_env(argv=sys.argv[1:] if argv is None else argv)
+    result = simulate(config)
+    write_outputs(result)
+    print_summary(result)
+    return result
@@ -0,0 +1,24 @@
+"""
+Witch shifts and availability.
+"""
+
+from cauldronwatch.generator.config import TRIP_BUFFER
+from cauldronwatch.minutes import MINUTES_PER_DAY
+
+
+def get_witch_shift(minute):
+    hour = minute % MINUTES_PER_DAY // 60
+    if 0 <= hour < 8:
+        return 1
+    elif 8 <= hour < 16:
+        return 2
+    else:
+        return 3
+
+
+def is_witch_available(witch_id, start_time, end_time, courier_timelines, buffer=TRIP_BUFFER):
+    """Check if witch is available for the entire period, including buffer time"""
+    if witch_id not in courier_timelines:
+        return True
+    # Buffer before start and after end ensures adequate spacing
+    return courier_timelines[witch_id].is_free(start_time, end_time, buffer)
@@ -0,0 +1,67 @@
+"""
+The facility a run simulates: cauldrons, couriers, markets and the network.
+
+`Facility` reads cauldrons.json (or takes an already-loaded dict, e.g. from
+cauldronwatch.facility.generate_facility) and derives everything else on
+first use, so building one costs nothing until a value is needed and the
+travel-time matrix is only loaded by code that asks for travel times.
+"""
+
+import json
+from collections import defaultdict
+from functools import cached_property
+
+from cauldronwatch.network import load_travel_times
+
+
+class Facility:
+    """Lazily loaded facility definition in the cauldrons.json schema."""
+
+    def __init__(self, path='cauldrons.json', data=None):
+        self.path = path
+        if data is not None:
+            self.data = data
+
+    @cached_property
+    def data(self):
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    @cached_property
+    def cauldrons(self):
+        return {c['id']: c for c in self.data['cauldrons']}
+
+    @cached_property
+    def couriers(self):
+        return self.data['couriers']
+
+    @cached_property
+    def network_edges(self):
+        return self.data['network']['edges']
+
+    @cached_property
+    def markets(self):
+        # The reference facility has a single market; synthetic ones (cauldronwatch.facility) list several
+        return self.data.get('markets') or [self.data['enchanted_market']]
+
+    @cached_property
+    def travel(self):
+        """Shortest travel times over the whole network (multi-hop routes included),
+        computed once per network and cached on disk"""
+        return load_travel_times(self.network_edges)
+
+    def get_travel_time(self, from_id, to_id):
+        return self.travel.minutes_between(from_id, to_id)
+
+    @cached_property
+    def home_market(self):
+        """Each cauldron is served from the closest market it has a path to"""
+        market_ids = [m['id'] for m in self.markets]
+        return {cid: self.travel.nearest(cid, market_ids) for cid in self.cauldrons}
+
+    @cached_property
+    def witches_by_shift(self):
+        witches_by_shift = defaultdict(list)
+        for courier in self.couriers:
+            witches_by_shift[courier['shift']].append(courier['courier_id'])
+        return witches_by_shift
@@ -0,0 +1,88 @@
+"""
+Writing a finished simulation to historical_data.json, transport_tickets.json
+and unreported_drains.json (or the segmented dataset for a resumed run).
+"""
+
+import json
+
+from cauldronwatch.binary import write_levels_binary
+from cauldronwatch.minutes import format_minute, to_datetime
+from cauldronwatch.segments import SegmentedDataset
+from cauldronwatch.stream import write_history_json
+
+
+def write_outputs(result):
+    """Write what simulate() returned to the generator's usual files in the current directory"""
+    config = result['config']
+    history = result['history']
+    transport_tickets = result['transport_tickets']
+    unreported_drains = result['unreported_drains']
+    history_writer = result['history_writer']
+    levels_writer = result['levels_writer']
+
+    # Prepare output
+    output_hist = {
+        'metadata': {
+            'start_date': format_minute(result['start_minute']),
+            'end_date': format_minute(result['end_minute']),
+            'total_minutes': history.total_minutes,
+            'total_collections': len(transport_tickets),
+            'data_points': history.total_minutes
+        }
+    }
+
+    output_tickets = {
+        'metadata': {
+            'total_tickets': len(transport_tickets),
+            'suspicious_tickets': sum(1 for t in transport_tickets if t.get('is_suspicious')),
+            'date_range': {
+                'start': min((t['collection_start_timestamp'] for t in transport_tickets), default=None),
+                'end': max((t['collection_start_timestamp'] for t in transport_tickets), default=None)
+            }
+        },
+        'transport_tickets': transport_tickets
+    }
+
+    output_drains = {
+        'metadata': {
+            'total_unreported_drains': len(unreported_drains),
+            'date_range': {
+                'start': min(d['drain_start_timestamp'] for d in unreported_drains) if unreported_drains else None,
+                'end': max(d['drain_start_timestamp'] for d in unreported_drains) if unreported_drains else None
+            }
+        },
+        'unreported_drains': unreported_drains
+    }
+
+    # Save files
+    print("\nSaving files...")
+    if result['resumed']:
+        # Only the resumed window was simulated - replace it in the segmented dataset. Without
+        # one there is nothing to continue: writing would leave a dataset of just this window.
+        dataset = SegmentedDataset(config.dataset_dir)
+        if not dataset.exists:
+            raise ValueError(f"a resumed run writes into the segmented dataset, but there is none in "
+                             f"{config.dataset_dir}/ - create it from the JSON files first "
+                             f"(python -m cauldronwatch.segments import {config.dataset_dir})")
+        dataset.write(history, transport_tickets, unreported_drains)
+        print(f"   Wrote {to_datetime(result['start_minute']).strftime('%Y-%m-%d %H:%M')} onwards to {config.dataset_dir}/")
+    elif history_writer:
+        history.spill(*[w for w in (history_writer, levels_writer) if w])
+        history_writer.close(output_hist['metadata'])
+        if levels_writer:
+            levels_writer.close()
+    else:
+        write_history_json('historical_data.json', output_hist['metadata'], history)
+        if config.write_binary_levels:
+            write_levels_binary('historical_data.bin', history)
+
+    if not result['resumed']:
+        with open('transport_tickets.json', 'w') as f:
+            json.dump(output_tickets, f, indent=2)
+
+        with open('unreported_drains.json', 'w') as f:
+            json.dump(output_drains, f, indent=2)
+
+    result['timer'].lap('serialization')
+    if result['profile']:
+        result['profile'].write(history.total_minutes, finished=True)
@@ -0,0 +1,734 @@
+"""
+The generator's simulation: fill levels, collection dispatch and the
+unreported-drain post-pass, all in memory.
+
+`simulate` runs one scenario (a GeneratorConfig) on one Facility and returns
+the run's state; cauldronwatch.generator.output writes it to the usual JSON
+files. Nothing here runs at import time, so tests and notebooks can import
+the pieces and simulate an hour without paying for the reference 11 days.
+"""
+
+import os
+import random
+from collections import defaultdict
+
+import numpy as np
+
+from cauldronwatch.binary import LevelBinaryWriter, load_levels_binary
+from cauldronwatch.candidates import CandidateQueue
+from cauldronwatch.checkpoint import load_checkpoint, save_checkpoint
+from cauldronwatch.drains import ActiveDrains
+from cauldronwatch.events import EventQueue
+from cauldronwatch.fill import FillEngine
+from cauldronwatch.fillrates import load_fill_rates
+from cauldronwatch.generator.config import AT_CAPACITY, MAX_CAPACITY_PER_WITCH, TRIP_BUFFER, UNLOAD_TIME, GeneratorConfig, scenario_rates
+from cauldronwatch.generator.couriers import get_witch_shift, is_witch_available
+from cauldronwatch.generator.inputs import Facility
+from cauldronwatch.intervals import IntervalIndex
+from cauldronwatch.keyed_random import KeyedRandom
+from cauldronwatch.levels import LevelStore
+from cauldronwatch.minutes import format_date, format_minute, to_datetime
+from cauldronwatch.stream import HistoryStreamWriter
+from cauldronwatch.timeline import CourierTimeline
+from cauldronwatch.timing import PhaseTimer, ProfileReport
+
+# Unreported drains are at least this long and start 200+ minutes from either end of the history
+MIN_DRAIN_MINUTES = 30
+DRAIN_MARGIN_MINUTES = 200
+PENDING_LEVELS_PATH = 'historical_data.pending.bin'  # A streamed run's levels until its drains are placed
+
+
+def simulate(config=None, facility=None, timer=None):
+    """Run one scenario in memory and return its state as a dict (history, tickets, drains, ...)"""
+    config = config if config is not None else GeneratorConfig()
+    facility = facility if facility is not None else Facility(config.cauldrons_path)
+    # Wall time per phase (setup, then per loop iteration events, drains, fill loop,
+    # candidates and dispatch, then unreported drains and serialization)
+    timer = timer if timer is not None else PhaseTimer()
+    profile = ProfileReport(timer, config.profile_path, config.profile_every_seconds) if config.profile_path else None
+
+    checkpoint = load_checkpoint(config.resume_from) if config.resume_from else None
+    sim_seed, drain_seed = config.sim_seed, config.drain_seed
+    fill_rate_scale, threshold_scale = config.fill_rate_scale, config.threshold_scale
+    fitted_fill_rates = load_fill_rates(config.fill_rates_path) if config.fill_rates_path else None
+    if checkpoint:
+        # A resumed run continues the checkpointed scenario, whatever the config says
+        sim_seed = checkpoint['sim_seed']
+        drain_seed = checkpoint['drain_seed']
+        fill_rate_scale = checkpoint['fill_rate_scale']
+        threshold_scale = checkpoint['threshold_scale']
+        fitted_fill_rates = checkpoint.get('fitted_fill_rates')
+
+    # Load cauldrons data
+    print("Loading cauldrons data...")
+    cauldrons = facility.cauldrons
+    get_travel_time = facility.get_travel_time
+    home_market = facility.home_market
+    witches_by_shift = facility.witches_by_shift
+    fill_rates, collection_thresholds = scenario_rates(cauldrons, fill_rate_scale, threshold_scale, fitted_fill_rates)
+
+    # Initialize - the loop keeps time as integer epoch minutes (see cauldronwatch.minutes)
+    start_minute = checkpoint['minute'] if checkpoint else config.start_minute
+    end_minute = config.end_minute
+    start_date = to_datetime(start_minute)
+    end_date = to_datetime(end_minute)
+
+    total_minutes = end_minute - start_minute + 1
+    print(f"\nGenerating data from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
+    print(f"Total minutes: {total_minutes:,}")
+
+    # Simulation randomness is keyed by (purpose, cauldron, minute) - see cauldronwatch.keyed_random
+    keyed = KeyedRandom(sim_seed)
+
+    # Initialize levels (start at reasonable levels)
+    initial_levels = {}
+    if checkpoint:
+        # Exact (unrounded) levels of the minute before the checkpoint
+        if set(checkpoint['cauldron_ids']) != set(cauldrons):
+            raise ValueError(f"{config.resume_from} was written for different cauldrons")
+        initial_levels = dict(zip(checkpoint['cauldron_ids'], checkpoint['levels']))
+    else:
+        for cauldron_id, cauldron in cauldrons.items():
+            max_vol = cauldron['max_volume']
+            # Start at 20-40% of capacity
+            initial_levels[cauldron_id] = keyed.uniform_at('initial_level', cauldron_id, start_minute, max_vol * 0.20, max_vol * 0.40)
+
+    print(f"Initial levels: {initial_levels}")
+
+    # Fixed cauldron order for the level store and the batched fill engine
+    cauldron_ids = list(cauldrons.keys())
+    cauldron_index = {cid: i for i, cid in enumerate(cauldron_ids)}
+
+    # Data structures (a resumed window goes to the dataset, so it is never streamed)
+    if config.stream_history and not checkpoint:
+        # The loop's levels spill to a float64 scratch file; they reach the outputs only once the
+        # unreported drains, which are placed over the whole history, have been cut into it
+        history = LevelStore(cauldron_ids, start_minute, capacity=config.history_window_minutes + 2 * 1440)
+        pending_writer = LevelBinaryWriter(PENDING_LEVELS_PATH, cauldron_ids, dtype=np.float64)
+        history_writer = HistoryStreamWriter('historical_data.ndjson', cauldron_ids)
+        levels_writer = LevelBinaryWriter('historical_data.bin', cauldron_ids) if config.write_binary_levels else None
+        spill_writers = [w for w in (history_writer, levels_writer) if w]
+    else:
+        history = LevelStore(cauldron_ids, start_minute, capacity=total_minutes)
+        pending_writer = history_writer = levels_writer = None
+    transport_tickets = []
+    unreported_drains = []
+    courier_timelines = defaultdict(CourierTimeline)  # Committed trips per witch
+    active_drains = ActiveDrains(tick=1)  # Scheduled/running collection drains per cauldron
+    collections_per_cauldron = defaultdict(int)
+    collection_windows = IntervalIndex()  # Ticketed collection periods, for placing unreported drains
+    ticket_counter = 0
+    checkpoint_paths = []  # Written by this run; they get its unreported drains once those are placed
+
+    if checkpoint:
+        print(f"Resuming from {config.resume_from}")
+        active_drains = ActiveDrains.from_state(1, checkpoint['active_drains'])
+        for w, state in checkpoint['courier_timelines'].items():
+            courier_timelines[w] = CourierTimeline.from_state(state)
+        collections_per_cauldron.update(checkpoint['collections_per_cauldron'])
+        collection_windows = IntervalIndex(checkpoint['collection_windows'])
+        ticket_counter = checkpoint['ticket_counter']
+        # Tickets issued before the checkpoint for collections that start after it
+        transport_tickets.extend(checkpoint['tickets_in_flight'])
+
+    current_levels = {k: v for k, v in initial_levels.items()}
+    current_minute = start_minute
+
+    fill_engine = FillEngine(
+        cauldron_ids,
+        [fill_rates[cid] for cid in cauldron_ids],
+        [cauldrons[cid]['max_volume'] for cid in cauldron_ids],
+        start_minute=start_minute,
+        seed=keyed,
+    )
+    levels = np.array([current_levels[cid] for cid in cauldron_ids])
+    fill_rate_values = np.array([fill_rates[cid] for cid in cauldron_ids])
+
+    # Event-driven loop state: levels are only examined when an event is due
+    events = EventQueue()
+    events.push(start_minute, 'shift_change')
+    if config.checkpoint_every_minutes:
+        # On a fixed grid of epoch minutes, so a resumed run checkpoints at the same times
+        events.push((start_minute // config.checkpoint_every_minutes + 1) * config.checkpoint_every_minutes, 'checkpoint')
+    threshold_event = None
+    shift = get_witch_shift(start_minute)
+
+    # Lowest level at which the priority ladder below can give a cauldron priority > 0.
+    # Minutes where no eligible cauldron reaches its floor need no per-minute work.
+    max_volumes = np.array([cauldrons[cid]['max_volume'] for cid in cauldron_ids])
+    threshold_volumes = np.array([collection_thresholds[cid] * cauldrons[cid]['max_volume'] for cid in cauldron_ids])
+    candidate_floor = threshold_volumes * 0.55
+    uncollected_floor = np.minimum(candidate_floor, max_volumes * 0.30)
+
+    # Collection candidates by priority band, and collections per cauldron in cauldron order
+    candidates = CandidateQueue(cauldron_ids)
+    collection_counts = np.array([collections_per_cauldron[cid] for cid in cauldron_ids])
+
+    print("\nGenerating data...")
+    timer.lap('setup')
+    progress_interval = max(1, total_minutes // 10)
+
+    while current_minute <= end_minute:
+        # Apply every event due at the start of this minute
+        for event_minute, kind, _ in events.pop_due(current_minute):
+            if kind == 'shift_change':
+                shift = get_witch_shift(event_minute)
+                events.push((event_minute // 480 + 1) * 480, 'shift_change')  # Shifts change every 8 hours
+            elif kind == 'checkpoint':
+                # State at the start of this minute: `levels` are the previous minute's
+                checkpoint_start = format_minute(event_minute)
+                checkpoint_paths.append(os.path.join(config.checkpoint_dir, to_datetime(event_minute).strftime('checkpoint_%Y%m%dT%H%M.json')))
+                save_checkpoint(checkpoint_paths[-1], {
+                    'minute': event_minute,
+                    'time': checkpoint_start,
+                    'sim_seed': sim_seed,
+                    'drain_seed': drain_seed,
+                    'fill_rate_scale': fill_rate_scale,
+                    'threshold_scale': threshold_scale,
+                    'fitted_fill_rates': fitted_fill_rates,
+                    'cauldron_ids': cauldron_ids,
+                    'levels': levels.tolist(),
+                    'active_drains': active_drains.to_state(),
+                    'courier_timelines': {w: timeline.to_state() for w, timeline in courier_timelines.items()},
+                    'collections_per_cauldron': dict(collections_per_cauldron),
+                    'ticket_counter': ticket_counter,
+                    'collection_windows': [[s, e] for s, e in collection_windows if e >= event_minute],
+                    'tickets_in_flight': [t for t in transport_tickets if t['collection_start_timestamp'] >= checkpoint_start],
+                })
+                events.push(event_minute + config.checkpoint_every_minutes, 'checkpoint')
+            # 'threshold' events only mark where the previous block had to stop
+        timer.lap('events')
+        
+        # Start/retire collection drains and total the running ones per cauldron
+        active_drains.advance(current_minute)
+        drain = np.zeros(len(cauldron_ids))  # Net drain (L/min)
+        for d in active_drains.running():
+            drain[cauldron_index[d['cauldron_id']]] += d['rate']
+        timer.lap('drains')
+        
+        # Predict when the first eligible cauldron reaches its candidate floor at the
+        # expected net fill rate; the block stops there if nothing else happens first
+        eligible = np.array([not active_drains.busy(cid) for cid in cauldron_ids])
+        floor = np.where(collection_counts == 0, uncollected_floor, candidate_floor)
+        gap = np.where(eligible, floor - levels, np.inf)
+        net_fill = fill_rate_values - drain
+        with np.errstate(divide='ignore', invalid='ignore'):
+            eta = np.where(gap <= 0, 0, np.where(net_fill > 0, np.ceil(gap / net_fill), np.inf))
+        if threshold_event is not None:
+            events.cancel(threshold_event)
+            threshold_event = None
+        if np.isfinite(eta.min()) and eta.min() < fill_engine.block_minutes:
+            threshold_event = events.push(current_minute + max(1, int(eta.min())), 'threshold')
+        
+        # Block runs until the next event or drain start/end, so the set of
+        # running drains and busy cauldrons is fixed inside it
+        minutes_left = end_minute - current_minute + 1
+        block_minutes = min(fill_engine.block_minutes, minutes_left)
+        for boundary in (events.next_time(), active_drains.next_change()):
+            if boundary is not None:
+                block_minutes = min(block_minutes, boundary - current_minute)
+        
+        # Fill (and drain) the whole block at once
+        path = fill_engine.project(levels, block_minutes, drain)
+        block = np.round(path, 2)
+        
+        # Stop at the first minute where some cauldron becomes a collection candidate
+        hits = np.flatnonzero(((block >= floor) & eligible).any(axis=1))
+        steps = int(hits[0]) + 1 if hits.size else block_minutes
+        fill_engine.consume(steps)
+        
+        # Store the block's minutes
+        stored_before = history.total_minutes
+        history.append(block[:steps])
+        if pending_writer and len(history) > config.history_window_minutes + 1440:
+            history.spill(pending_writer, keep=config.history_window_minutes)
+        
+        # Progress indicator
+        for mark in range(stored_before // progress_interval + 1, history.total_minutes // progress_interval + 1):
+            progress = (mark * progress_interval / total_minutes) * 100
+            print(f"  Progress: {progress:.0f}%")
+        
+        # The rest of this iteration runs for the last minute of the block
+        current_minute += steps - 1
+        levels = path[steps - 1]
+        
+        timer.lap('fill_loop')
+        
+        # Score every cauldron against the priority ladder at once; busy cauldrons
+        # are not candidates. The queue only re-keys cauldrons whose band changed.
+        minute_levels = block[steps - 1]
+        uncollected = collection_counts == 0
+        bands = np.select(
+            [
+                minute_levels >= max_volumes * 0.99,  # CRITICAL: At capacity - highest priority always
+                minute_levels >= max_volumes * 0.90,  # Very high priority for cauldrons near capacity
+                minute_levels >= max_volumes * 0.80,
+                minute_levels >= max_volumes * 0.70,
+                minute_levels >= threshold_volumes,  # High priority for cauldrons at threshold
+                minute_levels >= threshold_volumes * 0.85,  # Near threshold
+                minute_levels >= threshold_volumes * 0.70,
+                minute_levels >= threshold_volumes * 0.55,
+                # Uncollected cauldrons at lower levels
+                uncollected & (minute_levels >= max_volumes * 0.45),
+                uncollected & (minute_levels >= max_volumes * 0.35),
+                uncollected & (minute_levels >= max_volumes * 0.30),
+            ],
+            [100, 98, 95, 90, 85, 80, 75, 70, 70, 65, 60],
+            default=0,
+        )
+        bands[~eligible] = 0
+        candidates.update(bands, collection_counts)
+        
+        # Highest priority first (ties go to the higher cauldron id), but try to balance
+        chosen = candidates.best()
+        if chosen is not None:
+            # Strong balancing: prefer a similar-priority cauldron with clearly fewer collections
+            fewer = candidates.best(candidates.band(chosen) - 5, collection_counts[chosen] - 2)
+            if fewer is not None:
+                chosen = fewer
+            # Also ensure cauldrons with 0 collections get priority even if lower threshold
+            if collection_counts[chosen] > 0:
+                never_collected = candidates.best(60, 1)
+                if never_collected is not None:
+                    chosen = never_collected
+        timer.lap('candidates')
+        
+        if chosen is not None:
+            cauldron_id = cauldron_ids[chosen]
+            level = float(minute_levels[chosen])
+            if not active_drains.busy(cauldron_id):
+                max_vol = cauldrons[cauldron_id]['max_volume']
+                available_witches = witches_by_shift[shift]
+                
+                # Draws for this dispatch are keyed by cauldron, minute and which witch is tried
+                minute = current_minute
+                witch_id = None
+                for attempt, w in enumerate(available_witches):
+                    # Trips that ended before this minute (plus buffer) can't conflict anymore
+                    courier_timelines[w].prune(current_minute - TRIP_BUFFER)
+                    
+                    travel_to = get_travel_time(home_market[cauldron_id], cauldron_id)
+                    travel_back = get_travel_time(cauldron_id, home_market[cauldron_id])
+                    
+                    # Calculate earliest departure time (must be after previous trip ends + buffer)
+                    # Need buffer time after the latest unload before next departure
+                    earliest_departure = courier_timelines[w].earliest_departure(current_minute, TRIP_BUFFER)
+                    
+                    departure = earliest_departure
+                    collection_start = departure + travel_to
+                    
+                    # Calculate collection amount first (using estimated duration)
+                    level_at_collection = level + (fill_rates[cauldron_id] * travel_to)
+                    level_at_collection = min(level_at_collection, max_vol)
+                    
+                    # Collection percentage - adjusted to collect more per trip (reduces total trips)
+                    collection_percentage = keyed.uniform_at('collection.percentage', cauldron_id, minute, 0.15, 0.22, draw=attempt)  # Increased from 0.12-0.20 to 0.15-0.22
+                    amount_to_collect = min(level_at_collection * collection_percentage, MAX_CAPACITY_PER_WITCH)
+                    
+                    # Estimate initial duration for calculation
+                    estimated_duration = keyed.randint_at('collection.estimated_duration', cauldron_id, minute, 60, 90, draw=attempt)
+                    fill_during_estimated = fill_rates[cauldron_id] * estimated_duration
+                    actual_drain = amount_to_collect
+                    
+                    # Ensure we're actually draining something meaningful (but much smaller amounts)
+                    if actual_drain <= fill_during_estimated:
+                        actual_drain = fill_during_estimated + keyed.uniform_at('collection.extra_drain', cauldron_id, minute, 15, 40, draw=attempt)  # Reduced from 30-80 to 15-40
+                        amount_to_collect = actual_drain
+                    
+                    # Cap at available level
+                    actual_drain = min(actual_drain, level_at_collection)
+                    actual_drain = max(15, actual_drain)  # Increased minimum from 10 to 15
+                    
+                    # CRITICAL: actual_drain is now FIXED - this is the NET amount that will be drained
+                    # Duration will be calculated based on this amount, accounting for filling during collection
+                    
+                    # Calculate duration based on drain amount: higher volume = longer duration
+                    # We need to account for filling during collection:
+                    #   actual_drain = gross_drain - fill_during_collection
+                    #   gross_drain = collection_rate * duration
+                    #   fill_during_collection = fill_rate * duration
+                    #   So: actual_drain = (collection_rate - fill_rate) * duration
+                    #   Solving: duration = actual_drain / (collection_rate - fill_rate)
+                    # But we also want a base duration for setup/preparation
+                    
+                    fill_rate = fill_rates[cauldron_id]
+                    base_duration = keyed.randint_at('collection.base_duration', cauldron_id, minute, 30, 40, draw=attempt)
+                    collection_rate_per_minute = keyed.uniform_at('collection.rate', cauldron_id, minute, 1.5, 2.0, draw=attempt)  # Liters per minute collection rate
+                    
+                    # Calculate duration accounting for filling during collection
+                    # net_collection_rate = collection_rate - fill_rate (how much net we drain per minute)
+                    net_collection_rate = collection_rate_per_minute - fill_rate
+                    if net_collection_rate > 0:
+                        # Duration from actual drain amount (accounting for fill during collection)
+                        duration_from_volume = actual_drain / net_collection_rate
+                        collection_duration = int(base_duration + duration_from_volume)
+                    else:
+                        # Fallback if fill rate is too high
+                        collection_duration = base_duration + int(actual_drain / 1.0)
+                    
+                    # Clamp duration to reasonable bounds (30-120 minutes)
+                    collection_duration = max(30, min(120, collection_duration))
+                    
+                    # Recalculate fill during collection with actual duration
+                    fill_during_collection = fill_rate * collection_duration
+                    
+                    # Verify: gross_drain = actual_drain + fill_during_collection
+                    # This ensures the levels will drop by exactly actual_drain over the duration
+                    
+                    # Recalculate with actual duration
+                    collection_end = collection_start + collection_duration
+                    arrival_back = collection_end + travel_back
+                    unload_complete = arrival_back + UNLOAD_TIME
+                    
+                    if is_witch_available(w, departure, unload_complete, courier_timelines):
+                        witch_id = w
+                        
+                        # Schedule the trip
+                        courier_timelines[witch_id].add(departure, unload_complete)
+                        
+                        # Schedule the drain (net drain per minute over the collection, inclusive)
+                        active_drains.add(cauldron_id, collection_start, collection_end, rate=actual_drain / collection_duration)
+                        
+                        # Determine if suspicious (12% chance)
+                        is_suspicious = keyed.random_at('ticket.suspicious', cauldron_id, minute) < 0.12
+                        reported_amount = actual_drain  # Based on fixed actual_drain amount
+                        
+                        if is_suspicious:
+                            underreport_factor = keyed.uniform_at('ticket.underreport', cauldron_id, minute, 0.75, 0.92)
+                            reported_amount = actual_drain * underreport_factor
+                        
+                        # Create ticket
+                        # NOTE: Only collection_start_timestamp and collection_timestamp change with duration
+                        # amount_collected is based on actual_drain which remains fixed
+                        ticket_counter += 1
+                        date_str = format_date(collection_start).replace('-', '')
+                        ticket_id = f"TT_{date_str}_{ticket_counter:03d}"
+                        
+                        ticket = {
+                            'ticket_id': ticket_id,
+                            'cauldron_id': cauldron_id,
+                            'collection_start_timestamp': format_minute(collection_start),
+                            'collection_timestamp': format_minute(collection_end),  # Updated based on new duration
+                            'amount_collected': round(reported_amount, 2),  # Based on fixed actual_drain
+                            'courier_id': witch_id,
+                            'status': 'completed',
+                            'notes': 'Sequential collection'
+                        }
+                        
+                        if is_suspicious:
+                            ticket['is_suspicious'] = True
+                            ticket['suspicious_type'] = 'underreported'
+                            ticket['_actual_amount_collected'] = round(actual_drain, 2)
+                        
+                        transport_tickets.append(ticket)
+                        collection_windows.add(collection_start, collection_end)
+                        collections_per_cauldron[cauldron_id] += 1
+                        collection_counts[chosen] += 1
+                        
+                        break
+        
+        current_minute += 1
+        timer.lap('dispatch')
+        if profile:
+            profile.maybe_write(history.total_minutes)
+
+    # Add unreported drains (10-12 instances across the entire period). They are placed
+    # over the whole history, so a resumed run replays the checkpointed run's drains
+    # instead of placing new ones in its window, and a streamed run places them in its
+    # scratch file before anything is written out.
+    if pending_writer:
+        history.spill(pending_writer)
+        pending_writer.close()
+        history = load_levels_binary(PENDING_LEVELS_PATH, mode='r+')
+    applied_drains = []
+    if checkpoint and 'unreported_drains' in checkpoint:
+        applied_drains = checkpoint['unreported_drains']
+        replay_unreported_drains(history, applied_drains, unreported_drains)
+    else:
+        add_unreported_drains(history, collection_windows, fill_rates, drain_seed, unreported_drains, applied_drains)
+    # Checkpoints hold the loop's (pre-drain) levels; add the drains so a resume from one
+    # continues this run's levels instead of jumping back up by the drained amounts
+    for path in checkpoint_paths:
+        save_checkpoint(path, dict(load_checkpoint(path), unreported_drains=applied_drains))
+    timer.lap('unreported_drains')
+
+    # Minutes at capacity of the final levels, counted here as a streamed history leaves memory
+    minutes_at_capacity = np.zeros(len(cauldron_ids), dtype=np.int64)
+    if pending_writer:
+        # Stream the finished levels to the outputs, keeping the last window like the loop did
+        pending = history
+        history = LevelStore(cauldron_ids, start_minute, capacity=config.history_window_minutes + 2 * 1440)
+        for first in range(0, len(pending), 1440):
+            history.append(pending.levels[first:first + 1440])
+            if len(history) > config.history_window_minutes + 1440:
+                spilled = history.levels[:len(history) - config.history_window_minutes]
+                minutes_at_capacity += (spilled >= max_volumes * AT_CAPACITY).sum(axis=0)
+                history.spill(*spill_writers, keep=config.history_window_minutes)
+        del pending
+        os.remove(PENDING_LEVELS_PATH)
+    minutes_at_capacity += (history.levels >= max_volumes * AT_CAPACITY).sum(axis=0)
+
+    return {
+        'config': config,
+        'cauldrons': cauldrons,
+        'history': history,
+        'transport_tickets': transport_tickets,
+        'unreported_drains': unreported_drains,
+        'collections_per_cauldron': collections_per_cauldron,
+        'minutes_at_capacity': dict(zip(cauldron_ids, minutes_at_capacity.tolist())),
+        'start_minute': start_minute,
+        'end_minute': end_minute,
+        'resumed': checkpoint is not None,
+        'history_writer': history_writer,
+        'levels_writer': levels_writer,
+        'timer': timer,
+        'profile': profile,
+    }
+
+
+def add_unreported_drains(history, collection_windows, fill_rates, drain_seed, unreported_drains, applied=None):
+    """Cut 10-12 untracked drains into `history` away from ticketed collections; appends to unreported_drains.
+    Each drain as it was cut into the levels also goes to `applied` (see replay_unreported_drains)."""
+    print("\nAdding unreported drains...")
+    if len(history) < 2 * DRAIN_MARGIN_MINUTES:
+        print("  History too short for unreported drains")
+        return unreported_drains
+    # Placed after the fact over the whole history, so this pass keeps its own sequential stream
+    drain_rng = random.Random(drain_seed)
+    
+    # Generate unreported drains at random times throughout the period
+    num_unreported = drain_rng.randint(10, 12)
+    attempts = 0
+    max_attempts = 1000  # Increased significantly
+
+    # Track all unreported drains to ensure spacing
+    added_unreported_drains = []
+    added_drain_windows = []  # (cauldron_id, start, end) of each added drain
+
+    # Find time gaps where no tickets are happening (long enough for the shortest drain)
+    # and sample start times inside them, weighted by gap length
+    history_start = history.start_minute
+    free_gaps = collection_windows.gaps(history_start + DRAIN_MARGIN_MINUTES, history_start + len(history) - DRAIN_MARGIN_MINUTES,
+                                     MIN_DRAIN_MINUTES + 1)
+    gap_times = []
+    if free_gaps:
+        gap_weights = [gap_end - gap_start for gap_start, gap_end in free_gaps]
+        for _ in range(100):  # Sample 100 times
+            gap_start, gap_end = drain_rng.choices(free_gaps, gap_weights)[0]
+            gap_times.append(gap_start + drain_rng.randint(1, gap_end - gap_start - MIN_DRAIN_MINUTES))
+
+    # If we found gaps, use them; otherwise fall back to random
+    use_gaps = len(gap_times) > 0
+
+    while len(added_unreported_drains) < num_unreported:
+        attempts += 1
+        if attempts > max_attempts:
+            print(f"⚠️  Warning: Could not generate all {num_unreported} unreported drains after {max_attempts} attempts. Generated {len(added_unreported_drains)} drains.")
+            break
+        
+        # Use gap times if available, otherwise random
+        if use_gaps and len(gap_times) > 0:
+            drain_start = drain_rng.choice(gap_times)
+            gap_times.remove(drain_start)  # Remove so we don't use it again
+        else:
+            # Random time within the period
+            drain_start = history_start + drain_rng.randint(DRAIN_MARGIN_MINUTES, len(history) - DRAIN_MARGIN_MINUTES)
+        
+        # Find level at this time - rows are minute offsets from history_start
+        level_at_time = None
+        row_at_start = drain_start - history_start
+        if 0 <= row_at_start < len(history):
+            level_at_time = history.row(row_at_start)
+        
+        if level_at_time:
+            # Choose a cauldron with reasonable level
+            candidates = [(cid, lvl) for cid, lvl in level_at_time.items() if lvl > 200]
+            if candidates:
+                cauldron_id, level = drain_rng.choice(candidates)
+                
+                # Check spacing from existing unreported drains for THIS cauldron
+                # Need at least 2 hours between drains for same cauldron to allow visible level increase
+                # TEMPORARILY DISABLED for debugging - only check if we have some drains already
+                too_close_same_cauldron = False
+                if len(added_unreported_drains) > 0:  # Only check spacing if we have existing drains
+                    for existing_cauldron, existing_start, existing_end in added_drain_windows:
+                        if existing_cauldron == cauldron_id:
+                            # Need at least 2 hours between drains for same cauldron to allow visible level increase
+                            time_diff_start = abs(drain_start - existing_start) / 60  # hours
+                            time_diff_end = abs(drain_start - existing_end) / 60  # hours
+                            
+                            if time_diff_start < 2.0 or time_diff_end < 2.0:
+                                too_close_same_cauldron = True
+                                break
+                
+                if too_close_same_cauldron:
+                    continue  # Skip this attempt and try again
+                
+                # Also check spacing from other cauldrons (at least 1 hour)
+                # TEMPORARILY DISABLED for debugging - only check if we have some drains already
+                too_close_other = False
+                if len(added_unreported_drains) > 0:  # Only check spacing if we have existing drains
+                    for existing_cauldron, existing_start, existing_end in added_drain_windows:
+                        if existing_cauldron != cauldron_id:
+                            time_diff_start = abs(drain_start - existing_start) / 60  # hours
+                            time_diff_end = abs(drain_start - existing_end) / 60  # hours
+                            
+                            if time_diff_start < 1.0 or time_diff_end < 1.0:
+                                too_close_other = True
+                                break
+                
+                if too_close_other:
+                    continue  # Skip this attempt and try again
+                
+                # Unreported drains - ensure significant drain amounts that show visible drops
+                fill_rate = fill_rates[cauldron_id]
+                
+                # Calculate NET drain amount first (what will show as a drop)
+                # Target a MINIMUM net drop of 40-80L (reduced from 50-100L)
+                min_net_drop = drain_rng.uniform(40, 80)  # Reduced from 50-100L
+                max_drain = min(level * 0.50, level - 40)
+                
+                # Generate NET drain amount (ensures minimum visible drop)
+                # We want at least min_net_drop as the net amount
+                if min_net_drop < max_drain:
+                    drain_amount = drain_rng.uniform(min_net_drop, max_drain)
+                else:
+                    drain_amount = min_net_drop
+                
+                # Calculate duration based on NET drain amount: higher volume = longer duration
+                base_duration = drain_rng.randint(30, 40)
+                collection_rate_per_minute = drain_rng.uniform(1.5, 2.0)  # Liters per minute collection rate
+                
+                # Calculate duration accounting for filling during collection
+                net_collection_rate = collection_rate_per_minute - fill_rate
+                if net_collection_rate > 0:
+                    # Duration from net drain amount (accounting for fill during collection)
+                    duration_from_volume = drain_amount / net_collection_rate
+                    drain_duration = int(base_duration + duration_from_volume)
+                else:
+                    # Fallback if fill rate is too high
+                    drain_duration = base_duration + int(drain_amount / 1.0)
+                
+                # Clamp duration to reasonable bounds (30-120 minutes)
+                drain_duration = max(30, min(120, drain_duration))
+                
+                drain_end = drain_start + drain_duration
+                
+                # Skip if overlaps with tickets (direct overlap only, not near tickets)
+                # Allow drains to happen near tickets, just not during them
+                if collection_windows.overlaps(drain_start, drain_end):
+                    continue  # Only skip if directly overlapping
+                
+                # Recalculate fill_during_drain with actual duration
+                fill_during_drain = fill_rate * drain_duration
+                
+                # Calculate net drain per minute (for applying to historical data)
+                net_drain_per_min = drain_amount / drain_duration if drain_duration > 0 else 0
+                
+                # Final verification - net_drain_per_min should be at least 0.5 L/min
+                if net_drain_per_min < 0.5:
+                    # Force larger NET drain to ensure visibility
+                    min_net_drop = 50  # Reduced from 70L
+                    drain_amount = min_net_drop + drain_rng.uniform(15, 40)  # Reduced from 20-60
+                    # Recalculate duration with new drain amount
+                    if net_collection_rate > 0:
+                        duration_from_volume = drain_amount / net_collection_rate
+                        drain_duration = int(base_duration + duration_from_volume)
+                    else:
+                        drain_duration = base_duration + int(drain_amount / 1.0)
+                    drain_duration = max(30, min(120, drain_duration))
+                    drain_end = drain_start + drain_duration
+                    fill_during_drain = fill_rate * drain_duration
+                    net_drain_per_min = drain_amount / drain_duration if drain_duration > 0 else 0
+                
+                # Sanity check - reduced minimum
+                expected_total_drop = net_drain_per_min * drain_duration
+                if expected_total_drop < 25:  # Reduced from 40L
+                    continue  # Skip this one if drop is too small
+                
+                # Get level BEFORE drain starts (for verification) - earliest minute within 5 minutes before
+                column = history.column(cauldron_id)
+                level_before = float(column[max(0, row_at_start - 4)]) if row_at_start > 0 else level_at_time.get(cauldron_id)
+                
+                if level_before is None:
+                    continue  # Skip if we can't find level before
+                
+                # Net drain ramp over the drain period (inclusive of start and end).
+                # Nothing is written until the drain is accepted, so rejected attempts leave no trace.
+                end_row = min(drain_end - history_start, len(history) - 1)
+                window = column[row_at_start:end_row + 1]
+                if window.size == 0:
+                    continue  # Skip if drain wasn't applied
+                drained = np.maximum(0, np.round(window - net_drain_per_min * np.arange(1, window.size + 1), 2))
+                
+                # The rest of the series stays down by the drained amount - skip drains
+                # that would run the cauldron dry later on
+                drained_total = net_drain_per_min * window.size
+                tail = column[end_row + 1:]
+                if tail.size and tail.min() < drained_total:
+                    continue
+                
+                # Level AFTER drain ends - the minute just after drain_end
+                # (exact match if the drain runs to the end of the data)
+                if tail.size:
+                    level_after = round(float(tail[0]) - drained_total, 2)
+                else:
+                    level_after = float(drained[-1])
+                
+                # Verify level actually dropped
+                if level_after is not None and level_before is not None:
+                    actual_drop = level_before - level_after
+                    # Reduced minimum drop to 10L to allow more drains
+                    if actual_drop < 10:
+                        continue  # Skip if drop is too small
+                    
+                    # Apply the drain and keep the rest of the series down by the drained amount
+                    window[:] = drained
+                    tail[:] = np.round(tail - drained_total, 2)
+                    
+                    # Success! Add the drain
+                    drain_info = {
+                        'cauldron_id': cauldron_id,
+                        'drain_start_timestamp': format_minute(drain_start),
+                        'drain_end_timestamp': format_minute(drain_end),
+                        'estimated_amount_drained_liters': round(drain_amount, 2),
+                        'duration_minutes': drain_duration,
+                        'note': 'NO TICKET EXISTS - this is an unreported drain'
+                    }
+                    
+                    added_unreported_drains.append(drain_info)
+                    added_drain_windows.append((cauldron_id, drain_start, drain_end))
+                    unreported_drains.append(drain_info)
+                    if applied is not None:
+                        applied.append({'cauldron_id': cauldron_id, 'start': drain_start, 'minutes': int(window.size),
+                                        'rate': net_drain_per_min, 'record': drain_info})
+                    print(f"  ✓ Added unreported drain: {cauldron_id} at {to_datetime(drain_start).strftime('%Y-%m-%d %H:%M')} ({actual_drop:.1f}L drop)")
+                else:
+                    continue  # Skip if we can't find level before or after
+
+    return unreported_drains
+
+
+def replay_unreported_drains(history, applied, unreported_drains):
+    """
+    Cut drains recorded by add_unreported_drains into `history` again, in their original
+    order and with the same arithmetic, so the minutes `history` shares with the original
+    run come out identical. Drains that started before `history` only shift its levels
+    (or finish their ramp in it); only drains starting inside it go to unreported_drains.
+    """
+    print(f"\nReplaying {len(applied)} unreported drains from the checkpoint...")
+    history_start = history.start_minute
+    for drain in applied:
+        column = history.column(drain['cauldron_id'])
+        row = drain['start'] - history_start
+        minutes = drain['minutes']
+        first = min(max(row, 0), len(column))
+        stop = min(max(row + minutes, first), len(column))
+        ramp = drain['rate'] * np.arange(1, minutes + 1)
+        window = column[first:stop]
+        window[:] = np.maximum(0, np.round(window - ramp[first - row:stop - row], 2))
+        tail = column[max(row + minutes, 0):]
+        tail[:] = np.maximum(0, np.round(tail - drain['rate'] * minutes, 2))
+        if row >= 0:
+            unreported_drains.append(drain['record'])
+    return unreported_drains
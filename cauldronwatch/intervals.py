@@ -0,0 +1,65 @@
+"""
+Sorted interval index over collection windows.
+
+Windows are kept merged into disjoint, sorted (start, end) intervals with
+parallel start/end lists, so overlap and point queries are a bisect each
+instead of a scan over every ticket. Works with any ordered values
+(datetimes or integer minutes).
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+class IntervalIndex:
+    """Union of closed [start, end] intervals with logarithmic lookups."""
+
+    def __init__(self, intervals=()):
+        self._starts = []
+        self._ends = []
+        for start, end in intervals:
+            self.add(start, end)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __iter__(self):
+        return iter(zip(self._starts, self._ends))
+
+    def add(self, start, end):
+        """Add [start, end], merging it with any interval it overlaps or touches"""
+        if end < start:
+            raise ValueError(f"interval end {end} is before its start {start}")
+        i = bisect_left(self._ends, start)   # first interval ending at/after start
+        j = bisect_right(self._starts, end)  # first interval starting after end
+        if i < j:
+            start = min(start, self._starts[i])
+            end = max(end, self._ends[j - 1])
+        self._starts[i:j] = [start]
+        self._ends[i:j] = [end]
+
+    def overlaps(self, start, end):
+        """True if (start, end) overlaps any interval (touching endpoints don't count)"""
+        i = bisect_right(self._ends, start)  # first interval ending after start
+        return i < len(self._starts) and self._starts[i] < end
+
+    def contains(self, point):
+        """True if point lies inside some interval (endpoints included)"""
+        i = bisect_left(self._ends, point)
+        return i < len(self._starts) and self._starts[i] <= point
+
+    def gaps(self, start, end, min_length):
+        """
+        Free stretches inside [start, end] of at least min_length, as (gap_start, gap_end)
+        pairs. Gap edges are the ends/starts of the neighbouring busy intervals.
+        """
+        gaps = []
+        cursor = start
+        i = bisect_left(self._ends, start)
+        while i < len(self._starts) and self._starts[i] < end:
+            if self._starts[i] - cursor >= min_length:
+                gaps.append((cursor, self._starts[i]))
+            cursor = max(cursor, self._ends[i])
+            i += 1
+        if end - cursor >= min_length:
+            gaps.append((cursor, end))
+        return gaps
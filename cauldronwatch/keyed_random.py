@@ -0,0 +1,73 @@
+"""
+Counter-based random numbers keyed by (seed, purpose, cauldron, minute).
+
+Every value is a hash of its key rather than the next draw of a shared
+stream, so the noise for cauldron_007 at a given minute doesn't depend on
+anything drawn before it. Any window can be regenerated on its own, or in
+parallel, with bit-identical results.
+
+Minutes are absolute (minutes since the Unix epoch, see cauldronwatch.minutes), so
+a value doesn't depend on where a run starts either. `draw` separates several
+values with the same key (e.g. retries within one minute). The hash is two
+rounds of the SplitMix64 finalizer over a per-(seed, purpose, cauldron) key
+and the counter, evaluated on whole numpy arrays at once.
+"""
+
+import hashlib
+import secrets
+
+import numpy as np
+
+_MASK = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+_TO_UNIT = 2.0 ** -53
+
+
+def _mix(z):
+    """SplitMix64 finalizer on a uint64 array (wraps modulo 2**64)"""
+    z = z + np.uint64(_GOLDEN)
+    z = (z ^ (z >> np.uint64(30))) * _MIX1
+    z = (z ^ (z >> np.uint64(27))) * _MIX2
+    return z ^ (z >> np.uint64(31))
+
+
+class KeyedRandom:
+    """Deterministic random values for any (purpose, cauldron, minute, draw) without replaying a stream."""
+
+    def __init__(self, seed=None):
+        self.seed = secrets.randbits(64) if seed is None else seed
+        self._keys = {}
+
+    def _key(self, purpose, cauldron_id):
+        key = self._keys.get((purpose, cauldron_id))
+        if key is None:
+            digest = hashlib.blake2b(f"{self.seed}|{purpose}|{cauldron_id}".encode(), digest_size=8).digest()
+            key = self._keys[(purpose, cauldron_id)] = int.from_bytes(digest, 'little')
+        return key
+
+    def bits(self, purpose, cauldron_ids, minutes, draw=0):
+        """(minutes x cauldrons) uint64 hashes"""
+        keys = np.array([self._key(purpose, cid) for cid in cauldron_ids], dtype=np.uint64)
+        counters = np.asarray(minutes, dtype=np.int64).astype(np.uint64) + np.uint64((draw * _GOLDEN) & _MASK)
+        return _mix(_mix(counters)[:, None] ^ keys[None, :])
+
+    def uniform(self, purpose, cauldron_ids, minutes, low=0.0, high=1.0, draw=0):
+        """(minutes x cauldrons) floats in [low, high)"""
+        unit = (self.bits(purpose, cauldron_ids, minutes, draw) >> np.uint64(11)) * _TO_UNIT
+        return low + (high - low) * unit
+
+    # Single values - same numbers as the array versions for the same key
+
+    def random_at(self, purpose, cauldron_id, minute, draw=0):
+        """Float in [0, 1)"""
+        return float(self.uniform(purpose, [cauldron_id], [minute], draw=draw)[0, 0])
+
+    def uniform_at(self, purpose, cauldron_id, minute, low, high, draw=0):
+        """Float in [low, high)"""
+        return low + (high - low) * self.random_at(purpose, cauldron_id, minute, draw)
+
+    def randint_at(self, purpose, cauldron_id, minute, a, b, draw=0):
+        """Integer in [a, b], both ends included (like random.randint)"""
+        return a + min(int(self.random_at(purpose, cauldron_id, minute, draw) * (b - a + 1)), b - a)
@@ -0,0 +1,126 @@
+"""
+Columnar store for minute-by-minute cauldron levels.
+
+Levels live in a single (minutes x cauldrons) float array with a fixed
+cauldron-id -> column map. Row i is the epoch minute `start_minute + i` (see
+cauldronwatch.minutes), so timestamps are never stored; the
+`{'timestamp', 'cauldron_levels'}` records used by historical_data.json are
+only built when serializing. Old rows can be spilled
+to a writer so long runs only keep a window of recent minutes in memory.
+"""
+
+import numpy as np
+
+from cauldronwatch.minutes import format_minute, parse_minute
+
+
+class LevelStore:
+    """Append-only minutes x cauldrons level matrix with an implicit minute index."""
+
+    def __init__(self, cauldron_ids, start_minute, capacity=1440):
+        self.cauldron_ids = list(cauldron_ids)
+        self.columns = {cid: i for i, cid in enumerate(self.cauldron_ids)}
+        self.start_minute = start_minute  # Epoch minute of row 0
+        self._levels = np.zeros((max(capacity, 1), len(self.cauldron_ids)))
+        self._size = 0
+        self.spilled = 0  # Rows already handed to a writer and dropped (start moved past them)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def total_minutes(self):
+        """Minutes stored so far, including spilled ones"""
+        return self.spilled + self._size
+
+    @property
+    def levels(self):
+        """View of the filled part of the matrix"""
+        return self._levels[:self._size]
+
+    @property
+    def end_minute(self):
+        """Epoch minute of the last stored row"""
+        return self.minute(self._size - 1)
+
+    def minute(self, row):
+        """Epoch minute of a row (negative rows count from the end)"""
+        if row < 0:
+            row += self._size
+        return self.start_minute + row
+
+    def row_of(self, minute):
+        """Row index of an epoch minute (may be out of range)"""
+        return minute - self.start_minute
+
+    def column(self, cauldron_id):
+        """View of one cauldron's levels over all stored minutes"""
+        return self.levels[:, self.columns[cauldron_id]]
+
+    def row(self, row):
+        """Levels at one minute as a {cauldron_id: level} dict"""
+        return dict(zip(self.cauldron_ids, self.levels[row].tolist()))
+
+    def append(self, rows):
+        """Append one row or a block of rows (columns in `cauldron_ids` order)"""
+        rows = np.atleast_2d(np.asarray(rows, dtype=float))
+        needed = self._size + len(rows)
+        if needed > len(self._levels):
+            grown = np.zeros((max(needed, 2 * len(self._levels)), self._levels.shape[1]))
+            grown[:self._size] = self.levels
+            self._levels = grown
+        self._levels[self._size:needed] = rows
+        self._size = needed
+
+    def spill(self, *writers, keep=0):
+        """Write all but the last `keep` rows to each writer and drop them from memory"""
+        count = self._size - keep
+        if count <= 0:
+            return 0
+        for writer in writers:
+            writer.write(self.start_minute, self.levels[:count])
+        self._levels[:keep] = self._levels[count:self._size]
+        self._size = keep
+        self.start_minute += count
+        self.spilled += count
+        return count
+
+    def iter_records(self, chunk_rows=1440):
+        """Yield historical_data.json records one at a time, converting a chunk of rows at once"""
+        minute = self.start_minute
+        for first in range(0, self._size, chunk_rows):
+            for row in self._levels[first:min(first + chunk_rows, self._size)].tolist():
+                yield {
+                    'timestamp': format_minute(minute),
+                    'cauldron_levels': dict(zip(self.cauldron_ids, row))
+                }
+                minute += 1
+
+    def to_records(self):
+        """Build the historical_data.json 'data' list"""
+        return list(self.iter_records())
+
+    @classmethod
+    def wrap(cls, cauldron_ids, start_minute, levels):
+        """Use an existing (minutes x cauldrons) array, e.g. a memory map, without copying"""
+        store = cls(cauldron_ids, start_minute, capacity=0)
+        if levels.ndim != 2 or levels.shape[1] != len(store.cauldron_ids):
+            raise ValueError(f"expected a (minutes x {len(store.cauldron_ids)}) array, got shape {levels.shape}")
+        store._levels = levels
+        store._size = len(levels)
+        return store
+
+    @classmethod
+    def from_records(cls, records):
+        """Load the 'data' list of historical_data.json (one record per consecutive minute)"""
+        if not records:
+            raise ValueError("no historical records to load")
+        cauldron_ids = list(records[0]['cauldron_levels'].keys())
+        store = cls(cauldron_ids, parse_minute(records[0]['timestamp']), capacity=len(records))
+        store.append([[r['cauldron_levels'][cid] for cid in cauldron_ids] for r in records])
+
+        last = parse_minute(records[-1]['timestamp'])
+        if last != store.end_minute:
+            raise ValueError(f"historical records are not one per minute: expected last timestamp "
+                             f"{format_minute(store.end_minute)}, got {records[-1]['timestamp']}")
+        return store
@@ -0,0 +1,64 @@
+"""
+Integer minute timestamps.
+
+The generators keep time as minutes since 1970-01-01T00:00Z (plain ints):
+schedules, drains, tickets and gap searches are int intervals and the
+arithmetic is integer addition. Datetimes and ISO strings only appear at the
+edges - parsing the input files and serializing the output - and the
+formatter/parser here cache the date part per day, so turning a minute into
+'2024-11-05T13:07:00Z' is a dict lookup and a string concatenation.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+MINUTES_PER_DAY = 24 * 60
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_ORDINAL = _EPOCH.date().toordinal()
+
+# 'HH:MM:00Z' for every minute of a day, and 'HH:MM' -> minute of the day
+_TIME_OF_DAY = [f"{hour:02d}:{minute:02d}:00Z" for hour in range(24) for minute in range(60)]
+_MINUTE_OF_DAY = {text[:5]: minute for minute, text in enumerate(_TIME_OF_DAY)}
+_DAY_NUMBERS = {}  # 'YYYY-MM-DD' -> days since the epoch
+
+
+def epoch_minute(timestamp):
+    """Minutes since 1970-01-01T00:00Z for an aware datetime"""
+    return int(timestamp.timestamp()) // 60
+
+
+def to_datetime(minute):
+    """Aware UTC datetime of an epoch minute"""
+    return _EPOCH + timedelta(minutes=minute)
+
+
+@lru_cache(maxsize=None)
+def _date_text(day):
+    return date.fromordinal(_EPOCH_ORDINAL + day).isoformat()
+
+
+def _day_number(text):
+    day = _DAY_NUMBERS.get(text)
+    if day is None:
+        day = _DAY_NUMBERS[text] = date.fromisoformat(text).toordinal() - _EPOCH_ORDINAL
+    return day
+
+
+def format_minute(minute):
+    """'YYYY-MM-DDTHH:MM:00Z' for an epoch minute (the JSON files' timestamp format)"""
+    day, minute_of_day = divmod(minute, MINUTES_PER_DAY)
+    return _date_text(day) + 'T' + _TIME_OF_DAY[minute_of_day]
+
+
+def format_date(minute):
+    """'YYYY-MM-DD' of the day containing an epoch minute"""
+    return _date_text(minute // MINUTES_PER_DAY)
+
+
+def parse_minute(text):
+    """Epoch minute of a 'YYYY-MM-DDTHH:MM:SSZ' timestamp (seconds are dropped)"""
+    if len(text) == 20 and text[10] == 'T' and text[19] == 'Z':
+        return _day_number(text[:10]) * MINUTES_PER_DAY + _MINUTE_OF_DAY[text[11:16]]
+    # Anything else (offsets, fractions) goes through the full parser
+    return epoch_minute(datetime.fromisoformat(text.replace('Z', '+00:00')))
+
@@ -0,0 +1,146 @@
+"""
+Shortest travel times over the broomstick network.
+
+`network.edges` in cauldrons.json only lists direct links; couriers can fly
+any path through them. `build_travel_times` turns the edges into dense
+all-pairs matrices:
+
+- `minutes[i, j]`: shortest travel time from node i to node j (int minutes,
+  UNREACHABLE if there is no path)
+- `next_hop[i, j]`: the node after i on that path, for rebuilding routes
+
+Shortest paths come from a Bellman-Ford relaxation vectorized over a block of
+source nodes at a time (only edges leaving nodes that improved in the last
+round are relaxed), so a few thousand nodes take seconds with numpy alone.
+`load_travel_times` caches the result per network in an .npz file named by
+a hash of the edge list, so every script run after the first just loads it.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+UNREACHABLE = -1
+DEFAULT_CACHE_DIR = os.environ.get('CAULDRONWATCH_CACHE_DIR', '.cauldronwatch_cache')
+# Bump when the cached arrays change meaning, so old cache files are ignored
+_CACHE_FORMAT = 1
+
+
+def _edge_times(edges):
+    """{(from, to): minutes} in both directions; a repeated pair keeps its last listing"""
+    times = {}
+    for edge in edges:
+        times[(edge['from'], edge['to'])] = edge['travel_time_minutes']
+        times[(edge['to'], edge['from'])] = edge['travel_time_minutes']
+    return times
+
+
+def network_hash(edges):
+    """Stable hash of the travel times an edge list defines (ignores order and other fields)"""
+    canonical = sorted([a, b, minutes] for (a, b), minutes in _edge_times(edges).items())
+    return hashlib.sha256(json.dumps([_CACHE_FORMAT, canonical]).encode()).hexdigest()
+
+
+class TravelTimes:
+    """Dense shortest travel-time and next-hop matrices over the network's nodes."""
+
+    def __init__(self, node_ids, minutes, next_hop):
+        self.node_ids = list(node_ids)
+        self.index = {node: i for i, node in enumerate(self.node_ids)}
+        self.minutes = minutes
+        self.next_hop = next_hop
+
+    def minutes_between(self, from_id, to_id):
+        """Shortest travel time in minutes (0 from a place to itself)"""
+        if from_id == to_id:
+            return 0
+        minutes = int(self.minutes[self.index[from_id], self.index[to_id]])
+        if minutes == UNREACHABLE:
+            raise ValueError(f"no route from {from_id} to {to_id}")
+        return minutes
+
+    def path(self, from_id, to_id):
+        """Node ids along the shortest route, both ends included"""
+        self.minutes_between(from_id, to_id)  # Raises if there is no route
+        i, j = self.index[from_id], self.index[to_id]
+        nodes = [from_id]
+        while i != j:
+            i = int(self.next_hop[i, j])
+            nodes.append(self.node_ids[i])
+        return nodes
+
+    def nearest(self, to_id, from_ids):
+        """The id in `from_ids` with the shortest route to `to_id` (first one on ties)"""
+        j = self.index[to_id]
+        reachable = [(int(self.minutes[self.index[f], j]), n, f) for n, f in enumerate(from_ids)
+                     if f in self.index and self.minutes[self.index[f], j] != UNREACHABLE]
+        if not reachable:
+            raise ValueError(f"{to_id} has no route to any of {list(from_ids)}")
+        return min(reachable)[2]
+
+
+def build_travel_times(edges, chunk_rows=64):
+    """All-pairs shortest travel times and next hops for a cauldrons.json edge list"""
+    times = _edge_times(edges)
+    node_ids = sorted({node for pair in times for node in pair})
+    index = {node: i for i, node in enumerate(node_ids)}
+    n = len(node_ids)
+
+    # Directed edges sorted by target, so each target's in-edges are contiguous
+    pairs = sorted(times.items(), key=lambda item: (index[item[0][1]], index[item[0][0]]))
+    src = np.array([index[a] for (a, _), _ in pairs], dtype=np.intp)
+    dst = np.array([index[b] for (_, b), _ in pairs], dtype=np.intp)
+    weight = np.array([minutes for _, minutes in pairs], dtype=np.float32)
+
+    minutes = np.full((n, n), UNREACHABLE, dtype=np.int32)
+    predecessor = np.full((n, n), -1, dtype=np.int32)
+    for first in range(0, n, chunk_rows):
+        rows = np.arange(first, min(n, first + chunk_rows))
+        # dist[node, k]: distance from source rows[k]; node-major so edge gathers are whole rows.
+        # float32 holds whole minutes exactly far beyond any real route.
+        dist = np.full((n, len(rows)), np.inf, dtype=np.float32)
+        dist[rows, np.arange(len(rows))] = 0
+        improved = np.zeros(n, dtype=bool)
+        improved[rows] = True
+        # Relax the edges leaving nodes that got closer to some source in this block
+        while improved.any():
+            active = improved[src]
+            targets, starts = np.unique(dst[active], return_index=True)
+            best = np.minimum.reduceat(dist[src[active]] + weight[active, None], starts, axis=0)
+            current = dist[targets]
+            better = best < current
+            dist[targets] = np.where(better, best, current)
+            improved[:] = False
+            improved[targets[better.any(axis=1)]] = True
+
+        # Predecessor on each shortest path: the first in-edge that achieves the distance
+        on_path = (dist[src] + weight[:, None] == dist[dst]) & (dst[:, None] != rows[None, :])
+        edge_of, row_of = np.nonzero(on_path)
+        # Fancy assignment keeps the last write, so go backwards to keep each pair's first edge
+        predecessor[rows[row_of[::-1]], dst[edge_of[::-1]]] = src[edge_of[::-1]]
+        reached = np.isfinite(dist)
+        block = minutes[first:first + len(rows)].T
+        block[reached] = dist[reached]
+
+    # Edges run both ways, so the step after i towards j is i's predecessor on the path from j
+    return TravelTimes(node_ids, minutes, np.ascontiguousarray(predecessor.T))
+
+
+def load_travel_times(edges, cache_dir=DEFAULT_CACHE_DIR):
+    """build_travel_times(edges), reusing the on-disk copy for the same network (cache_dir=None disables)"""
+    if not cache_dir:
+        return build_travel_times(edges)
+    path = os.path.join(cache_dir, f"travel_times_{network_hash(edges)[:16]}.npz")
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            return TravelTimes(cached['node_ids'].tolist(), cached['minutes'], cached['next_hop'])
+
+    travel = build_travel_times(edges)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, node_ids=np.array(travel.node_ids), minutes=travel.minutes, next_hop=travel.next_hop)
+    os.replace(tmp_path, path)
+    return travel
@@ -0,0 +1,234 @@
+"""
+Ticket reconciliation against the level history.
+
+A ticket says `amount_collected` liters left a cauldron between
+collection_start_timestamp and collection_timestamp. The history shows the
+net change over that window; adding back what the cauldron filled in the
+meantime gives the volume that must actually have been taken:
+
+    expected = level[start - 1] - level[end] + fill(start .. end)
+
+Every ticket is reconciled at once: tickets become (column, start row, end
+row) index arrays, the level drop is two fancy-indexed reads, and the fill
+during the window is a difference of the cumulative fill per cauldron (a
+constant rate per cauldron, or any (minutes x cauldrons) rate matrix such as
+hourly estimates). Fill rates come from a fill_rates.json
+(cauldronwatch.fillrates) or are fitted on the spot from the minutes no
+ticket covers.
+
+Command line:
+
+    python -m cauldronwatch.reconcile [--history historical_data.json] [--tickets transport_tickets.json]
+"""
+
+import argparse
+import csv
+import json
+import os
+
+import numpy as np
+
+from cauldronwatch.fillrates import FillRateEstimate, estimate_fill_rates, ticket_windows, window_rows
+from cauldronwatch.minutes import format_minute
+
+# Verdicts
+OK = 'ok'
+UNDERREPORTED = 'underreported'
+OVERREPORTED = 'overreported'
+NO_DATA = 'no_data'               # Window not (fully) covered by the history, or unknown cauldron
+
+# A ticket is flagged when it is off by more than this share of the expected volume
+# (and by more than MIN_DIFFERENCE liters). Honest tickets in the reference data land
+# within about +/-10% of the expected volume because of the fill noise; underreported
+# ones are 8-25% short.
+DEFAULT_TOLERANCE = 0.10
+MIN_DIFFERENCE = 1.0
+
+COLUMNS = ('ticket_id', 'cauldron_id', 'collection_start_timestamp', 'collection_timestamp',
+           'reported', 'level_drop', 'fill', 'expected', 'difference', 'ratio', 'verdict')
+
+
+def ticket_rows(store, tickets):
+    """(column, start row, end row, reported liters) arrays for tickets; unknown cauldrons get column -1"""
+    columns, starts, ends = window_rows(store, ticket_windows(tickets))
+    reported = np.fromiter((t['amount_collected'] for t in tickets), dtype=float, count=len(tickets))
+    return columns, starts, ends, reported
+
+
+class DiscrepancyTable:
+    """Reconciliation result: one entry per ticket, stored as columns (numpy arrays)."""
+
+    def __init__(self, tickets, cauldron_ids, reported, level_drop, fill, expected, verdict):
+        self.ticket_ids = [t.get('ticket_id') for t in tickets]
+        self.cauldron_ids = cauldron_ids
+        self.start_timestamps = [t['collection_start_timestamp'] for t in tickets]
+        self.end_timestamps = [t['collection_timestamp'] for t in tickets]
+        self.reported = reported
+        self.level_drop = level_drop
+        self.fill = fill
+        self.expected = expected
+        self.difference = reported - expected
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.ratio = np.where(expected > 0, reported / expected, np.nan)
+        self.verdict = verdict
+
+    def __len__(self):
+        return len(self.ticket_ids)
+
+    @property
+    def flagged(self):
+        """Bool array: reported volume disagrees with the level history"""
+        return (self.verdict == UNDERREPORTED) | (self.verdict == OVERREPORTED)
+
+    def counts(self):
+        """{verdict: number of tickets}"""
+        verdicts, counts = np.unique(self.verdict, return_counts=True)
+        return dict(zip(verdicts.tolist(), counts.tolist()))
+
+    def records(self, only_flagged=False):
+        """Rows as dicts (COLUMNS keys); liters rounded to 2 decimals, missing values as None"""
+        def liters(values):
+            return [None if np.isnan(v) else v for v in np.round(values, 2).tolist()]
+
+        data = zip(self.ticket_ids, self.cauldron_ids, self.start_timestamps, self.end_timestamps,
+                   self.reported.tolist(), liters(self.level_drop), liters(self.fill), liters(self.expected),
+                   liters(self.difference), [None if np.isnan(r) else r for r in np.round(self.ratio, 4).tolist()],
+                   self.verdict.tolist())
+        rows = [dict(zip(COLUMNS, row)) for row in data]
+        if only_flagged:
+            rows = [row for row, flag in zip(rows, self.flagged.tolist()) if flag]
+        return rows
+
+    def write_csv(self, path, only_flagged=False):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.records(only_flagged))
+
+    def write_json(self, path, only_flagged=False):
+        with open(path, 'w') as f:
+            json.dump({'summary': self.counts(), 'discrepancies': self.records(only_flagged)}, f, indent=2)
+
+
+def reconcile(store, tickets, fill_rates=None, tolerance=DEFAULT_TOLERANCE, min_difference=MIN_DIFFERENCE):
+    """
+    Reconcile tickets against a LevelStore in one vectorized pass.
+
+    `fill_rates` is a FillRateEstimate, a {cauldron_id: L/min} dict, an array in
+    `store.cauldron_ids` order, or a (minutes x cauldrons) array of per-minute rates
+    aligned with the store's rows. Cauldrons without a rate get one fitted from the
+    minutes outside every ticket window.
+    """
+    levels = store.levels
+    n_rows, n_columns = levels.shape
+    columns, starts, ends, reported = ticket_rows(store, tickets)
+    if isinstance(fill_rates, FillRateEstimate):
+        fill_rates = fill_rates.as_dict()
+
+    # Fill per cauldron and minute, as cumulative sums: fill over rows a..b is cum[b + 1] - cum[a]
+    if fill_rates is None or isinstance(fill_rates, dict):
+        rates = np.full(n_columns, np.nan)
+        for cid, rate in (fill_rates or {}).items():
+            if cid in store.columns:
+                rates[store.columns[cid]] = rate
+        if np.isnan(rates).any():
+            estimated = estimate_fill_rates(store, ticket_windows(tickets)).rates
+            rates = np.where(np.isnan(rates), estimated, rates)
+    else:
+        rates = np.asarray(fill_rates, dtype=float)
+    if rates.ndim == 2:
+        if rates.shape != levels.shape:
+            raise ValueError(f"per-minute fill rates must have shape {levels.shape}, got {rates.shape}")
+        cumulative = np.zeros((n_rows + 1, n_columns))
+        np.cumsum(rates, axis=0, out=cumulative[1:])
+
+    # Level just before the window (row start - 1) and at its last minute must both exist
+    valid = (columns >= 0) & (starts >= 1) & (ends < n_rows) & (ends >= starts)
+    column = np.where(valid, columns, 0)
+    start = np.where(valid, starts, 1)
+    end = np.where(valid, ends, 1)
+
+    level_drop = levels[start - 1, column] - levels[end, column]
+    if rates.ndim == 2:
+        fill = cumulative[end + 1, column] - cumulative[start, column]
+    else:
+        fill = rates[column] * (end - start + 1)
+    expected = level_drop + fill
+
+    level_drop = np.where(valid, level_drop, np.nan)
+    fill = np.where(valid, fill, np.nan)
+    expected = np.where(valid, expected, np.nan)
+    allowed = np.maximum(tolerance * np.abs(expected), min_difference)
+    verdict = np.full(len(tickets), OK, dtype=object)
+    verdict[valid & (reported < expected - allowed)] = UNDERREPORTED
+    verdict[valid & (reported > expected + allowed)] = OVERREPORTED
+    verdict[~valid] = NO_DATA
+
+    cauldron_ids = [t['cauldron_id'] for t in tickets]
+    return DiscrepancyTable(tickets, cauldron_ids, reported, level_drop, fill, expected, verdict)
+
+
+def load_history(path):
+    """LevelStore from historical_data.json, an NDJSON stream, a .bin level file or a dataset directory"""
+    if os.path.isdir(path):
+        from cauldronwatch.segments import SegmentedDataset
+        return SegmentedDataset(path).read_all()[0]
+    if path.endswith('.bin'):
+        from cauldronwatch.binary import load_levels_binary
+        return load_levels_binary(path)
+    if path.endswith('.ndjson'):
+        from cauldronwatch.stream import read_history_stream
+        return read_history_stream(path)[0]
+    from cauldronwatch.levels import LevelStore
+    with open(path, 'r') as f:
+        return LevelStore.from_records(json.load(f)['data'])
+
+
+def _load_tickets(path):
+    if os.path.isdir(path):
+        from cauldronwatch.segments import SegmentedDataset
+        return SegmentedDataset(path).read_all()[1]
+    with open(path, 'r') as f:
+        return json.load(f)['transport_tickets']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Reconcile transport tickets against the level history")
+    parser.add_argument('--history', default='historical_data.json',
+                        help="historical_data.json, .ndjson, .bin or a dataset directory (default historical_data.json)")
+    parser.add_argument('--tickets', default=None,
+                        help="transport_tickets.json (default: the dataset's tickets, or transport_tickets.json)")
+    parser.add_argument('--fill-rates', metavar='PATH', help="fill_rates.json to use (default: fit from the history)")
+    parser.add_argument('--rolling-hours', type=int, metavar='HOURS',
+                        help="use the file's trailing-window rates over HOURS hours instead of one rate per cauldron")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f"allowed share of the expected volume (default {DEFAULT_TOLERANCE})")
+    parser.add_argument('-o', '--out', default='ticket_discrepancies.csv', help="output table (.csv or .json)")
+    parser.add_argument('--flagged-only', action='store_true', help="only write flagged tickets")
+    args = parser.parse_args()
+
+    tickets_path = args.tickets or (args.history if os.path.isdir(args.history) else 'transport_tickets.json')
+    store = load_history(args.history)
+    tickets = _load_tickets(tickets_path)
+    fill_rates = None
+    if args.fill_rates:
+        fill_rates = FillRateEstimate.load(args.fill_rates)
+        if args.rolling_hours:
+            fill_rates = fill_rates.per_minute(store.start_minute, len(store), store.cauldron_ids, args.rolling_hours)
+    table = reconcile(store, tickets, fill_rates, tolerance=args.tolerance)
+    if args.out.endswith('.json'):
+        table.write_json(args.out, args.flagged_only)
+    else:
+        table.write_csv(args.out, args.flagged_only)
+
+    print(f"Reconciled {len(table)} tickets over {len(store):,} minutes "
+          f"({format_minute(store.start_minute)} to {format_minute(store.start_minute + len(store) - 1)})")
+    for verdict, count in sorted(table.counts().items()):
+        print(f"   {verdict}: {count}")
+    # The generator marks the tickets it underreported; show how well the history recovers them
+    labelled = np.array([bool(t.get('is_suspicious')) for t in tickets])
+    if labelled.any():
+        found = table.verdict == UNDERREPORTED
+        print(f"   Generator-marked suspicious: {labelled.sum()}, flagged underreported: {(found & labelled).sum()}, "
+              f"flagged but not marked: {(found & ~labelled).sum()}")
+    print(f"Wrote {args.out}")
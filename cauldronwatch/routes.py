@@ -0,0 +1,434 @@
+"""
+Multi-stop courier routes from forecast volumes.
+
+The generator sends a witch market -> one cauldron -> market for every
+collection, paying the round trip and UNLOAD_TIME each time. `plan_routes`
+instead builds routes that visit several cauldrons before returning to
+unload, within a witch's carrying capacity and shift:
+
+1. Construction (Clarke-Wright savings per market): every stop starts as
+   its own round trip; joining the route ending at i with the route
+   starting at j saves t(i, m) + t(m, j) - t(i, j). The savings of each stop
+   and its nearest neighbours are computed as one array, sorted, and merged
+   greedily while capacity and route duration allow.
+2. Local search until nothing improves or the wall-clock budget runs out:
+   relocate a stop next to one of its nearest neighbours, swap two stops
+   between routes, and 2-opt inside a route. Only neighbour pairs are tried
+   (granular neighbourhoods), so a pass grows linearly with the stops.
+3. Scheduling: routes in order of their most urgent stop go to the witch and
+   shift window where they finish earliest; a route has to be back and
+   unloaded before the shift ends. Routes no shift can take are reported as
+   unassigned.
+
+A route's duration is travel plus collection time per stop, the generator's
+setup time plus the volume at its collection rate. Travel times are the
+network's shortest paths (cauldronwatch.network).
+
+Command line (forecast from the latest levels of a history file):
+
+    python -m cauldronwatch.routes [--history historical_data.json] [--horizon 1440] [--budget 2]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from cauldronwatch.generator.config import MAX_CAPACITY_PER_WITCH, TRIP_BUFFER, UNLOAD_TIME
+from cauldronwatch.minutes import MINUTES_PER_DAY, format_minute
+from cauldronwatch.network import UNREACHABLE
+
+SHIFT_MINUTES = 8 * 60
+SETUP_MINUTES = 35            # Middle of the generator's 30-40 minute base collection time
+COLLECTION_RATE = 1.75        # L/min, middle of the generator's 1.5-2.0
+DEFAULT_BUDGET = 2.0          # Seconds of local search
+NEIGHBOURS = 20               # Candidate partners per stop in construction and local search
+_FAR = 10 ** 9                # Travel time standing in for "no path"
+
+
+def service_minutes(volume):
+    """Minutes spent collecting `volume` liters at a cauldron"""
+    return SETUP_MINUTES + int(np.ceil(volume / COLLECTION_RATE))
+
+
+def forecast_stops(forecast, horizon_minutes, capacity=MAX_CAPACITY_PER_WITCH):
+    """
+    Stops for plan_routes from an OverflowForecast (cauldronwatch.forecast) that
+    includes `horizon_minutes` among its horizons: every cauldron whose upper band
+    reaches its collection threshold within the horizon, collecting its forecast
+    level at the horizon (at most one full load). The due minute is the earliest
+    time it could overflow.
+    """
+    matches = np.flatnonzero(np.asarray(forecast.horizons) == horizon_minutes)
+    if not matches.size:
+        raise ValueError(f"the forecast has no {horizon_minutes}-minute horizon")
+    volumes = np.minimum(forecast.level_mean[:, matches[0]], capacity).tolist()
+    threshold_earliest = forecast.to_threshold[1].tolist()
+    full_earliest = forecast.to_full[1].tolist()
+    stops = []
+    for cid, volume, due_threshold, due_full in zip(forecast.cauldron_ids, volumes, threshold_earliest, full_earliest):
+        if due_threshold <= horizon_minutes and volume > 0:
+            due = None if np.isinf(due_full) or forecast.now_minute is None else forecast.now_minute + int(due_full)
+            stops.append({'cauldron_id': cid, 'volume': round(volume, 2), 'due': due})
+    return stops
+
+
+class _Routes:
+    """Routes over local stop indices 0..n-1 (markets are n..n+M-1) with cached loads and durations."""
+
+    def __init__(self, dist, volumes, service, capacity, max_duration):
+        self.dist = dist            # Nested lists, (stops + markets) square
+        self.volumes = volumes
+        self.service = service
+        self.capacity = capacity
+        self.max_duration = max_duration
+        self.stops = []             # Route -> list of stops
+        self.market = []            # Route -> market node
+        self.load = []
+        self.travel = []
+        self.where = [None] * len(volumes)
+
+    def travel_of(self, stops, market):
+        d = self.dist
+        if not stops:
+            return 0
+        total = d[market][stops[0]] + d[stops[-1]][market]
+        for a, b in zip(stops, stops[1:]):
+            total += d[a][b]
+        return total
+
+    def duration(self, r):
+        return self.travel[r] + sum(self.service[s] for s in self.stops[r])
+
+    def fits(self, stops, market):
+        """(travel, ok) for a candidate stop list on a market"""
+        travel = self.travel_of(stops, market)
+        load = sum(self.volumes[s] for s in stops)
+        service = sum(self.service[s] for s in stops)
+        return travel, load <= self.capacity and travel + service <= self.max_duration
+
+    def add(self, stops, market):
+        self.stops.append(list(stops))
+        self.market.append(market)
+        self.load.append(sum(self.volumes[s] for s in stops))
+        self.travel.append(self.travel_of(stops, market))
+        for s in stops:
+            self.where[s] = len(self.stops) - 1
+
+    def set(self, r, stops, travel):
+        self.stops[r] = stops
+        self.travel[r] = travel
+        self.load[r] = sum(self.volumes[s] for s in stops)
+        for s in stops:
+            self.where[s] = r
+
+    def total_travel(self):
+        return sum(self.travel)
+
+
+def _savings_construction(routes, stop_market, dist_matrix, neighbours):
+    """Clarke-Wright: one round trip per stop, then merge tail i -> head j in order of savings"""
+    n = len(stop_market)
+    for s in range(n):
+        routes.add([s], stop_market[s])
+    if n < 2:
+        return
+    i = np.repeat(np.arange(n), neighbours.shape[1])
+    j = neighbours.ravel()
+    keep = (stop_market[i] == stop_market[j]) & (i != j)
+    i, j = i[keep], j[keep]
+    m = stop_market[i]
+    savings = dist_matrix[i, m] + dist_matrix[m, j] - dist_matrix[i, j]
+    order = np.argsort(-savings, kind='stable')
+    order = order[savings[order] > 0]
+
+    # Route b's stops are appended to route a, so a route's index is that of its first stop
+    for a, b in zip(i[order].tolist(), j[order].tolist()):
+        ra, rb = routes.where[a], routes.where[b]
+        if ra == rb or routes.stops[ra][-1] != a or routes.stops[rb][0] != b:
+            continue
+        if routes.load[ra] + routes.load[rb] > routes.capacity:
+            continue
+        market = routes.market[ra]
+        travel = routes.travel[ra] + routes.travel[rb] - routes.dist[a][market] - routes.dist[market][b] + routes.dist[a][b]
+        service = sum(routes.service[s] for s in routes.stops[ra]) + sum(routes.service[s] for s in routes.stops[rb])
+        if travel + service > routes.max_duration:
+            continue
+        routes.set(ra, routes.stops[ra] + routes.stops[rb], travel)
+        routes.stops[rb] = []
+        routes.travel[rb] = 0
+        routes.load[rb] = 0
+
+
+def _local_search(routes, neighbours, deadline):
+    """Relocate / swap between neighbouring stops and 2-opt inside routes, first improvement"""
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for u in range(len(routes.where)):
+            if time.perf_counter() >= deadline:
+                return
+            for v in neighbours[u]:
+                if _relocate(routes, u, v) or _swap(routes, u, v):
+                    improved = True
+                    break
+        for r in range(len(routes.stops)):
+            if len(routes.stops[r]) >= 3 and _two_opt(routes, r):
+                improved = True
+
+
+def _relocate(routes, u, v):
+    """Move u right before or after v; True if that shortened the plan"""
+    ra, rb = routes.where[u], routes.where[v]
+    a = [s for s in routes.stops[ra] if s != u]
+    old = routes.travel[ra] + (routes.travel[rb] if rb != ra else 0)
+    travel_a = routes.travel_of(a, routes.market[ra]) if rb != ra else None
+    base = a if rb == ra else routes.stops[rb]
+    at = base.index(v)
+    for position in (at, at + 1):
+        b = base[:position] + [u] + base[position:]
+        travel_b, ok = routes.fits(b, routes.market[rb])
+        if not ok:
+            continue
+        new = travel_b + (travel_a if rb != ra else 0)
+        if new < old:
+            if rb != ra:
+                routes.set(ra, a, travel_a)
+            routes.set(rb, b, travel_b)
+            return True
+    return False
+
+
+def _swap(routes, u, v):
+    """Exchange u and v between two routes; True if that shortened the plan"""
+    ra, rb = routes.where[u], routes.where[v]
+    if ra == rb:
+        return False
+    a = [v if s == u else s for s in routes.stops[ra]]
+    b = [u if s == v else s for s in routes.stops[rb]]
+    travel_a, ok_a = routes.fits(a, routes.market[ra])
+    travel_b, ok_b = routes.fits(b, routes.market[rb])
+    if ok_a and ok_b and travel_a + travel_b < routes.travel[ra] + routes.travel[rb]:
+        routes.set(ra, a, travel_a)
+        routes.set(rb, b, travel_b)
+        return True
+    return False
+
+
+def _two_opt(routes, r):
+    """Best segment reversal inside route r; True if it shortened the route"""
+    stops, market = routes.stops[r], routes.market[r]
+    best, best_travel = None, routes.travel[r]
+    for i in range(len(stops) - 1):
+        for j in range(i + 2, len(stops) + 1):
+            candidate = stops[:i] + stops[i:j][::-1] + stops[j:]
+            travel = routes.travel_of(candidate, market)
+            if travel < best_travel:
+                best, best_travel = candidate, travel
+    if best is None:
+        return False
+    routes.set(r, best, best_travel)
+    return True
+
+
+class RoutePlan:
+    """Scheduled routes, the stops no shift could take, and totals."""
+
+    def __init__(self, routes, unassigned, stats):
+        self.routes = routes
+        self.unassigned = unassigned
+        self.stats = stats
+
+    def to_json(self):
+        return {'metadata': self.stats, 'routes': self.routes, 'unassigned': self.unassigned}
+
+
+def _shift_windows(couriers, start_minute, end_minute):
+    """[(courier, window start, window end)] for every shift that overlaps the planning period"""
+    windows = []
+    first_day = start_minute // MINUTES_PER_DAY
+    last_day = end_minute // MINUTES_PER_DAY
+    for courier in couriers:
+        for day in range(first_day, last_day + 1):
+            begin = day * MINUTES_PER_DAY + (courier['shift'] - 1) * SHIFT_MINUTES
+            end = begin + SHIFT_MINUTES
+            if end > start_minute and begin < end_minute:
+                windows.append((courier, max(begin, start_minute), end))
+    return windows
+
+
+def plan_routes(travel, stops, couriers, home_market, start_minute, horizon_minutes=MINUTES_PER_DAY,
+                budget_seconds=DEFAULT_BUDGET, neighbours=NEIGHBOURS):
+    """
+    Plan routes for `stops` ([{'cauldron_id', 'volume', 'due'}], e.g. from forecast_stops)
+    starting at epoch minute `start_minute`.
+
+    `travel` is a TravelTimes (cauldronwatch.network), `couriers` the cauldrons.json
+    roster and `home_market` {cauldron_id: market id} (Facility.home_market).
+    """
+    began = time.perf_counter()
+    deadline = began + budget_seconds
+    capacity = min([c.get('max_carrying_capacity', MAX_CAPACITY_PER_WITCH) for c in couriers] or [MAX_CAPACITY_PER_WITCH])
+    max_duration = SHIFT_MINUTES - UNLOAD_TIME
+    requested = len(stops)
+
+    # Stops a single-stop round trip cannot serve within a shift (no path, or too far) are unassigned up front
+    cauldron_nodes = [travel.index[s['cauldron_id']] for s in stops]
+    market_nodes = [travel.index[home_market[s['cauldron_id']]] for s in stops]
+    there = travel.minutes[market_nodes, cauldron_nodes].astype(np.int64)
+    back = travel.minutes[cauldron_nodes, market_nodes].astype(np.int64)
+    servable = (there != UNREACHABLE) & (back != UNREACHABLE) & (there + back + SETUP_MINUTES < max_duration)
+    unassigned = [s['cauldron_id'] for s, ok in zip(stops, servable.tolist()) if not ok]
+    stops = [s for s, ok in zip(stops, servable.tolist()) if ok]
+
+    # Local nodes: stops first, then their markets
+    stop_ids = [s['cauldron_id'] for s in stops]
+    market_ids = sorted({home_market[cid] for cid in stop_ids})
+    nodes = [travel.index[node] for node in stop_ids + market_ids]
+    dist_matrix = travel.minutes[np.ix_(nodes, nodes)].astype(np.int64)
+    dist_matrix[dist_matrix == UNREACHABLE] = _FAR
+    n = len(stops)
+    stop_market = np.array([n + market_ids.index(home_market[cid]) for cid in stop_ids], dtype=np.int64)
+    # A visit collects at most one load, and no more than a round trip can collect within a shift
+    round_trip = dist_matrix[stop_market, np.arange(n)] + dist_matrix[np.arange(n), stop_market]
+    in_shift = (max_duration - SETUP_MINUTES - round_trip) * COLLECTION_RATE
+    volumes = [max(0.0, min(float(s['volume']), capacity, limit)) for s, limit in zip(stops, in_shift.tolist())]
+    service = [service_minutes(v) for v in volumes]
+    routes = _Routes(dist_matrix.tolist(), volumes, service, capacity, max_duration)
+
+    # Nearest stops by round-trip time
+    k = min(neighbours, n - 1)
+    if k > 0:
+        around = dist_matrix[:n, :n] + dist_matrix[:n, :n].T
+        np.fill_diagonal(around, np.iinfo(np.int64).max)
+        near = np.argpartition(around, k - 1, axis=1)[:, :k]
+        near = np.take_along_axis(near, np.argsort(np.take_along_axis(around, near, axis=1), axis=1), axis=1)
+    else:
+        near = np.zeros((n, 0), dtype=np.int64)
+
+    _savings_construction(routes, stop_market, dist_matrix, near)
+    constructed = routes.total_travel()
+    _local_search(routes, near.tolist(), deadline)
+    searched = time.perf_counter()
+
+    # Schedule routes on shift windows, most urgent first
+    def urgency(r):
+        dues = [stops[s]['due'] for s in routes.stops[r] if stops[s].get('due') is not None]
+        return (min(dues) if dues else float('inf'), -routes.load[r])
+
+    live = sorted((r for r in range(len(routes.stops)) if routes.stops[r]), key=urgency)
+    windows = _shift_windows(couriers, start_minute, start_minute + horizon_minutes)
+    free_at = {}       # courier_id -> (minute free, market node)
+    planned = []
+    for r in live:
+        market = routes.market[r]
+        duration = routes.duration(r)
+        best = None
+        for courier, begin, end in windows:
+            cid = courier['courier_id']
+            free, at = free_at.get(cid, (None, None))
+            departure = begin
+            if free is not None and free + TRIP_BUFFER + routes.dist[at][market] > begin:
+                departure = free + TRIP_BUFFER + routes.dist[at][market]
+            finish = departure + duration + UNLOAD_TIME
+            if finish <= end and (best is None or finish < best[0]):
+                best = (finish, departure, courier)
+        if best is None:
+            unassigned.extend(stop_ids[s] for s in routes.stops[r])
+            continue
+        finish, departure, courier = best
+        free_at[courier['courier_id']] = (finish, market)
+
+        minute = departure
+        previous = market
+        visits = []
+        for s in routes.stops[r]:
+            minute += routes.dist[previous][s]
+            due = stops[s].get('due')
+            visits.append({
+                'cauldron_id': stop_ids[s],
+                'arrival': format_minute(minute),
+                'requested_liters': stops[s]['volume'],
+                'collect_liters': round(volumes[s], 2),
+                'service_minutes': service[s],
+                'late': due is not None and minute + service[s] > due,
+            })
+            minute += service[s]
+            previous = s
+        planned.append({
+            'courier_id': courier['courier_id'],
+            'shift': courier['shift'],
+            'market': market_ids[market - n],
+            'departure': format_minute(departure),
+            'return': format_minute(finish - UNLOAD_TIME),
+            'unload_complete': format_minute(finish),
+            'load_liters': round(routes.load[r], 2),
+            'travel_minutes': routes.travel[r],
+            'stops': visits,
+        })
+    planned.sort(key=lambda route: (route['departure'], route['courier_id']))
+
+    # The planned stops as single-stop round trips, for comparison
+    skipped = set(unassigned)
+    single_stop = int(sum(round_trip[s] for r in live for s in routes.stops[r] if stop_ids[s] not in skipped))
+    stats = {
+        'start': format_minute(start_minute),
+        'horizon_minutes': horizon_minutes,
+        'stops': requested,
+        'routes': len(planned),
+        'unassigned_stops': len(unassigned),
+        'late_stops': sum(v['late'] for route in planned for v in route['stops']),
+        'travel_minutes': sum(route['travel_minutes'] for route in planned),
+        'construction_travel_minutes': int(constructed),
+        'single_stop_travel_minutes': single_stop,
+        'search_seconds': round(searched - began, 3),
+        'total_seconds': round(time.perf_counter() - began, 3),
+    }
+    return RoutePlan(planned, unassigned, stats)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Plan multi-stop courier routes from an overflow forecast")
+    parser.add_argument('--history', default='historical_data.json',
+                        help="historical_data.json, .ndjson, .bin or a dataset directory (default historical_data.json)")
+    parser.add_argument('--fill-rates', metavar='PATH', help="fill_rates.json (default: fit from the history)")
+    parser.add_argument('--cauldrons', default='cauldrons.json', help="facility file (default cauldrons.json)")
+    parser.add_argument('--horizon', type=int, default=MINUTES_PER_DAY, help="planning period in minutes (default 1440)")
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help=f"local search wall-clock seconds (default {DEFAULT_BUDGET})")
+    parser.add_argument('-o', '--out', default='routes.json', help="output file (default routes.json)")
+    args = parser.parse_args()
+
+    from cauldronwatch.fillrates import load_or_estimate
+    from cauldronwatch.forecast import Forecaster
+    from cauldronwatch.generator.config import scenario_rates
+    from cauldronwatch.generator.inputs import Facility
+    from cauldronwatch.reconcile import load_history
+
+    facility = Facility(args.cauldrons)
+    store = load_history(args.history)
+    estimate = load_or_estimate(store, args.fill_rates, {cid: c['max_volume'] for cid, c in facility.cauldrons.items()})
+    _, thresholds = scenario_rates(facility.cauldrons)
+    forecaster = Forecaster.from_estimate(estimate, facility.cauldrons, thresholds, horizons=[args.horizon])
+    now = store.start_minute + len(store) - 1
+    stops = forecast_stops(forecaster(store.row(-1), now), args.horizon)
+
+    plan = plan_routes(facility.travel, stops, facility.couriers, facility.home_market, now + 1,
+                       args.horizon, args.budget)
+    tmp_path = args.out + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(plan.to_json(), f, indent=2)
+    os.replace(tmp_path, args.out)
+
+    stats = plan.stats
+    print(f"Planned {stats['stops']} stops from {stats['start']} in {stats['routes']} routes "
+          f"({stats['total_seconds']:.3f}s)")
+    print(f"   Travel: {stats['travel_minutes']} min (single-stop trips: {stats['single_stop_travel_minutes']} min, "
+          f"after construction: {stats['construction_travel_minutes']} min)")
+    print(f"   Unassigned stops: {stats['unassigned_stops']}, late stops: {stats['late_stops']}")
+    for route in plan.routes:
+        print(f"   {route['departure']} {route['courier_id']}: "
+              f"{' -> '.join(v['cauldron_id'] for v in route['stops'])} ({route['load_liters']} L)")
+    print(f"Wrote {args.out}")
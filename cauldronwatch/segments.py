@@ -0,0 +1,325 @@
+"""
+Append-only dataset stored as one compressed segment per day.
+
+    dataset/
+        manifest.json          range, last levels, ticket counter, per-day index
+        2024-11-08.json.gz     {'date', 'start', 'cauldron_ids', 'levels',
+        2024-11-09.json.gz      'transport_tickets', 'unreported_drains'}
+
+The extend scripts only need the last minute's levels and the highest ticket
+number to continue a run, and both are kept in the manifest. Extending
+therefore reads the manifest and writes only the days it generated.
+Replacing a day rewrites only that day's segment. Levels are rows of
+`cauldron_ids` order; tickets are filed under the day of their
+collection_start_timestamp and unreported drains under the day of their
+drain_start_timestamp.
+
+`import_json` builds a dataset from the three JSON files and `export_json`
+writes them back for consumers (API, chart pages).
+"""
+
+import gzip
+import json
+import os
+
+from cauldronwatch.levels import LevelStore
+from cauldronwatch.minutes import MINUTES_PER_DAY, format_date, format_minute, parse_minute
+
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+
+
+def _write_atomic(path, data, compress=False):
+    """Write a JSON document via a temporary file, so readers never see half of it"""
+    tmp_path = path + '.tmp'
+    if compress:
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+    else:
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def ticket_number(ticket):
+    """Running number at the end of a ticket id (TT_20241108_231 -> 231)"""
+    return int(ticket['ticket_id'].split('_')[-1])
+
+
+class SegmentedDataset:
+    """Per-day segments of levels, tickets and unreported drains plus a manifest."""
+
+    def __init__(self, root):
+        self.root = root
+        self.manifest = None
+        if os.path.exists(self._path(MANIFEST_NAME)):
+            with open(self._path(MANIFEST_NAME), 'r') as f:
+                self.manifest = json.load(f)
+            if self.manifest.get('version') != FORMAT_VERSION:
+                raise ValueError(f"unsupported dataset version in {root}: {self.manifest.get('version')}")
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    @property
+    def exists(self):
+        return self.manifest is not None
+
+    @property
+    def cauldron_ids(self):
+        return self.manifest['cauldron_ids']
+
+    @property
+    def start_minute(self):
+        """Epoch minute of the first stored row"""
+        return parse_minute(self.manifest['start'])
+
+    @property
+    def end_minute(self):
+        """Epoch minute of the last stored row"""
+        return parse_minute(self.manifest['end'])
+
+    @property
+    def last_levels(self):
+        """{cauldron_id: level} at the last stored minute"""
+        return dict(self.manifest['last_levels'])
+
+    @property
+    def ticket_counter(self):
+        """Highest ticket number in the dataset (0 if there are no tickets)"""
+        return self.manifest['ticket_counter']
+
+    def ticket_counter_before(self, day):
+        """Highest ticket number filed before `day` ('YYYY-MM-DD'), for replacing that day onwards"""
+        return max((s['max_ticket_number'] for d, s in self.manifest['segments'].items() if d < day), default=0)
+
+    @property
+    def total_minutes(self):
+        return sum(s['rows'] for s in self.manifest['segments'].values())
+
+    @property
+    def total_tickets(self):
+        return sum(s['tickets'] for s in self.manifest['segments'].values())
+
+    @property
+    def total_unreported_drains(self):
+        return sum(s['unreported_drains'] for s in self.manifest['segments'].values())
+
+    def days(self):
+        """Stored days as sorted 'YYYY-MM-DD' strings"""
+        return sorted(self.manifest['segments']) if self.exists else []
+
+    def read_day(self, day):
+        """Load one day's segment: {'levels': LevelStore, 'transport_tickets', 'unreported_drains'}"""
+        with gzip.open(self._path(self.manifest['segments'][day]['file']), 'rt', encoding='utf-8') as f:
+            segment = json.load(f)
+        levels = LevelStore(segment['cauldron_ids'], parse_minute(segment['start']), capacity=len(segment['levels']))
+        if segment['levels']:
+            levels.append(segment['levels'])
+        return {
+            'levels': levels,
+            'transport_tickets': segment['transport_tickets'],
+            'unreported_drains': segment['unreported_drains'],
+        }
+
+    def levels_at(self, minute):
+        """{cauldron_id: level} at one stored epoch minute (reads a single segment)"""
+        levels = self.read_day(format_date(minute))['levels']
+        row = levels.row_of(minute)
+        if not 0 <= row < len(levels):
+            raise KeyError(f"no levels stored for {format_minute(minute)}")
+        return levels.row(row)
+
+    def write(self, store, tickets=(), unreported_drains=()):
+        """
+        Store the minutes in `store` plus their tickets and drains, one segment per day.
+        Everything from the first new minute on is replaced: earlier minutes of a partially
+        covered day are kept, days before it are left untouched and days after the last
+        new minute are dropped, so the dataset always ends where `store` ends.
+        """
+        if not len(store):
+            raise ValueError("no minutes to write")
+        if self.exists:
+            if store.cauldron_ids != self.cauldron_ids:
+                raise ValueError("cauldron order differs from the dataset's")
+            if store.start_minute > self.end_minute + 1:
+                raise ValueError(f"gap in levels: dataset ends at {self.manifest['end']}, "
+                                 f"new data starts at {format_minute(store.start_minute)}")
+            if store.start_minute < self.start_minute:
+                raise ValueError(f"new data starts at {format_minute(store.start_minute)}, "
+                                 f"before the dataset start {self.manifest['start']}")
+        else:
+            os.makedirs(self.root, exist_ok=True)
+            self.manifest = {
+                'version': FORMAT_VERSION,
+                'cauldron_ids': list(store.cauldron_ids),
+                'start': format_minute(store.start_minute),
+                'end': format_minute(store.end_minute),
+                'last_levels': {},
+                'ticket_counter': 0,
+                'metadata': {},
+                'segments': {},
+            }
+
+        # Split rows at day boundaries
+        days = []
+        row = 0
+        while row < len(store):
+            day_start = store.minute(row) // MINUTES_PER_DAY * MINUTES_PER_DAY
+            day_end = min(len(store), store.row_of(day_start + MINUTES_PER_DAY))
+            days.append((format_date(day_start), row, day_end))
+            row = day_end
+
+        # File tickets/drains under their day, clamped to the written days
+        def day_of(timestamp):
+            return min(max(timestamp[:10], days[0][0]), days[-1][0])
+        tickets_by_day = {}
+        for ticket in tickets:
+            tickets_by_day.setdefault(day_of(ticket['collection_start_timestamp']), []).append(ticket)
+        drains_by_day = {}
+        for drain in unreported_drains:
+            drains_by_day.setdefault(day_of(drain['drain_start_timestamp']), []).append(drain)
+
+        for day, first, stop in days:
+            start = store.minute(first)
+            start_text = format_minute(start)
+            levels = store.levels[first:stop].tolist()
+            day_tickets = tickets_by_day.get(day, [])
+            day_drains = drains_by_day.get(day, [])
+            if day in self.manifest['segments'] and self.manifest['segments'][day]['start'] < start_text:
+                # Continue a partially stored day: keep what came before the new minutes
+                existing = self.read_day(day)
+                kept = existing['levels'].row_of(start)
+                levels = existing['levels'].levels[:kept].tolist() + levels
+                day_tickets = [t for t in existing['transport_tickets'] if t['collection_start_timestamp'] < start_text] + day_tickets
+                day_drains = [d for d in existing['unreported_drains'] if d['drain_start_timestamp'] < start_text] + day_drains
+                start = existing['levels'].start_minute
+
+            name = f"{day}.json.gz"
+            _write_atomic(self._path(name), {
+                'date': day,
+                'start': format_minute(start),
+                'cauldron_ids': list(store.cauldron_ids),
+                'levels': levels,
+                'transport_tickets': day_tickets,
+                'unreported_drains': day_drains,
+            }, compress=True)
+            self.manifest['segments'][day] = {
+                'file': name,
+                'start': format_minute(start),
+                'rows': len(levels),
+                'tickets': len(day_tickets),
+                'suspicious_tickets': sum(1 for t in day_tickets if t.get('is_suspicious')),
+                'unreported_drains': len(day_drains),
+                'max_ticket_number': max((ticket_number(t) for t in day_tickets), default=0),
+            }
+
+        # Days after the written ones belonged to the replaced run; the manifest stops
+        # listing them before their files go, so readers never see a missing segment
+        stale = [self.manifest['segments'].pop(day)['file'] for day in self.days() if day > days[-1][0]]
+
+        # Range and continuation state
+        self.manifest['end'] = format_minute(store.end_minute)
+        self.manifest['last_levels'] = store.row(-1)
+        self.manifest['ticket_counter'] = max(s['max_ticket_number'] for s in self.manifest['segments'].values())
+        _write_atomic(self._path(MANIFEST_NAME), self.manifest)
+        for name in stale:
+            os.remove(self._path(name))
+
+    def read_all(self):
+        """Load every segment: (LevelStore, tickets, unreported drains)"""
+        history = LevelStore(self.cauldron_ids, self.start_minute, capacity=self.total_minutes)
+        tickets = []
+        drains = []
+        for day in self.days():
+            segment = self.read_day(day)
+            if len(segment['levels']) and segment['levels'].start_minute != history.start_minute + len(history):
+                raise ValueError(f"segment {day} does not continue the previous day")
+            history.append(segment['levels'].levels)
+            tickets.extend(segment['transport_tickets'])
+            drains.extend(segment['unreported_drains'])
+        return history, tickets, drains
+
+
+def import_json(root, history_path='historical_data.json', tickets_path='transport_tickets.json',
+                drains_path='unreported_drains.json'):
+    """Build a segmented dataset from the three JSON files"""
+    with open(history_path, 'r') as f:
+        hist = json.load(f)
+    with open(tickets_path, 'r') as f:
+        tickets_data = json.load(f)
+    with open(drains_path, 'r') as f:
+        drains_data = json.load(f)
+
+    dataset = SegmentedDataset(root)
+    if dataset.exists:
+        raise ValueError(f"{root} already holds a dataset")
+    dataset.write(LevelStore.from_records(hist.pop('data')), tickets_data['transport_tickets'],
+                  drains_data['unreported_drains'])
+    # Keep the descriptive metadata of each file for export
+    dataset.manifest['metadata'] = {
+        'history': hist.get('metadata', {}),
+        'transport_tickets': tickets_data.get('metadata', {}),
+        'unreported_drains': drains_data.get('metadata', {}),
+    }
+    _write_atomic(dataset._path(MANIFEST_NAME), dataset.manifest)
+    return dataset
+
+
+def export_json(root, history_path='historical_data.json', tickets_path='transport_tickets.json',
+                drains_path='unreported_drains.json'):
+    """Write the three JSON files from a segmented dataset"""
+    from cauldronwatch.stream import write_history_json
+
+    dataset = SegmentedDataset(root)
+    if not dataset.exists:
+        raise ValueError(f"no dataset in {root}")
+    history, tickets, drains = dataset.read_all()
+    metadata = dataset.manifest.get('metadata', {})
+
+    history_meta = dict(metadata.get('history', {}))
+    history_meta.update({
+        'start_date': format_minute(history.start_minute),
+        'end_date': format_minute(history.end_minute),
+        'total_minutes': len(history),
+        'total_collections': len(tickets),
+        'data_points': len(history),
+    })
+    write_history_json(history_path, history_meta, history)
+
+    tickets_meta = dict(metadata.get('transport_tickets', {}))
+    tickets_meta.update({
+        'total_tickets': len(tickets),
+        'suspicious_tickets': sum(1 for t in tickets if t.get('is_suspicious')),
+        'date_range': {
+            'start': min((t['collection_start_timestamp'] for t in tickets), default=None),
+            'end': max((t['collection_start_timestamp'] for t in tickets), default=None),
+        },
+    })
+    with open(tickets_path, 'w') as f:
+        json.dump({'metadata': tickets_meta, 'transport_tickets': tickets}, f, indent=2)
+
+    drains_meta = dict(metadata.get('unreported_drains', {}))
+    drains_meta.update({
+        'total_unreported_drains': len(drains),
+        'date_range': {
+            'start': min((d['drain_start_timestamp'] for d in drains), default=None),
+            'end': max((d['drain_start_timestamp'] for d in drains), default=None),
+        },
+    })
+    with open(drains_path, 'w') as f:
+        json.dump({'metadata': drains_meta, 'unreported_drains': drains}, f, indent=2)
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) != 3 or sys.argv[1] not in ('import', 'export'):
+        sys.exit("usage: python -m cauldronwatch.segments import|export DATASET_DIR")
+    if sys.argv[1] == 'import':
+        imported = import_json(sys.argv[2])
+        print(f"Imported {imported.total_minutes:,} minutes, {imported.total_tickets} tickets and "
+              f"{imported.total_unreported_drains} unreported drains into {sys.argv[2]}")
+    else:
+        export_json(sys.argv[2])
+        print(f"Exported {sys.argv[2]} to historical_data.json, transport_tickets.json, unreported_drains.json")
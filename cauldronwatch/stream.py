@@ -0,0 +1,127 @@
+"""
+Streaming writers for minute-level history.
+
+`json.dump(..., indent=2)` of the whole run needs every record in memory and
+writes nothing until the end. These writers emit records as they are
+produced:
+
+- `HistoryStreamWriter` writes NDJSON (one `{'timestamp', 'cauldron_levels'}`
+  record per line) and flushes regularly, so a crashed run keeps everything
+  up to the last flush. Metadata goes to a `.meta.json` sidecar on close.
+- `write_history_json` writes the usual historical_data.json layout record by
+  record instead of building the full list first.
+"""
+
+import json
+import os
+
+from cauldronwatch.levels import LevelStore
+from cauldronwatch.minutes import format_minute, parse_minute
+
+
+def sidecar_path(path):
+    """Metadata sidecar for an NDJSON history file (historical_data.ndjson -> historical_data.meta.json)"""
+    return os.path.splitext(path)[0] + '.meta.json'
+
+
+class HistoryStreamWriter:
+    """Append-only NDJSON history file with a metadata sidecar."""
+
+    def __init__(self, path, cauldron_ids, flush_rows=1440):
+        self.path = path
+        self.cauldron_ids = list(cauldron_ids)
+        self.flush_rows = flush_rows
+        self.rows_written = 0
+        self.first_minute = None
+        self.next_minute = None  # Epoch minute the next row must start at
+        self._unflushed = 0
+        self._file = open(path, 'w')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._file.closed:
+            # Leave what was written readable, but mark the run as incomplete
+            self.close({'complete': False} if exc_type else None)
+
+    def write(self, start_minute, rows):
+        """Write a block of rows (columns in `cauldron_ids` order) starting at epoch minute `start_minute`"""
+        if self.next_minute is not None and start_minute != self.next_minute:
+            raise ValueError(f"rows must be contiguous: expected {format_minute(self.next_minute)}, "
+                             f"got {format_minute(start_minute)}")
+        if self.first_minute is None:
+            self.first_minute = start_minute
+        minute = start_minute
+        lines = []
+        for row in rows.tolist():
+            lines.append(json.dumps({
+                'timestamp': format_minute(minute),
+                'cauldron_levels': dict(zip(self.cauldron_ids, row))
+            }, separators=(',', ':')))
+            minute += 1
+        if lines:
+            self._file.write('\n'.join(lines) + '\n')
+        self.rows_written += len(lines)
+        self.next_minute = start_minute + len(lines)
+
+        self._unflushed += len(lines)
+        if self._unflushed >= self.flush_rows:
+            self._file.flush()
+            self._unflushed = 0
+
+    def close(self, metadata=None):
+        """Close the data file and write the sidecar (`metadata` plus what was written)"""
+        self._file.close()
+        sidecar = {
+            'format': 'ndjson',
+            'data_file': os.path.basename(self.path),
+            'data_points': self.rows_written,
+            'first_timestamp': format_minute(self.first_minute) if self.first_minute is not None else None,
+            'last_timestamp': format_minute(self.next_minute - 1) if self.next_minute is not None else None,
+            'complete': True,
+        }
+        sidecar.update(metadata or {})
+        # Write-then-rename so a reader never sees a half-written sidecar
+        tmp_path = sidecar_path(self.path) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(sidecar, f, indent=2)
+        os.replace(tmp_path, sidecar_path(self.path))
+
+
+def read_history_stream(path, capacity=1440):
+    """Load an NDJSON history file into a LevelStore; returns (store, sidecar metadata or None)"""
+    store = None
+    block = []
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if store is None:
+                store = LevelStore(record['cauldron_levels'].keys(), parse_minute(record['timestamp']), capacity=capacity)
+            block.append([record['cauldron_levels'][cid] for cid in store.cauldron_ids])
+            if len(block) >= capacity:
+                store.append(block)
+                block = []
+    if store is None:
+        raise ValueError(f"no history records in {path}")
+    if block:
+        store.append(block)
+
+    metadata = None
+    if os.path.exists(sidecar_path(path)):
+        with open(sidecar_path(path), 'r') as f:
+            metadata = json.load(f)
+    return store, metadata
+
+
+def write_history_json(path, metadata, store):
+    """Write historical_data.json ({'metadata', 'data'}, indent=2) without building the record list"""
+    with open(path, 'w') as f:
+        f.write('{\n  "metadata": ' + json.dumps(metadata, indent=2).replace('\n', '\n  ') + ',\n  "data": [')
+        first = True
+        for record in store.iter_records():
+            f.write(('\n    ' if first else ',\n    ') + json.dumps(record, indent=2).replace('\n', '\n    '))
+            first = False
+        f.write(']\n}' if first else '\n  ]\n}')
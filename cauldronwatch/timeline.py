@@ -0,0 +1,75 @@
+"""
+Per-courier timeline of committed trips.
+
+Each courier's trips (departure from market -> unload complete) are kept as
+sorted, non-overlapping intervals. Availability checks are a bisect, the
+latest unload is cached, and trips that can no longer conflict with new
+dispatches are pruned, so dispatch cost does not grow with the simulated
+horizon.
+"""
+
+from bisect import bisect_left, bisect_right
+
+# Compact the pruned prefix once it is this large and at least half the lists
+_COMPACT_AFTER = 64
+
+
+class CourierTimeline:
+    """Sorted busy periods of one courier with O(log n) availability checks."""
+
+    def __init__(self):
+        self._starts = []
+        self._ends = []
+        self._head = 0        # Index of the first live (un-pruned) trip
+        self.last_end = None  # Latest unload seen, kept even after pruning
+
+    def __len__(self):
+        return len(self._starts) - self._head
+
+    def __iter__(self):
+        return iter(zip(self._starts[self._head:], self._ends[self._head:]))
+
+    def is_free(self, start, end, buffer):
+        """True if no trip overlaps [start - buffer, end + buffer]"""
+        i = bisect_right(self._ends, start - buffer, lo=self._head)
+        return i == len(self._starts) or self._starts[i] >= end + buffer
+
+    def earliest_departure(self, now, buffer):
+        """Earliest time at/after `now` that leaves `buffer` after the latest unload"""
+        if self.last_end is None:
+            return now
+        return max(now, self.last_end + buffer)
+
+    def add(self, start, end):
+        """Commit a trip; it must not overlap an existing one"""
+        if end < start:
+            raise ValueError(f"trip end {end} is before its start {start}")
+        i = bisect_left(self._starts, start, lo=self._head)
+        if (i > self._head and self._ends[i - 1] > start) or (i < len(self._starts) and self._starts[i] < end):
+            raise ValueError(f"trip {start} - {end} overlaps an existing trip")
+        self._starts.insert(i, start)
+        self._ends.insert(i, end)
+        if self.last_end is None or end > self.last_end:
+            self.last_end = end
+
+    def prune(self, before):
+        """Forget trips that ended before `before` (they can't conflict with later ones)"""
+        self._head = bisect_left(self._ends, before, lo=self._head)
+        if self._head >= _COMPACT_AFTER and self._head * 2 >= len(self._starts):
+            del self._starts[:self._head]
+            del self._ends[:self._head]
+            self._head = 0
+
+    def to_state(self):
+        """Live trips and the latest unload, for checkpoints (pruned trips are dropped)"""
+        return {'trips': [[start, end] for start, end in self], 'last_end': self.last_end}
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild from to_state() output"""
+        timeline = cls()
+        for start, end in state['trips']:
+            timeline._starts.append(start)
+            timeline._ends.append(end)
+        timeline.last_end = state['last_end']
+        return timeline
@@ -0,0 +1,95 @@
+"""
+Cumulative wall time per phase of a generator run.
+
+The generator calls `lap(name)` at the end of each phase; the time since the
+previous lap is charged to that phase and the phase's call count goes up.
+Laps are a perf_counter call and two dict updates, so the timer stays on in
+normal runs and the benchmark suite (benchmark.py) reads `seconds` from the
+finished run.
+
+`ProfileReport` turns a timer into the --profile JSON report (per-phase
+time, calls and share, peak memory, simulated minutes per second). It is
+only created when profiling is on; the generator loop then pays one
+perf_counter comparison per iteration to see if a periodic report is due.
+"""
+
+import json
+import os
+import sys
+from collections import defaultdict
+from time import perf_counter
+
+try:
+    import resource
+except ImportError:  # Not on Windows
+    resource = None
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS), or None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class PhaseTimer:
+    """Wall time and call counts charged to named phases between consecutive laps."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.started = self._last = perf_counter()
+
+    def lap(self, phase):
+        """Charge the time since the previous lap (or creation) to `phase`"""
+        now = perf_counter()
+        self.seconds[phase] += now - self._last
+        self.calls[phase] += 1
+        self._last = now
+
+    def report(self):
+        """{phase: seconds} rounded for output, in the order phases first ran"""
+        return {phase: round(seconds, 6) for phase, seconds in self.seconds.items()}
+
+
+class ProfileReport:
+    """Writes a PhaseTimer's profile to a JSON file at the end of a run and every `every_seconds`."""
+
+    def __init__(self, timer, path, every_seconds=60):
+        self.timer = timer
+        self.path = path
+        self.every_seconds = every_seconds
+        self._next_write = perf_counter() + every_seconds
+
+    def build(self, simulated_minutes, finished=False):
+        elapsed = perf_counter() - self.timer.started
+        timed = sum(self.timer.seconds.values())
+        return {
+            'status': 'finished' if finished else 'running',
+            'elapsed_seconds': round(elapsed, 4),
+            'simulated_minutes': simulated_minutes,
+            'minutes_per_second': round(simulated_minutes / elapsed, 1) if elapsed else None,
+            'peak_rss_bytes': peak_rss_bytes(),
+            'phases': {
+                phase: {
+                    'seconds': round(seconds, 6),
+                    'calls': self.timer.calls[phase],
+                    'share': round(seconds / timed, 4) if timed else None,
+                }
+                for phase, seconds in self.timer.seconds.items()
+            },
+        }
+
+    def write(self, simulated_minutes, finished=False):
+        """Write the report now (atomically, so a reader never sees half a file)"""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.build(simulated_minutes, finished), f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._next_write = perf_counter() + self.every_seconds
+
+    def maybe_write(self, simulated_minutes):
+        """Write a progress report if `every_seconds` have passed since the last one"""
+        if perf_counter() >= self._next_write:
+            self.write(simulated_minutes)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from cauldronwatch.binary import LevelBinaryWriter, load_levels_binary, write_levels_binary
+from cauldronwatch.levels import LevelStore
+from cauldronwatch.minutes import parse_minute
+
+IDS = ['cauldron_001', 'cauldron_002', 'cauldron_003', 'cauldron_004']
+START = parse_minute('2024-11-08T00:00:00Z')
+
+
+def random_store(minutes, seed=0):
+    rng = np.random.default_rng(seed)
+    store = LevelStore(IDS, START, capacity=minutes)
+    store.append(np.round(rng.uniform(0, 1200, size=(minutes, len(IDS))), 2))
+    return store
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'levels.bin')
+    original = random_store(2000)
+    write_levels_binary(path, original)
+
+    loaded = load_levels_binary(path)
+    assert loaded.cauldron_ids == IDS
+    assert loaded.start_minute == original.start_minute == START
+    assert len(loaded) == len(original)
+    assert loaded.levels.dtype == np.float32
+    # float32 keeps about 7 significant digits: ~1e-4 L at 1200 L
+    np.testing.assert_allclose(loaded.levels, original.levels, rtol=0, atol=1e-4)
+    np.testing.assert_allclose(loaded.column('cauldron_003'), original.column('cauldron_003'), rtol=0, atol=1e-4)
+
+
+def test_blocks_and_partial_rows(tmp_path):
+    path = str(tmp_path / 'levels.bin')
+    original = random_store(1000, seed=1)
+    with LevelBinaryWriter(path, IDS) as writer:
+        for first in range(0, 1000, 333):
+            writer.write(original.minute(first), original.levels[first:first + 333])
+        with pytest.raises(ValueError, match='contiguous'):
+            writer.write(original.minute(0), original.levels[:1])
+    assert writer.rows_written == 1000
+
+    # A run cut off mid-row: the partial last row is ignored
+    with open(path, 'ab') as f:
+        f.write(b'\0' * 6)
+    loaded = load_levels_binary(path)
+    assert len(loaded) == 1000
+    np.testing.assert_allclose(loaded.levels, original.levels, rtol=0, atol=1e-4)
+
+
+def test_float64_files_are_exact_and_writable(tmp_path):
+    path = str(tmp_path / 'levels.bin')
+    original = random_store(500, seed=2)
+    with LevelBinaryWriter(path, IDS, dtype=np.float64) as writer:
+        writer.write(original.start_minute, original.levels)
+
+    loaded = load_levels_binary(path, mode='r+')
+    np.testing.assert_array_equal(loaded.levels, original.levels)
+    loaded.column('cauldron_002')[10:20] = 0
+    loaded.levels.flush()
+    reread = load_levels_binary(path)
+    assert (reread.column('cauldron_002')[10:20] == 0).all()
+    np.testing.assert_array_equal(reread.column('cauldron_001'), original.column('cauldron_001'))
+
+
+def test_not_a_level_file(tmp_path):
+    path = tmp_path / 'levels.bin'
+    path.write_bytes(b'{"metadata": {}}')
+    with pytest.raises(ValueError, match='not a cauldron level file'):
+        load_levels_binary(str(path))
@@ -0,0 +1,77 @@
+import random
+
+import numpy as np
+
+from cauldronwatch.candidates import CandidateQueue
+
+BANDS = [0, 0, 0, 60, 65, 70, 75, 80, 85, 90, 95, 98, 100]
+
+
+def baseline_choice(cauldron_ids, bands, counts):
+    """The generator's original selection: sort, fewer-collections swap, zero-collection override"""
+    counts_by_id = dict(zip(cauldron_ids, counts))
+    candidates = [(band, cid, 0.0) for cid, band in zip(cauldron_ids, bands) if band > 0]
+    candidates.sort(reverse=True)
+    if not candidates:
+        return None
+    if len(candidates) > 1:
+        top_priority, top_cid, _ = candidates[0]
+        top_collections = counts_by_id[top_cid]
+        for i, (pri, cid, _) in enumerate(candidates[1:], 1):
+            if pri >= top_priority - 5 and counts_by_id[cid] < top_collections - 2:
+                candidates[0], candidates[i] = candidates[i], candidates[0]
+                break
+        zero_collections = [c for c in candidates if counts_by_id[c[1]] == 0]
+        if zero_collections and counts_by_id[candidates[0][1]] > 0:
+            best_zero = max(zero_collections, key=lambda x: x[0])
+            if best_zero[0] >= 60:
+                candidates.insert(0, best_zero)
+    return cauldron_ids.index(candidates[0][1])
+
+
+def queue_choice(queue, counts):
+    """The selection as simulate() makes it with a CandidateQueue"""
+    chosen = queue.best()
+    if chosen is not None:
+        fewer = queue.best(queue.band(chosen) - 5, counts[chosen] - 2)
+        if fewer is not None:
+            chosen = fewer
+        if counts[chosen] > 0:
+            never_collected = queue.best(60, 1)
+            if never_collected is not None:
+                chosen = never_collected
+    return chosen
+
+
+def test_matches_baseline_selection_on_random_minutes():
+    rng = random.Random(11)
+    for n in (1, 2, 5, 12, 33):
+        cauldron_ids = [f"cauldron_{i:03d}" for i in range(1, n + 1)]
+        rng.shuffle(cauldron_ids)   # Queue positions must follow ids, not input order
+        queue = CandidateQueue(cauldron_ids)
+        bands = np.zeros(n, dtype=int)
+        counts = np.zeros(n, dtype=int)
+        for _ in range(400):
+            # Change a few cauldrons per minute, like the simulation does
+            for i in rng.sample(range(n), rng.randint(0, min(n, 4))):
+                bands[i] = rng.choice(BANDS)
+                if rng.random() < 0.3:
+                    counts[i] += rng.randint(1, 3)
+            queue.update(bands, counts)
+            assert len(queue) == int((bands > 0).sum())
+            assert queue_choice(queue, counts) == baseline_choice(cauldron_ids, bands.tolist(), counts.tolist())
+
+
+def test_best_filters():
+    cauldron_ids = ['cauldron_003', 'cauldron_001', 'cauldron_002']
+    queue = CandidateQueue(cauldron_ids)
+    assert queue.best() is None
+    queue.update([85, 85, 0], [4, 0, 0])
+    assert queue.best() == 0                      # Same band: higher id wins
+    assert queue.best(below_count=1) == 1
+    assert queue.best(min_band=90) is None
+    queue.update([85, 0, 100], [4, 0, 1])
+    assert queue.best() == 2
+    assert queue.band(2) == 100 and queue.band(1) == 0
+    assert queue.best(60, 1) is None
+    assert len(queue) == 2
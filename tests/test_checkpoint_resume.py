@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+import pytest
+
+from cauldronwatch.generator import GeneratorConfig, simulate, write_outputs
+from cauldronwatch.minutes import MINUTES_PER_DAY
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+START = GeneratorConfig().start_minute
+END = START + 4 * MINUTES_PER_DAY - 1
+CHECKPOINT = START + 2 * MINUTES_PER_DAY   # 2024-11-01T00:00
+
+
+def run(tmp_path, **kwargs):
+    config = GeneratorConfig(end_minute=END, cauldrons_path=os.path.join(REPO_DIR, 'cauldrons.json'),
+                             checkpoint_dir=str(tmp_path / 'checkpoints'), **kwargs)
+    return simulate(config)
+
+
+def test_resume_continues_the_checkpointed_run(tmp_path):
+    full = run(tmp_path, checkpoint_every_minutes=MINUTES_PER_DAY)
+    assert full['unreported_drains']
+    resumed = run(tmp_path, resume_from=str(tmp_path / 'checkpoints' / 'checkpoint_20241101T0000.json'))
+
+    before = full['history'].levels
+    after = resumed['history'].levels
+    row = CHECKPOINT - START
+    assert resumed['history'].start_minute == CHECKPOINT
+
+    # No jump between the last checkpointed minute and the first resumed one: at most one
+    # minute of fill, or a collection/unreported drain running across the checkpoint
+    max_step = np.abs(before[row] - before[row - 1]).max()
+    assert np.abs(after[0] - before[row - 1]).max() <= max_step + 0.01
+
+    # The resumed minutes, tickets and drains are the full run's
+    np.testing.assert_array_equal(after, before[row:])
+    resumed_ids = {t['ticket_id'] for t in resumed['transport_tickets']}
+    assert resumed_ids == {t['ticket_id'] for t in full['transport_tickets']
+                           if t['collection_start_timestamp'] >= '2024-11-01T00:00:00Z'}
+    assert resumed['unreported_drains'] == [d for d in full['unreported_drains']
+                                            if d['drain_start_timestamp'] >= '2024-11-01T00:00:00Z']
+
+
+def test_resume_needs_a_dataset(tmp_path, monkeypatch):
+    run(tmp_path, checkpoint_every_minutes=MINUTES_PER_DAY)
+    resumed = run(tmp_path, resume_from=str(tmp_path / 'checkpoints' / 'checkpoint_20241101T0000.json'))
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError, match='segments import'):
+        write_outputs(resumed)
+    assert not os.path.exists(tmp_path / 'dataset')
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from cauldronwatch.detector import DrainDetector, detect_drains
+from cauldronwatch.levels import LevelStore
+from cauldronwatch.minutes import format_minute, parse_minute
+
+IDS = ['cauldron_001', 'cauldron_002', 'cauldron_003']
+RATES = [0.09, 0.05, 0.02]
+ROWS = 4000
+START = parse_minute('2024-11-01T00:00:00Z')
+# (cauldron column, first row, last row, L/min taken out) - the level keeps filling underneath
+DRAINS = [(0, 600, 659, 1.5), (1, 1500, 1539, 2.0), (0, 2600, 2689, 0.8)]
+
+
+@pytest.fixture(scope='module')
+def store():
+    rng = np.random.default_rng(4)
+    levels = np.empty((ROWS, len(IDS)))
+    current = np.array([300.0, 450.0, 250.0])
+    for row in range(ROWS):
+        current = current + RATES + rng.normal(0, 0.0008, len(IDS)) * current
+        for column, first, last, rate in DRAINS:
+            if first <= row <= last:
+                current[column] -= rate
+        levels[row] = current
+    history = LevelStore(IDS, START, capacity=ROWS)
+    history.append(np.round(levels, 2))
+    return history
+
+
+def assert_found(drains, store, volume_tolerance):
+    """Exactly the injected drains, in time order, with about the right window and volume"""
+    assert len(drains) == len(DRAINS)
+    drains = sorted(drains, key=lambda e: e['drain_start_timestamp'])
+    for event, (column, first, last, rate) in zip(drains, sorted(DRAINS, key=lambda d: d[1])):
+        assert event['cauldron_id'] == IDS[column]
+        assert abs(parse_minute(event['drain_start_timestamp']) - store.start_minute - first) <= 5
+        assert abs(parse_minute(event['drain_end_timestamp']) - store.start_minute - last) <= 5
+        assert event['estimated_volume_liters'] == pytest.approx(rate * (last - first + 1), rel=volume_tolerance)
+        # The estimate adds back the fill during the drain
+        assert event['level_drop_liters'] < event['estimated_volume_liters']
+
+
+def test_detects_injected_drains(store):
+    assert_found(detect_drains(store, dict(zip(IDS, RATES))), store, 0.15)
+
+
+def test_unfitted_detector_learns_the_rates(store):
+    # No starting rates: the averages settle on the fill before the first drain
+    assert_found(detect_drains(store), store, 0.25)
+
+
+def state_size(detector):
+    return {name: (value.shape, value.dtype) for name, value in vars(detector).items() if isinstance(value, np.ndarray)}
+
+
+def test_chunked_feed_matches_and_keeps_constant_state(store):
+    expected = detect_drains(store, dict(zip(IDS, RATES)))
+
+    detector = DrainDetector(IDS, dict(zip(IDS, RATES)))
+    initial = state_size(detector)
+    events = []
+    records = store.iter_records(chunk_rows=97)
+    for chunk in range(0, ROWS, 250):
+        for _ in range(min(250, ROWS - chunk)):
+            events.extend(detector.feed(next(records)))
+        # Same arrays of the same size after every chunk, however long the feed has run
+        assert state_size(detector) == initial
+        assert detector.minute == store.start_minute + min(chunk + 250, ROWS) - 1
+    events.extend(detector.finish())
+    assert [e for e in events if e['event'] == 'drain_end'] == expected
+    starts = [e for e in events if e['event'] == 'drain_start']
+    assert len(starts) >= len(expected)
+
+
+def test_rejects_gaps(store):
+    detector = DrainDetector(IDS)
+    detector.update(store.start_minute, store.levels[0])
+    with pytest.raises(ValueError):
+        detector.update(store.start_minute + 2, store.levels[1])
+    assert format_minute(detector.minute) == '2024-11-01T00:00:00Z'
@@ -0,0 +1,61 @@
+import numpy as np
+
+from cauldronwatch.fill import FillEngine
+from cauldronwatch.keyed_random import KeyedRandom
+
+IDS = ['cauldron_001', 'cauldron_002', 'cauldron_003', 'cauldron_004']
+START = 28_800_000
+
+
+def engine(fill_rates=(0.09, 0.02, 0.5, 0.06), max_volumes=(1000, 800, 300, 600), start=START, block_minutes=1440):
+    return FillEngine(IDS, fill_rates, max_volumes, start, seed=KeyedRandom(12345), block_minutes=block_minutes)
+
+
+def step_by_step(fill, levels, minutes, drain=None):
+    """The recurrence one minute at a time, on the engine's buffered noise"""
+    rows = slice(fill._cursor, fill._cursor + minutes)
+    growth, inc = fill._growth[rows], fill._fill[rows]
+    if drain is not None:
+        inc = inc - drain
+    level = np.asarray(levels, dtype=float)
+    path = np.empty((minutes, len(level)))
+    for i in range(minutes):
+        level = np.clip(level * growth[i] + inc[i], 0, fill.max_volumes)
+        path[i] = level
+    return path
+
+
+def test_closed_form_matches_stepping():
+    fill = engine()
+    levels = [300.0, 200.0, 100.0, 250.0]
+    path = fill.project(levels, 1440)
+    np.testing.assert_allclose(path, step_by_step(fill, levels, 1440), rtol=1e-9, atol=1e-9)
+    assert path.shape == (1440, len(IDS))
+
+
+def test_clamp_fallback_matches_stepping():
+    fill = engine()
+    # cauldron_003 fills to its 300 L max; cauldron_001 is drained below empty
+    levels = [40.0, 200.0, 250.0, 250.0]
+    drain = np.array([0.5, 0.0, 0.0, 0.1])
+    path = fill.project(levels, 600, drain)
+    assert (path[:, 2] == 300).any() and (path[:, 0] == 0).any()
+    assert ((path >= 0) & (path <= fill.max_volumes)).all()
+    np.testing.assert_allclose(path, step_by_step(fill, levels, 600, drain), rtol=1e-9, atol=1e-9)
+
+
+def test_project_does_not_consume_noise():
+    fill = engine(block_minutes=500)
+    levels = np.array([300.0, 200.0, 100.0, 250.0])
+    first = fill.project(levels, 300)
+    np.testing.assert_array_equal(fill.project(levels, 300), first)
+
+    # After consuming 120 minutes the next projection continues the same path
+    fill.consume(120)
+    np.testing.assert_allclose(fill.project(first[119], 180), first[120:], rtol=1e-9)
+
+    # A projection longer than the buffer draws more noise, still keyed by minute:
+    # an engine started 120 minutes later sees the same levels
+    later = engine(start=START + 120, block_minutes=500).project(first[119], 900)
+    np.testing.assert_allclose(fill.project(first[119], 900), later, rtol=1e-9)
+    np.testing.assert_allclose(later[:180], first[120:], rtol=1e-9)
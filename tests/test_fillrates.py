@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from cauldronwatch.fillrates import (FillRateEstimate, drain_windows, estimate_fill_rates, ticket_windows,
+                                     window_mask)
+from cauldronwatch.levels import LevelStore
+from cauldronwatch.minutes import MINUTES_PER_DAY, format_minute, parse_minute
+
+IDS = ['cauldron_001', 'cauldron_002']
+
+
+def make_store(changes, start, first_levels=(200.0, 300.0)):
+    """History whose change into row k + 1 is changes[k]"""
+    levels = np.vstack([first_levels, np.asarray(first_levels) + np.cumsum(changes, axis=0)])
+    store = LevelStore(IDS, start, capacity=len(levels))
+    store.append(levels)
+    return store
+
+
+def test_rate_recovered_with_drain_masked():
+    rng = np.random.default_rng(1)
+    rows = 3000
+    changes = np.array([0.07, 0.02]) + rng.normal(0, 0.05, (rows, 2))
+    changes[1000:1060, 0] -= 1.5     # A 90 L drain on cauldron_001
+    store = make_store(changes, parse_minute('2024-11-01T00:00:00Z'))
+    drain = {'cauldron_id': 'cauldron_001',
+             'drain_start_timestamp': format_minute(store.start_minute + 1001),
+             'drain_end_timestamp': format_minute(store.start_minute + 1060)}
+
+    fitted = estimate_fill_rates(store, drain_windows([drain]), trim=0.0)
+    assert fitted.rates == pytest.approx([0.07, 0.02], abs=0.003)
+    assert fitted.noise_liters == pytest.approx([0.05, 0.05], rel=0.05)
+    assert fitted.idle_minutes.tolist() == [rows - 60, rows]
+    # Left in, the drain pulls the mean well below the rate
+    assert estimate_fill_rates(store, trim=0.0).rates[0] < 0.045
+
+
+def test_window_mask_and_ticket_windows():
+    ticket = {'cauldron_id': 'cauldron_002', 'collection_start_timestamp': '2024-11-01T00:03:00Z',
+              'collection_timestamp': '2024-11-01T00:05:00Z'}
+    (cid, start, end), = ticket_windows([ticket])
+    assert cid == 'cauldron_002' and end - start == 2
+    mask = window_mask(8, 0, 2, np.array([1, -1]), np.array([3, 0]), np.array([5, 7]))
+    assert mask[:, 0].tolist() == [False] * 8
+    assert mask[:, 1].tolist() == [False, False, False, True, True, True, False, False]
+
+
+def hourly_store(start):
+    """Noise-free history: changes into minutes of clock hour h (counted from 00:00) are h + 1"""
+    rows = 300
+    minutes = start + 1 + np.arange(rows)
+    hour = (minutes - start // MINUTES_PER_DAY * MINUTES_PER_DAY) // 60
+    changes = np.column_stack([hour + 1.0, 10.0 * (hour + 1)])
+    return make_store(changes, start)
+
+
+def test_hourly_boundaries_when_starting_mid_hour():
+    start = parse_minute('2024-11-01T00:37:00Z')
+    estimate = estimate_fill_rates(hourly_store(start), trim=0.0)
+    assert format_minute(estimate.hour_start_minute) == '2024-11-01T00:00:00Z'
+    # Changes into 00:38 .. 00:59, then full hours, then the part of 05:00 .. 05:37
+    assert estimate.hourly_counts[:, 0].tolist() == [22, 60, 60, 60, 60, 38]
+    np.testing.assert_allclose(estimate.hourly[:, 0], [1, 2, 3, 4, 5, 6])
+    np.testing.assert_allclose(estimate.hourly[:, 1], [10, 20, 30, 40, 50, 60])
+
+
+def test_hourly_boundaries_on_the_hour():
+    start = parse_minute('2024-11-01T00:59:00Z')
+    estimate = estimate_fill_rates(hourly_store(start), trim=0.0)
+    # The first change is into 01:00 and starts a full clock hour
+    assert format_minute(estimate.hour_start_minute) == '2024-11-01T01:00:00Z'
+    assert estimate.hourly_counts[:, 0].tolist() == [60, 60, 60, 60, 60]
+    np.testing.assert_allclose(estimate.hourly[:, 0], [2, 3, 4, 5, 6])
+
+
+def test_rolling_matches_trailing_windows():
+    rng = np.random.default_rng(2)
+    hours = 30
+    sums = rng.uniform(0, 5, (hours, 2))
+    counts = rng.integers(0, 61, (hours, 2))
+    counts[3, 0] = 0
+    sums[3, 0] = 0.0
+    estimate = FillRateEstimate(IDS, [0.1, 0.2], [0, 0], [0, 0], [0, 0], 0, sums, counts)
+    for window in (1, 4, 24):
+        rolling = estimate.rolling(window)
+        for i in range(hours):
+            lo = max(0, i - window + 1)
+            total, count = sums[lo:i + 1].sum(axis=0), counts[lo:i + 1].sum(axis=0)
+            expected = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+            np.testing.assert_allclose(rolling[i], expected)
+    assert np.isnan(estimate.hourly[3, 0])
+    np.testing.assert_allclose(estimate.rolling(1), estimate.hourly)
+
+
+def test_write_load_round_trip(tmp_path):
+    start = parse_minute('2024-11-01T00:37:00Z')
+    estimate = estimate_fill_rates(hourly_store(start), trim=0.0)
+    path = str(tmp_path / 'fill_rates.json')
+    estimate.write(path)
+    loaded = FillRateEstimate.load(path)
+    assert loaded.cauldron_ids == estimate.cauldron_ids
+    np.testing.assert_allclose(loaded.rates, estimate.rates, atol=1e-5)
+    np.testing.assert_allclose(loaded.noise_liters, estimate.noise_liters, atol=1e-5)
+    np.testing.assert_array_equal(loaded.idle_minutes, estimate.idle_minutes)
+    np.testing.assert_allclose(loaded.hourly_sums, estimate.hourly_sums, atol=1e-4)
+    np.testing.assert_array_equal(loaded.hourly_counts, estimate.hourly_counts)
+    assert loaded.hour_start_minute == estimate.hour_start_minute
+    assert (loaded.start_minute, loaded.end_minute) == (estimate.start_minute, estimate.end_minute)
+    assert loaded.as_dict() == pytest.approx(estimate.as_dict(), abs=1e-5)
+
+
+def test_per_minute_alignment_and_column_order():
+    start = parse_minute('2024-11-01T00:37:00Z')
+    estimate = estimate_fill_rates(hourly_store(start), trim=0.0)
+    first = parse_minute('2024-11-01T00:58:00Z')
+    rates = estimate.per_minute(first, 4)
+    # 00:58, 00:59 fall in the first clock hour, 01:00 and 01:01 in the second
+    np.testing.assert_allclose(rates, [[1, 10], [1, 10], [2, 20], [2, 20]])
+    np.testing.assert_array_equal(estimate.per_minute(first, 4, IDS[::-1]), rates[:, ::-1])
+    np.testing.assert_array_equal(estimate.per_minute(first, 4, ['cauldron_002']), rates[:, 1:])
+    # Minutes outside the fitted hours use the nearest hour
+    before = estimate.per_minute(first - 600, 1)
+    np.testing.assert_allclose(before, [[1, 10]])
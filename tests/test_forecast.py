@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from cauldronwatch.forecast import MAX_FORECAST_MINUTES, Forecaster, minutes_to_reach
+from cauldronwatch.minutes import format_minute
+
+Z = 1.645
+
+
+def band_at(level, rate, sigma, t, sign):
+    return level + rate * t + sign * Z * sigma * np.sqrt(t)
+
+
+def test_positive_rate_crossings():
+    levels = np.array([100.0, 400.0, 0.0, 799.0])
+    targets = np.array([800.0, 500.0, 300.0, 800.0])
+    rates = np.array([0.1, 0.05, 0.3, 0.02])
+    sigma = np.array([0.5, 0.2, 1.0, 0.3])
+    expected, earliest, latest = minutes_to_reach(levels, targets, rates, sigma, Z)
+    np.testing.assert_allclose(expected, (targets - levels) / rates)
+    # The upper band reaches the target at `earliest`, the lower band at `latest`
+    np.testing.assert_allclose(band_at(levels, rates, sigma, earliest, +1), targets)
+    np.testing.assert_allclose(band_at(levels, rates, sigma, latest, -1), targets)
+    assert (earliest < expected).all() and (expected < latest).all()
+
+
+def test_no_fill_never_reaches_the_lower_band():
+    expected, earliest, latest = minutes_to_reach([100.0, 100.0], [800.0, 800.0], [0.0, -0.01], [0.5, 0.5], Z)
+    assert np.isinf(expected).all()
+    assert np.isinf(latest).all()
+    # The upper band still gets there for a stalled cauldron (noise alone)
+    assert np.isfinite(earliest[0])
+    np.testing.assert_allclose(band_at(100.0, 0.0, 0.5, earliest[0], +1), 800.0)
+
+
+def test_negative_discriminant_never_reaches_the_upper_band():
+    # Falling faster than the noise can lift: z^2 sigma^2 + 4 r d < 0
+    expected, earliest, latest = minutes_to_reach(100.0, 800.0, -0.5, 0.1, Z)
+    assert np.isinf(expected) and np.isinf(earliest) and np.isinf(latest)
+
+
+def test_already_reached():
+    expected, earliest, latest = minutes_to_reach([800.0, 900.0], [800.0, 800.0], [0.0, -1.0], [0.0, 1.0], Z)
+    assert expected.tolist() == [0.0, 0.0]
+    assert earliest.tolist() == [0.0, 0.0]
+    assert latest.tolist() == [0.0, 0.0]
+
+
+def test_bands_are_clipped_to_capacity():
+    horizons = [60, 240, 1440]
+    forecaster = Forecaster(['a', 'b', 'c'], [0.1, 0.0, 0.5], [0.5, 5.0, 0.1], [1000, 500, 600], [500, 250, 300],
+                            horizons=horizons)
+    forecast = forecaster([100.0, 5.0, 590.0])
+    for band in (forecast.level_mean, forecast.level_low, forecast.level_high):
+        assert band.shape == (3, len(horizons))
+        assert (band >= 0).all() and (band <= forecaster.max_volumes[:, None]).all()
+    np.testing.assert_allclose(forecast.level_mean[0], 100.0 + 0.1 * np.array(horizons))
+    assert forecast.level_low[1].tolist() == [0.0, 0.0, 0.0]     # Noisy and empty: the low band hits 0
+    assert forecast.level_mean[2].tolist() == [600.0] * 3       # Full
+    assert (forecast.level_low <= forecast.level_mean).all() and (forecast.level_mean <= forecast.level_high).all()
+    assert forecast.overflow_within(60).tolist() == [False, False, True]
+
+    # Dicts are looked up by id
+    by_id = Forecaster(['a', 'b', 'c'], {'c': 0.5, 'a': 0.1, 'b': 0.0}, [0.5, 5.0, 0.1], [1000, 500, 600],
+                       [500, 250, 300], horizons=horizons)({'b': 5.0, 'c': 590.0, 'a': 100.0})
+    np.testing.assert_array_equal(by_id.level_high, forecast.level_high)
+
+
+def test_records_cut_off_far_times():
+    now = 28_800_000
+    # Rate 1e-5 L/min: the expected time to threshold is ~70 million minutes, past the cut-off
+    forecast = Forecaster(['a', 'b'], [1e-5, 0.1], [1.0, 0.1], [1000, 1000], [800, 800])([100.0, 100.0], now)
+    assert forecast.to_threshold[0][0] > MAX_FORECAST_MINUTES
+    rows = forecast.records()
+    assert rows[0]['threshold_expected'] is None
+    assert rows[0]['threshold_latest'] is None
+    assert rows[1]['threshold_expected'] == format_minute(now + 7000)
+    # Without a current minute times stay relative, with the same cut-off
+    relative = Forecaster(['a', 'b'], [1e-5, 0.1], [1.0, 0.1], [1000, 1000], [800, 800])([100.0, 100.0]).records()
+    assert relative[0]['threshold_expected'] is None
+    assert relative[1]['threshold_expected'] == pytest.approx(7000.0)
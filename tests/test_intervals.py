@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from cauldronwatch.intervals import IntervalIndex
+
+
+def test_empty_index():
+    index = IntervalIndex()
+    assert len(index) == 0
+    assert list(index) == []
+    assert not index.overlaps(0, 100)
+    assert not index.contains(0)
+    assert index.gaps(0, 100, 1) == [(0, 100)]
+    assert index.gaps(0, 100, 101) == []
+
+
+def test_touching_intervals_merge():
+    index = IntervalIndex([(0, 10), (10, 20), (30, 40)])
+    assert list(index) == [(0, 20), (30, 40)]
+    index.add(20, 30)
+    assert list(index) == [(0, 40)]
+
+
+def test_add_spanning_several_intervals():
+    index = IntervalIndex([(0, 5), (10, 15), (20, 25), (40, 45)])
+    index.add(3, 22)
+    assert list(index) == [(0, 25), (40, 45)]
+    index.add(50, 60)
+    index.add(-10, -5)
+    assert list(index) == [(-10, -5), (0, 25), (40, 45), (50, 60)]
+
+
+def test_reversed_interval_rejected():
+    with pytest.raises(ValueError):
+        IntervalIndex().add(10, 5)
+
+
+def test_queries_at_the_bounds():
+    index = IntervalIndex([(10, 20)])
+    # Closed intervals: both endpoints are inside
+    assert index.contains(10) and index.contains(20)
+    assert not index.contains(9) and not index.contains(21)
+    # Touching an endpoint is not an overlap
+    assert not index.overlaps(0, 10)
+    assert not index.overlaps(20, 30)
+    assert index.overlaps(0, 11)
+    assert index.overlaps(19, 30)
+    assert index.overlaps(12, 15)
+    assert index.overlaps(0, 30)
+
+
+def test_gaps_at_the_bounds():
+    index = IntervalIndex([(0, 10), (20, 30), (45, 50)])
+    assert index.gaps(0, 50, 1) == [(10, 20), (30, 45)]
+    # A gap exactly min_length long is kept, one minute shorter is not
+    assert index.gaps(0, 50, 15) == [(30, 45)]
+    assert index.gaps(0, 50, 16) == []
+    # Query range inside a busy interval or starting in a gap
+    assert index.gaps(2, 8, 1) == []
+    assert index.gaps(12, 18, 1) == [(12, 18)]
+    assert index.gaps(15, 60, 5) == [(15, 20), (30, 45), (50, 60)]
+
+
+def test_matches_brute_force():
+    rng = random.Random(3)
+    index = IntervalIndex()
+    covered = set()
+    for _ in range(60):
+        start = rng.randint(0, 500)
+        end = start + rng.randint(0, 20)
+        index.add(start, end)
+        covered.update(range(start, end + 1))
+    intervals = list(index)
+    assert all(a_end < b_start for (_, a_end), (b_start, _) in zip(intervals, intervals[1:]))
+    for point in range(-5, 530):
+        assert index.contains(point) == (point in covered)
+    for _ in range(500):
+        start = rng.randint(-10, 530)
+        end = start + rng.randint(1, 30)
+        # Overlap of the open intervals: touching endpoints do not count
+        expected = any(s < end and e > start for s, e in intervals)
+        assert index.overlaps(start, end) == expected
@@ -0,0 +1,65 @@
+import numpy as np
+
+from cauldronwatch.keyed_random import KeyedRandom
+
+IDS = ['cauldron_001', 'cauldron_002', 'cauldron_003']
+START = 28_800_000   # Epoch minutes around late 2024
+
+
+def test_scalar_and_array_values_agree():
+    keyed = KeyedRandom(12345)
+    minutes = np.arange(START, START + 50)
+    unit = keyed.uniform('noise', IDS, minutes)
+    scaled = keyed.uniform('noise', IDS, minutes, 2.0, 5.0, draw=3)
+    for row, minute in enumerate(minutes.tolist()):
+        for column, cid in enumerate(IDS):
+            assert keyed.random_at('noise', cid, minute) == unit[row, column]
+            assert keyed.uniform_at('noise', cid, minute, 2.0, 5.0, draw=3) == scaled[row, column]
+    assert unit.shape == (50, 3)
+    assert ((unit >= 0) & (unit < 1)).all()
+    assert ((scaled >= 2) & (scaled < 5)).all()
+
+
+def test_randint_covers_both_ends():
+    keyed = KeyedRandom(7)
+    values = [keyed.randint_at('duration', 'cauldron_001', START + m, 30, 40) for m in range(2000)]
+    assert min(values) == 30 and max(values) == 40
+    assert set(values) == set(range(30, 41))
+
+
+def test_any_window_matches_the_full_run():
+    full = KeyedRandom(99).uniform('fill', IDS, np.arange(START, START + 1000))
+    for first, length in [(0, 10), (1, 1), (137, 300), (999, 1)]:
+        # A new generator (fresh key cache) started mid-run sees the same values
+        window = KeyedRandom(99).uniform('fill', IDS, np.arange(START + first, START + first + length))
+        np.testing.assert_array_equal(window, full[first:first + length])
+    # Column order and subsets don't matter either
+    reordered = KeyedRandom(99).uniform('fill', IDS[::-1], np.arange(START, START + 1000))
+    np.testing.assert_array_equal(reordered, full[:, ::-1])
+    single = KeyedRandom(99).uniform('fill', ['cauldron_002'], np.arange(START, START + 1000))
+    np.testing.assert_array_equal(single[:, 0], full[:, 1])
+
+
+def test_keys_separate_values():
+    keyed = KeyedRandom(5)
+    minutes = np.arange(START, START + 2000)
+    base = keyed.bits('fill', IDS, minutes)
+    others = [
+        keyed.bits('fill', IDS, minutes, draw=1),
+        keyed.bits('fill', IDS, minutes, draw=2),
+        keyed.bits('collection.rate', IDS, minutes),
+        KeyedRandom(6).bits('fill', IDS, minutes),
+    ]
+    for other in others:
+        assert (other != base).mean() > 0.999
+    # Different draws of the same key are uncorrelated, and each looks uniform
+    first = keyed.uniform('fill', IDS, minutes).ravel()
+    second = keyed.uniform('fill', IDS, minutes, draw=1).ravel()
+    assert abs(np.corrcoef(first, second)[0, 1]) < 0.05
+    assert abs(first.mean() - 0.5) < 0.02
+    # Columns (cauldrons) and neighbouring minutes are distinct too
+    assert len(np.unique(base)) == base.size
+
+
+def test_seed_defaults_to_random():
+    assert KeyedRandom().seed != KeyedRandom().seed
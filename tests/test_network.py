@@ -0,0 +1,108 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+from cauldronwatch.network import UNREACHABLE, build_travel_times, load_travel_times, network_hash
+
+
+def edge(a, b, minutes):
+    return {'from': a, 'to': b, 'travel_time_minutes': minutes}
+
+
+# a - b - c - d is cheaper than the direct a - d link; e - f is a separate component
+EDGES = [edge('a', 'b', 5), edge('b', 'c', 7), edge('c', 'd', 3), edge('a', 'd', 20), edge('e', 'f', 4)]
+
+
+def floyd_warshall(edges):
+    nodes = sorted({e['from'] for e in edges} | {e['to'] for e in edges})
+    index = {node: i for i, node in enumerate(nodes)}
+    dist = np.full((len(nodes), len(nodes)), np.inf)
+    np.fill_diagonal(dist, 0)
+    for e in edges:
+        i, j = index[e['from']], index[e['to']]
+        dist[i, j] = dist[j, i] = e['travel_time_minutes']   # A repeated pair keeps its last listing
+    for k in range(len(nodes)):
+        dist = np.minimum(dist, dist[:, k:k + 1] + dist[k:k + 1, :])
+    return nodes, dist
+
+
+def test_multi_hop_shortest_paths():
+    travel = build_travel_times(EDGES)
+    assert travel.minutes_between('a', 'd') == 15
+    assert travel.minutes_between('d', 'a') == 15
+    assert travel.path('a', 'd') == ['a', 'b', 'c', 'd']
+    assert travel.path('d', 'a') == ['d', 'c', 'b', 'a']
+    assert travel.minutes_between('b', 'b') == 0
+    assert travel.path('b', 'b') == ['b']
+    assert travel.nearest('c', ['a', 'd', 'f']) == 'd'
+
+
+def test_unreachable_pairs():
+    travel = build_travel_times(EDGES)
+    assert travel.minutes[travel.index['a'], travel.index['e']] == UNREACHABLE
+    with pytest.raises(ValueError):
+        travel.minutes_between('a', 'e')
+    with pytest.raises(ValueError):
+        travel.path('f', 'c')
+    with pytest.raises(ValueError):
+        travel.nearest('e', ['a', 'b'])
+
+
+def test_unknown_node():
+    travel = build_travel_times(EDGES)
+    with pytest.raises(KeyError):
+        travel.minutes_between('a', 'zz')
+    with pytest.raises(KeyError):
+        travel.path('zz', 'a')
+
+
+def test_matches_floyd_warshall_on_random_networks():
+    rng = random.Random(2)
+    for n in (2, 9, 40):
+        nodes = [f"n{i:02d}" for i in range(n)]
+        edges = [edge(rng.choice(nodes), rng.choice(nodes), rng.randint(1, 30)) for _ in range(2 * n)]
+        edges = [e for e in edges if e['from'] != e['to']] or [edge(nodes[0], nodes[1], 1)]
+        expected_nodes, expected = floyd_warshall(edges)
+        # Small blocks so several source blocks are relaxed
+        travel = build_travel_times(edges, chunk_rows=4)
+        assert travel.node_ids == expected_nodes
+        np.testing.assert_array_equal(travel.minutes, np.where(np.isinf(expected), UNREACHABLE, expected))
+
+        # Every route is made of listed edges and adds up to the shortest time
+        lengths = {}
+        for e in edges:
+            lengths[(e['from'], e['to'])] = lengths[(e['to'], e['from'])] = e['travel_time_minutes']
+        for a in travel.node_ids:
+            for b in travel.node_ids:
+                if a == b or travel.minutes[travel.index[a], travel.index[b]] == UNREACHABLE:
+                    continue
+                route = travel.path(a, b)
+                assert route[0] == a and route[-1] == b
+                assert sum(lengths[hop] for hop in zip(route, route[1:])) == travel.minutes_between(a, b)
+
+
+def test_cache_follows_the_edge_list(tmp_path):
+    cache_dir = str(tmp_path)
+    first = load_travel_times(EDGES, cache_dir)
+    files = os.listdir(cache_dir)
+    assert files == [f"travel_times_{network_hash(EDGES)[:16]}.npz"]
+
+    # Same network listed in another order (and reversed links): same cache file, same arrays
+    reordered = [edge(e['to'], e['from'], e['travel_time_minutes']) for e in reversed(EDGES)]
+    assert network_hash(reordered) == network_hash(EDGES)
+    cached = load_travel_times(reordered, cache_dir)
+    assert os.listdir(cache_dir) == files
+    assert cached.node_ids == first.node_ids
+    np.testing.assert_array_equal(cached.minutes, first.minutes)
+    np.testing.assert_array_equal(cached.next_hop, first.next_hop)
+
+    # A changed travel time is a different network: new file, new answer
+    changed = [edge('a', 'd', 10) if e['from'] == 'a' and e['to'] == 'd' else e for e in EDGES]
+    assert network_hash(changed) != network_hash(EDGES)
+    travel = load_travel_times(changed, cache_dir)
+    assert len(os.listdir(cache_dir)) == 2
+    assert travel.minutes_between('a', 'd') == 10
+    assert travel.path('a', 'd') == ['a', 'd']
+    assert load_travel_times(EDGES, cache_dir).minutes_between('a', 'd') == 15
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from cauldronwatch.levels import LevelStore
+from cauldronwatch.minutes import format_minute, parse_minute
+from cauldronwatch.reconcile import NO_DATA, OK, OVERREPORTED, UNDERREPORTED, reconcile
+
+IDS = ['cauldron_001', 'cauldron_002']
+ROWS = 120
+FILL = {'cauldron_001': 1.0, 'cauldron_002': 0.5}
+
+
+def collection(levels, column, first, last, rate):
+    """Take `rate` L/min out of a column over rows first..last (the rest of the series stays down)"""
+    taken = rate * np.clip(np.arange(ROWS) - first + 1, 0, last - first + 1)
+    levels[:, column] -= taken
+
+
+@pytest.fixture
+def store():
+    # Both cauldrons fill at a constant rate; cauldron_001 is emptied by 5 L/min over rows
+    # 20-29 (50 L) and by 2 L/min over rows 1-10 (20 L), cauldron_002 by 3 L/min over rows 60-79
+    minutes = np.arange(ROWS, dtype=float)
+    levels = np.column_stack([200 + FILL['cauldron_001'] * minutes, 300 + FILL['cauldron_002'] * minutes])
+    collection(levels, 0, 20, 29, 5.0)
+    collection(levels, 0, 1, 10, 2.0)
+    collection(levels, 1, 60, 79, 3.0)
+    history = LevelStore(IDS, parse_minute('2024-11-01T00:00:00Z'), capacity=ROWS)
+    history.append(levels)
+    return history
+
+
+def ticket(store, ticket_id, cauldron_id, first, last, amount):
+    return {
+        'ticket_id': ticket_id,
+        'cauldron_id': cauldron_id,
+        'collection_start_timestamp': format_minute(store.start_minute + first),
+        'collection_timestamp': format_minute(store.start_minute + last),
+        'amount_collected': amount,
+    }
+
+
+def test_verdicts(store):
+    tickets = [
+        ticket(store, 'honest', 'cauldron_001', 20, 29, 50.0),
+        ticket(store, 'short', 'cauldron_001', 20, 29, 40.0),
+        ticket(store, 'inflated', 'cauldron_001', 20, 29, 60.0),
+        ticket(store, 'within_tolerance', 'cauldron_001', 20, 29, 45.5),
+        ticket(store, 'other_cauldron', 'cauldron_002', 60, 79, 60.0),
+        ticket(store, 'other_short', 'cauldron_002', 60, 79, 48.0),
+    ]
+    table = reconcile(store, tickets, FILL)
+    assert table.verdict.tolist() == [OK, UNDERREPORTED, OVERREPORTED, OK, OK, UNDERREPORTED]
+    np.testing.assert_allclose(table.expected, [50, 50, 50, 50, 60, 60])
+    np.testing.assert_allclose(table.fill, [10, 10, 10, 10, 10, 10])
+    np.testing.assert_allclose(table.level_drop, [40, 40, 40, 40, 50, 50])
+    np.testing.assert_allclose(table.difference, [0, -10, 10, -4.5, 0, -12])
+    assert table.flagged.tolist() == [False, True, True, False, False, True]
+    assert table.counts() == {OK: 3, UNDERREPORTED: 2, OVERREPORTED: 1}
+
+
+def test_no_data(store):
+    tickets = [
+        ticket(store, 'unknown', 'cauldron_099', 20, 29, 50.0),
+        ticket(store, 'before_history', 'cauldron_001', -10, 5, 20.0),
+        ticket(store, 'past_history', 'cauldron_002', ROWS - 5, ROWS + 5, 20.0),
+        ticket(store, 'reversed', 'cauldron_001', 29, 20, 50.0),
+    ]
+    table = reconcile(store, tickets, FILL)
+    assert table.verdict.tolist() == [NO_DATA] * 4
+    assert np.isnan(table.expected).all()
+    assert not table.flagged.any()
+    rows = table.records()
+    assert all(row['expected'] is None and row['ratio'] is None for row in rows)
+
+
+def test_window_boundary_at_the_first_row(store):
+    # The level before the window (row start - 1) must exist: a window from row 0 has none,
+    # a window from row 1 reads row 0
+    tickets = [
+        ticket(store, 'from_row_0', 'cauldron_001', 0, 10, 20.0),
+        ticket(store, 'from_row_1', 'cauldron_001', 1, 10, 20.0),
+        ticket(store, 'to_last_row', 'cauldron_002', 100, ROWS - 1, 0.0),
+    ]
+    table = reconcile(store, tickets, FILL)
+    assert table.verdict.tolist() == [NO_DATA, OK, OK]
+    assert table.level_drop[1] == pytest.approx(store.levels[0, 0] - store.levels[10, 0])
+    assert table.expected[1] == pytest.approx(20.0)
+    assert table.expected[2] == pytest.approx(0.0)
+
+
+def test_per_minute_and_fitted_rates(store):
+    tickets = [ticket(store, 'early', 'cauldron_001', 1, 10, 20.0),
+               ticket(store, 'honest', 'cauldron_001', 20, 29, 50.0),
+               ticket(store, 'short', 'cauldron_002', 60, 79, 48.0)]
+    per_minute = np.tile([FILL[cid] for cid in IDS], (ROWS, 1))
+    expected = reconcile(store, tickets, FILL)
+    for fill_rates in (per_minute, np.array([FILL[cid] for cid in IDS]), {'cauldron_001': 1.0}, None):
+        # The dict without cauldron_002 and None fit the missing rates from the untouched minutes
+        table = reconcile(store, tickets, fill_rates)
+        np.testing.assert_allclose(table.expected, expected.expected)
+        assert table.verdict.tolist() == [OK, OK, UNDERREPORTED]
+    with pytest.raises(ValueError):
+        reconcile(store, tickets, per_minute[:-1])
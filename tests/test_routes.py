@@ -0,0 +1,144 @@
+import json
+import os
+import random
+from collections import defaultdict
+
+import pytest
+
+from cauldronwatch.facility import generate_facility
+from cauldronwatch.generator.config import UNLOAD_TIME
+from cauldronwatch.minutes import MINUTES_PER_DAY, parse_minute
+from cauldronwatch.network import build_travel_times
+from cauldronwatch.routes import SETUP_MINUTES, SHIFT_MINUTES, plan_routes, service_minutes
+
+START = 20000 * MINUTES_PER_DAY + 60
+REFERENCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cauldrons.json')
+
+
+def network(data):
+    travel = build_travel_times(data['network']['edges'])
+    market_ids = [m['id'] for m in data.get('markets') or [data['enchanted_market']]]
+    home_market = {c['id']: travel.nearest(c['id'], market_ids) for c in data['cauldrons']}
+    return travel, home_market
+
+
+def random_stops(data, seed, low=50, high=900):
+    rng = random.Random(seed)
+    return [{'cauldron_id': c['id'], 'volume': round(rng.uniform(low, high), 2),
+             'due': START + rng.randrange(60, MINUTES_PER_DAY)} for c in data['cauldrons']]
+
+
+def check_feasible(plan, travel, couriers):
+    capacity = {c['courier_id']: c['max_carrying_capacity'] for c in couriers}
+    shift = {c['courier_id']: c['shift'] for c in couriers}
+    busy = defaultdict(list)
+    for route in plan.routes:
+        departure, back = parse_minute(route['departure']), parse_minute(route['return'])
+        unloaded = parse_minute(route['unload_complete'])
+        assert unloaded - back == UNLOAD_TIME
+        # Capacity
+        collected = sum(v['collect_liters'] for v in route['stops'])
+        assert collected <= capacity[route['courier_id']] + 1e-6
+        assert route['load_liters'] == pytest.approx(collected, abs=0.01 * len(route['stops']))
+        # Duration: travel plus collection fits SHIFT_MINUTES - UNLOAD_TIME, inside the courier's shift
+        service = sum(v['service_minutes'] for v in route['stops'])
+        assert back - departure == route['travel_minutes'] + service
+        assert back - departure <= SHIFT_MINUTES - UNLOAD_TIME
+        shift_begin = (departure // MINUTES_PER_DAY) * MINUTES_PER_DAY + (shift[route['courier_id']] - 1) * SHIFT_MINUTES
+        assert shift_begin <= departure and unloaded <= shift_begin + SHIFT_MINUTES
+        # Arrivals follow the network's travel times
+        previous, minute = route['market'], departure
+        for v in route['stops']:
+            minute += travel.minutes_between(previous, v['cauldron_id'])
+            assert parse_minute(v['arrival']) == minute
+            assert v['service_minutes'] == service_minutes(v['collect_liters'])
+            minute += v['service_minutes']
+            previous = v['cauldron_id']
+        assert minute + travel.minutes_between(previous, route['market']) == back
+        busy[route['courier_id']].append((departure, unloaded))
+    # No courier is on two routes at once
+    for spans in busy.values():
+        spans.sort()
+        for (_, end), (begin, _) in zip(spans, spans[1:]):
+            assert end <= begin
+
+
+def test_reference_facility_routes_are_feasible():
+    with open(REFERENCE, 'r') as f:
+        cauldrons_data = json.load(f)
+    travel, home_market = network(cauldrons_data)
+    stops = random_stops(cauldrons_data, seed=1)
+    plan = plan_routes(travel, stops, cauldrons_data['couriers'], home_market, START, budget_seconds=0.5)
+    check_feasible(plan, travel, cauldrons_data['couriers'])
+    planned = [v['cauldron_id'] for route in plan.routes for v in route['stops']]
+    # Every stop is planned once or reported unassigned
+    assert sorted(planned + plan.unassigned) == sorted(s['cauldron_id'] for s in stops)
+    assert plan.stats['travel_minutes'] <= plan.stats['construction_travel_minutes']
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_generated_facility_routes_are_feasible(seed):
+    data = generate_facility(150, n_markets=3, couriers_per_shift=6, seed=seed)
+    travel, home_market = network(data)
+    stops = random_stops(data, seed, low=20, high=300)
+    plan = plan_routes(travel, stops, data['couriers'], home_market, START, budget_seconds=0.5)
+    check_feasible(plan, travel, data['couriers'])
+    assert len(plan.routes) > 0
+    assert any(len(route['stops']) > 1 for route in plan.routes)
+    planned = [v['cauldron_id'] for route in plan.routes for v in route['stops']]
+    assert sorted(planned + plan.unassigned) == sorted(s['cauldron_id'] for s in stops)
+
+
+def test_local_search_never_adds_travel():
+    data = generate_facility(120, n_markets=2, couriers_per_shift=40, seed=5)
+    travel, home_market = network(data)
+    for seed in range(3):
+        plan = plan_routes(travel, random_stops(data, seed, low=20, high=200), data['couriers'], home_market, START,
+                           budget_seconds=1.0)
+        # With enough couriers nothing is left unassigned, so the totals compare the same stops
+        assert plan.unassigned == []
+        assert plan.stats['travel_minutes'] <= plan.stats['construction_travel_minutes']
+
+
+def test_time_budget_is_honoured():
+    data = generate_facility(600, n_markets=4, couriers_per_shift=20, seed=3)
+    travel, home_market = network(data)
+    stops = random_stops(data, 3, low=20, high=300)
+    budget = 0.2
+    plan = plan_routes(travel, stops, data['couriers'], home_market, START, budget_seconds=budget)
+    # The deadline is checked between stops, so the search overshoots by at most one stop's moves
+    assert plan.stats['search_seconds'] <= budget + 0.5
+    check_feasible(plan, travel, data['couriers'])
+
+
+def edge(a, b, minutes):
+    return {'from': a, 'to': b, 'travel_time_minutes': minutes}
+
+
+def test_unreachable_and_too_far_stops_are_unassigned():
+    couriers = [{'courier_id': 'w1', 'max_carrying_capacity': 500, 'shift': 1},
+                {'courier_id': 'w2', 'max_carrying_capacity': 500, 'shift': 2}]
+    # 'near' is a short hop; 'far' is reachable but its round trip plus setup overruns a shift;
+    # 'island' has no path to the market at all
+    far_leg = (SHIFT_MINUTES - UNLOAD_TIME - SETUP_MINUTES) // 2 + 1
+    edges = [edge('m', 'near', 10), edge('m', 'far', far_leg), edge('island', 'other', 5)]
+    travel = build_travel_times(edges)
+    home_market = {'near': 'm', 'far': 'm', 'island': 'm'}
+    stops = [{'cauldron_id': cid, 'volume': 2000.0, 'due': None} for cid in ('near', 'far', 'island')]
+    day = START - START % MINUTES_PER_DAY
+    plan = plan_routes(travel, stops, couriers, home_market, day, budget_seconds=0.1)
+    assert sorted(plan.unassigned) == ['far', 'island']
+    assert plan.stats['stops'] == 3 and plan.stats['unassigned_stops'] == 2
+    # The oversize request at 'near' is one full load
+    [route] = plan.routes
+    [visit] = route['stops']
+    assert visit['cauldron_id'] == 'near' and visit['collect_liters'] == 500
+    assert plan.stats['construction_travel_minutes'] == route['travel_minutes'] == 20
+    check_feasible(plan, travel, couriers)
+
+
+def test_no_stops():
+    travel = build_travel_times([edge('m', 'a', 10)])
+    plan = plan_routes(travel, [], [{'courier_id': 'w1', 'max_carrying_capacity': 500, 'shift': 1}], {}, START)
+    assert plan.routes == [] and plan.unassigned == []
+    assert plan.stats['travel_minutes'] == plan.stats['construction_travel_minutes'] == 0
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+from cauldronwatch.levels import LevelStore
+from cauldronwatch.minutes import MINUTES_PER_DAY, format_minute, parse_minute
+from cauldronwatch.segments import SegmentedDataset
+
+START = parse_minute('2024-11-07T00:00:00Z')
+IDS = ['cauldron_001', 'cauldron_002']
+
+
+def store(start, minutes, offset=0.0):
+    levels = LevelStore(IDS, start, capacity=minutes)
+    levels.append(np.arange(minutes * len(IDS), dtype=float).reshape(minutes, len(IDS)) + offset)
+    return levels
+
+
+def ticket(number, start):
+    timestamp = format_minute(start)
+    return {'ticket_id': f"TT_{timestamp[:10].replace('-', '')}_{number:03d}", 'cauldron_id': IDS[0],
+            'collection_start_timestamp': timestamp, 'amount_collected': 10.0}
+
+
+def test_write_and_read_back(tmp_path):
+    dataset = SegmentedDataset(str(tmp_path))
+    dataset.write(store(START, 3 * 1440), [ticket(1, START), ticket(2, START + 2 * MINUTES_PER_DAY)])
+
+    history, tickets, drains = SegmentedDataset(str(tmp_path)).read_all()
+    assert dataset.days() == ['2024-11-07', '2024-11-08', '2024-11-09']
+    assert len(history) == 3 * 1440 and history.start_minute == START
+    assert [t['ticket_id'] for t in tickets] == ['TT_20241107_001', 'TT_20241109_002']
+    assert drains == []
+    assert dataset.ticket_counter == 2
+
+
+def test_rewrite_ending_early_drops_later_days(tmp_path):
+    dataset = SegmentedDataset(str(tmp_path))
+    dataset.write(store(START, 3 * 1440), [ticket(1, START), ticket(2, START + 2 * MINUTES_PER_DAY)])
+
+    # Replace from the middle of the second day up to its 18:00
+    rewrite_start = START + MINUTES_PER_DAY + 12 * 60
+    rewritten = store(rewrite_start, 6 * 60, offset=1000.0)
+    dataset.write(rewritten)
+
+    reopened = SegmentedDataset(str(tmp_path))
+    assert reopened.days() == ['2024-11-07', '2024-11-08']
+    assert not os.path.exists(tmp_path / '2024-11-09.json.gz')
+    assert reopened.end_minute == rewritten.end_minute
+    assert reopened.last_levels == rewritten.row(-1)
+    assert reopened.ticket_counter == 1
+
+    history, tickets, _ = reopened.read_all()
+    assert history.end_minute == rewritten.end_minute
+    assert len(history) == 1440 + 12 * 60 + 6 * 60
+    np.testing.assert_array_equal(history.levels[-len(rewritten):], rewritten.levels)
+    assert [t['ticket_id'] for t in tickets] == ['TT_20241107_001']
+
+
+def test_extend_keeps_earlier_days(tmp_path):
+    dataset = SegmentedDataset(str(tmp_path))
+    dataset.write(store(START, 1440 + 60))
+    dataset.write(store(START + 1440 + 60, 1440, offset=500.0))
+
+    history, _, _ = SegmentedDataset(str(tmp_path)).read_all()
+    assert len(history) == 2 * 1440 + 60
+    assert dataset.last_levels == history.row(-1)
@@ -0,0 +1,110 @@
+import random
+
+import pytest
+
+from cauldronwatch.timeline import _COMPACT_AFTER, CourierTimeline
+
+
+def brute_force_free(trips, start, end, buffer):
+    # The original per-trip scan from regenerate_all_data.py
+    return all(end + buffer <= trip_start or start - buffer >= trip_end for trip_start, trip_end in trips)
+
+
+def test_is_free_matches_brute_force():
+    rng = random.Random(5)
+    timeline = CourierTimeline()
+    trips = []
+    cursor = 0
+    for _ in range(80):
+        cursor += rng.randint(0, 40)
+        trip = (cursor, cursor + rng.randint(5, 60))
+        timeline.add(*trip)
+        trips.append(trip)
+        cursor = trip[1] + 1
+    assert list(timeline) == trips
+    for _ in range(2000):
+        start = rng.randint(-50, cursor + 50)
+        end = start + rng.randint(0, 90)
+        buffer = rng.choice([0, 5, 10])
+        assert timeline.is_free(start, end, buffer) == brute_force_free(trips, start, end, buffer)
+
+
+def test_is_free_at_the_buffer_edges():
+    timeline = CourierTimeline()
+    timeline.add(100, 200)
+    # A trip may start exactly `buffer` after the last unload, or end `buffer` before the next departure
+    assert timeline.is_free(210, 250, 10)
+    assert not timeline.is_free(209, 250, 10)
+    assert timeline.is_free(50, 90, 10)
+    assert not timeline.is_free(50, 91, 10)
+
+
+def test_overlapping_trip_rejected():
+    timeline = CourierTimeline()
+    timeline.add(100, 200)
+    with pytest.raises(ValueError):
+        timeline.add(150, 250)
+    with pytest.raises(ValueError):
+        timeline.add(50, 101)
+    with pytest.raises(ValueError):
+        timeline.add(20, 10)
+    timeline.add(200, 220)   # Touching is fine
+    assert len(timeline) == 2
+
+
+def test_last_end_after_out_of_order_insert():
+    timeline = CourierTimeline()
+    assert timeline.earliest_departure(30, 10) == 30
+    timeline.add(500, 600)
+    timeline.add(100, 200)   # Earlier trip added later
+    assert list(timeline) == [(100, 200), (500, 600)]
+    assert timeline.last_end == 600
+    assert timeline.earliest_departure(30, 10) == 610
+    assert timeline.earliest_departure(700, 10) == 700
+
+
+def test_prune_keeps_last_end_and_compacts():
+    timeline = CourierTimeline()
+    trips = [(i * 100, i * 100 + 50) for i in range(3 * _COMPACT_AFTER)]
+    for trip in trips:
+        timeline.add(*trip)
+
+    # Pruning fewer than _COMPACT_AFTER trips only moves the head
+    timeline.prune(10 * 100)
+    assert timeline._head == 10
+    assert len(timeline) == len(trips) - 10
+    assert list(timeline) == trips[10:]
+
+    # Past half of the list (and _COMPACT_AFTER trips) the pruned prefix is dropped
+    cut = 2 * _COMPACT_AFTER
+    timeline.prune(cut * 100)
+    assert timeline._head == 0
+    assert len(timeline._starts) == len(trips) - cut
+    assert list(timeline) == trips[cut:]
+    assert timeline.is_free(cut * 100 - 40, cut * 100 - 20, 0)
+    assert not timeline.is_free(cut * 100 + 10, cut * 100 + 20, 0)
+
+    # Everything pruned: last_end still guards the next departure
+    timeline.prune(10 ** 6)
+    assert len(timeline) == 0
+    assert timeline.last_end == trips[-1][1]
+    assert timeline.earliest_departure(0, 10) == trips[-1][1] + 10
+
+
+def test_state_round_trip():
+    timeline = CourierTimeline()
+    for trip in [(0, 30), (100, 160), (200, 260), (400, 480)]:
+        timeline.add(*trip)
+    timeline.prune(170)
+    state = timeline.to_state()
+    assert state == {'trips': [[200, 260], [400, 480]], 'last_end': 480}
+
+    restored = CourierTimeline.from_state(state)
+    assert list(restored) == list(timeline)
+    assert restored.last_end == timeline.last_end
+    assert restored.to_state() == state
+    for start in range(170, 520, 7):
+        assert restored.is_free(start, start + 20, 10) == timeline.is_free(start, start + 20, 10)
+    restored.add(300, 390)
+    with pytest.raises(ValueError):
+        restored.add(250, 310)